@@ -0,0 +1,81 @@
+"""Minimal in-process websocket client that talks to an ASGI app directly.
+
+Lets benchmarks open thousands of websocket connections to `main.app` in one
+event loop, without a server, sockets or a websocket client library.
+"""
+
+import asyncio
+from typing import Any, Optional
+from urllib.parse import urlencode
+
+
+class WebSocketClosed(Exception):
+    """The app closed the connection (or rejected the handshake)."""
+
+    def __init__(self, code: int) -> None:
+        super().__init__(f"websocket closed with code {code}")
+        self.code = code
+
+
+class ASGIWebSocket:
+    """One websocket connection to an ASGI app."""
+
+    def __init__(
+        self,
+        app: Any,
+        path: str,
+        params: Optional[dict[str, str]] = None,
+        subprotocols: tuple = (),
+        max_queued_frames: int = 0,
+    ) -> None:
+        """`max_queued_frames` > 0 makes the app's sends block while that many frames are unread."""
+        self.app = app
+        self.path = path
+        self.params = params or {}
+        self.subprotocols = list(subprotocols)
+        self.headers: dict[str, str] = {}
+        self.subprotocol: Optional[str] = None
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue(max_queued_frames)
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> "ASGIWebSocket":
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "root_path": "",
+            "query_string": urlencode(self.params).encode(),
+            "headers": [(b"host", b"testserver")],
+            "subprotocols": self.subprotocols,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        self._task = asyncio.create_task(self.app(scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise WebSocketClosed(message.get("code", 1000))
+        self.headers = {key.decode(): value.decode() for key, value in message.get("headers", [])}
+        self.subprotocol = message.get("subprotocol")
+        return self
+
+    async def send_text(self, text: str) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self._to_app.put({"type": "websocket.receive", "bytes": data})
+
+    async def receive(self) -> Any:
+        """Return the next text or bytes frame sent by the app."""
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise WebSocketClosed(message.get("code", 1000))
+        return message["text"] if message.get("text") is not None else message.get("bytes")
+
+    async def close(self, code: int = 1000) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": code})
+        if self._task is not None:
+            await self._task
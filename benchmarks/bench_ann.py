@@ -0,0 +1,66 @@
+"""Recall@k, latency and bytes per vector of each index type against the flat baseline.
+
+Writes a synthetic clustered corpus as a flat index, trains every ANN index
+type over it, and searches held-out queries through `MmapVectorStore`.
+
+Usage:
+    python -m benchmarks.bench_ann --vectors 100000 --dim 256 --k 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.shared.flat_index import INDEX_TYPES, MmapVectorStore, ann_files, build_ann_index, write_index
+
+SEARCH_SETTINGS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": 1}, {"nprobe": 8}, {"nprobe": 32}],
+    "ivf_pq": [{"nprobe": 8}, {"nprobe": 32}],
+    "hnsw": [{"ef_search": 16}, {"ef_search": 64}, {"ef_search": 256}],
+    "sq8": [{}],
+}
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Gaussian clusters, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def run(vectors: int, dim: int, queries: int, k: int) -> None:
+    data = clustered_vectors(vectors, dim)
+    probes = clustered_vectors(queries, dim, seed=1)
+    with tempfile.TemporaryDirectory() as path:
+        write_index(path, data, ((str(i), Document(page_content=str(i))) for i in range(vectors)))
+        exact = MmapVectorStore.load(path)
+        truth = [{row for row, _ in exact.search_rows(q, k)} for q in probes]
+
+        print(f"{'index':10} {'params':18} {'recall@' + str(k):>10} {'ms/query':>10} {'bytes/vec':>10}")
+        for index_type in INDEX_TYPES:
+            factory = build_ann_index(path, index_type=index_type)
+            store = MmapVectorStore.load(path)
+            size = os.path.getsize(ann_files(path)[1]) if factory else vectors * dim * 4
+            for params in SEARCH_SETTINGS[index_type]:
+                start = time.perf_counter()
+                results = [{row for row, _ in store.search_rows(q, k, **params)} for q in probes]
+                elapsed = (time.perf_counter() - start) / queries
+                recall = np.mean([len(r & t) / k for r, t in zip(results, truth)])
+                label = ",".join(f"{key}={value}" for key, value in params.items()) or "-"
+                print(f"{index_type:10} {label:18} {recall:10.3f} {elapsed * 1000:10.3f} {size / vectors:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.vectors, args.dim, args.queries, args.k)
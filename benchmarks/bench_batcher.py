@@ -0,0 +1,83 @@
+"""Check that concurrent query embeddings are coalesced into a few backend calls.
+
+Fires `--requests` simultaneous `aembed_query` calls (a tenth of them
+repeating another caller's text) at `MicroBatchingEmbeddings` over a fake
+model that counts its calls and waits `--latency` seconds per call, for
+`--rounds` rounds. Each caller must get the vector the model gives for its own
+text, and each round must cost at most ceil(requests / batch size) backend
+calls; otherwise the script exits with status 1.
+
+Usage:
+    python -m benchmarks.bench_batcher --requests 200 --batch-size 64 --wait-ms 5
+"""
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from src.shared.embedding_batcher import MicroBatchingEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake embeddings that count calls and texts, with a per-call latency."""
+
+    def __init__(self, dim: int = 64, latency: float = 0.02) -> None:
+        self.fake = DeterministicFakeEmbedding(size=dim)
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.fake.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.fake.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        await asyncio.sleep(self.latency)
+        return self.fake.embed_documents(texts)
+
+
+async def run(requests: int, rounds: int, batch_size: int, wait_ms: float, latency: float) -> bool:
+    backend = CountingEmbeddings(latency=latency)
+    batcher = MicroBatchingEmbeddings(backend, max_batch_size=batch_size, max_wait=wait_ms / 1000)
+    bound = math.ceil(requests / batch_size)
+    ok = True
+    start = time.perf_counter()
+    for round_ in range(rounds):
+        texts = [f"round {round_} query {i - i % 10 if i % 10 == 9 else i}" for i in range(requests)]
+        calls = backend.calls
+        vectors = await asyncio.gather(*(batcher.aembed_query(text) for text in texts))
+        calls = backend.calls - calls
+        wrong = sum(vector != backend.embed_query(text) for text, vector in zip(texts, vectors))
+        if calls > bound or wrong:
+            print(f"round {round_}: {calls} backend calls (bound {bound}), {wrong} wrong vectors")
+            ok = False
+    elapsed = time.perf_counter() - start
+
+    stats = batcher.stats
+    print(f"{rounds * requests} requests in {rounds} rounds: {backend.calls} backend calls, {backend.texts} texts embedded")
+    print(f"batch size: mean {stats.mean_batch_size:.1f}, max {stats.max_batch_size}; sizes {dict(sorted(stats.batch_sizes.items()))}")
+    print(f"queue wait: mean {stats.mean_wait * 1000:.2f} ms, max {stats.max_wait * 1000:.2f} ms")
+    print(f"total {elapsed:.2f}s ({elapsed / rounds * 1000:.1f} ms per round, backend latency {latency * 1000:.0f} ms)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    if not asyncio.run(run(args.requests, args.rounds, args.batch_size, args.wait_ms, args.latency)):
+        print("FAIL: concurrent requests were not coalesced into batches")
+        sys.exit(1)
+    print("OK")
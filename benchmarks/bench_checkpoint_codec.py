@@ -0,0 +1,96 @@
+"""Bytes and time per checkpoint: full serde snapshots vs. msgspec deltas.
+
+Simulates conversations of 10, 100 and 1000 turns. Each turn appends a user
+and an assistant message, and every few turns a retrieval adds documents, as
+`AgentState` does. Every turn is checkpointed through `SQLiteCheckpointSaver`,
+once with the default serializer (`delta=False`) and once delta-encoded.
+After each run the last checkpoint is read back through a fresh saver, with
+no caches, and compared with the state that was written.
+
+Usage:
+    python -m benchmarks.bench_checkpoint_codec --turns 10 100 1000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+from src.shared.sqlite_checkpoint import SQLiteCheckpointSaver
+from src.shared.state import reduce_docs
+
+PASSAGE = "Our sensors report temperature, vibration and pressure readings to the cloud platform. " * 12
+
+
+def run_conversation(saver: SQLiteCheckpointSaver, turns: int) -> tuple[float, dict]:
+    """Checkpoint every turn; return total seconds spent in `put` and the final channel values."""
+    config = {"configurable": {"thread_id": "bench", "checkpoint_ns": ""}}
+    values = {"messages": [], "documents": [], "router": {"type": "overview", "logic": ""}, "user_feedback": ""}
+    elapsed = 0.0
+    for turn in range(turns):
+        values = dict(values)
+        values["messages"] = values["messages"] + [
+            HumanMessage(content=f"Tell me more about item {turn}", id=f"h{turn}"),
+            AIMessage(content=f"Item {turn} ships with a two-year warranty. " * 6, id=f"a{turn}"),
+        ]
+        if turn % 5 == 0:
+            docs = [Document(page_content=f"{PASSAGE} (section {turn}-{i})", metadata={"page": i}) for i in range(4)]
+            values["documents"] = reduce_docs(values["documents"], docs)
+        values["user_feedback"] = "yes" if turn % 2 else ""
+        checkpoint = empty_checkpoint()
+        checkpoint["id"] = str(uuid6(clock_seq=turn))
+        checkpoint["channel_values"] = values
+        checkpoint["channel_versions"] = {name: saver.get_next_version(None) for name in values}
+        start = time.perf_counter()
+        config = saver.put(config, checkpoint, {"source": "loop", "step": turn}, {})
+        elapsed += time.perf_counter() - start
+    saver.flush()
+    return elapsed, values
+
+
+def stored_bytes(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        (checkpoints,) = conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints").fetchone()
+        (documents,) = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM documents").fetchone()
+    return checkpoints + documents
+
+
+def measure(turns: int, delta: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.sqlite")
+        saver = SQLiteCheckpointSaver(path, keep_last=turns + 1, ttl=None, delta=delta)
+        put_seconds, expected = run_conversation(saver, turns)
+        saver.close()
+
+        size = stored_bytes(path)
+        reader = SQLiteCheckpointSaver(path, keep_last=turns + 1, ttl=None, delta=delta)
+        start = time.perf_counter()
+        restored = reader.get_tuple({"configurable": {"thread_id": "bench"}})
+        read_seconds = time.perf_counter() - start
+        reader.close()
+    return {
+        "bytes": size / turns,
+        "put_us": put_seconds / turns * 1e6,
+        "read_ms": read_seconds * 1000,
+        "identical": restored.checkpoint["channel_values"] == expected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+    print(f"{'turns':>6} {'encoding':>8} {'bytes/ckpt':>11} {'us/ckpt':>9} {'read last ms':>12}  identical")
+    for turns in args.turns:
+        for delta in (False, True):
+            result = measure(turns, delta)
+            print(
+                f"{turns:>6} {'delta' if delta else 'full':>8} {result['bytes']:>11.0f} "
+                f"{result['put_us']:>9.1f} {result['read_ms']:>12.2f}  {result['identical']}"
+            )
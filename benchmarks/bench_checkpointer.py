@@ -0,0 +1,82 @@
+"""Soak test: resident memory of the checkpointer over many conversations.
+
+Simulates `--conversations` short conversations, each writing `--turns`
+checkpoints with a growing message list, straight through the checkpointer
+API (no model calls). RSS and live row counts are printed at intervals; with
+`SQLiteCheckpointSaver` both stay flat because old checkpoints are pruned and
+idle threads expire after `--ttl` seconds. `--saver memory` runs the same load
+against `MemorySaver` for comparison (use fewer conversations).
+
+Usage:
+    python -m benchmarks.bench_checkpointer --conversations 100000 --ttl 5
+    python -m benchmarks.bench_checkpointer --saver memory --conversations 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.shared.sqlite_checkpoint import SQLiteCheckpointSaver
+
+
+def rss_mb() -> float:
+    """Current resident set size in megabytes (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def conversation(saver, thread_id: str, turns: int) -> None:
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    messages = []
+    for turn in range(turns):
+        messages = messages + [
+            HumanMessage(content=f"Question {turn} from {thread_id}"),
+            AIMessage(content="Our sensors report readings every few seconds. " * 8),
+        ]
+        checkpoint = empty_checkpoint()
+        checkpoint["id"] = str(uuid6(clock_seq=turn))
+        checkpoint["channel_values"] = {"messages": messages}
+        checkpoint["channel_versions"] = {"messages": saver.get_next_version(None if turn == 0 else str(turn), None)}
+        config = saver.put(config, checkpoint, {"source": "loop", "step": turn}, checkpoint["channel_versions"])
+        saver.put_writes(config, [("messages", messages[-1])], task_id=f"task-{turn}")
+    saver.get_tuple({"configurable": {"thread_id": thread_id}})
+
+
+def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.saver == "sqlite":
+            saver = SQLiteCheckpointSaver(
+                os.path.join(tmp, "checkpoints.sqlite"), keep_last=args.keep_last, ttl=args.ttl, evict_interval=1.0
+            )
+        else:
+            saver = MemorySaver()
+        start = time.perf_counter()
+        print(f"{'conversations':>13} {'rss MB':>8} {'elapsed s':>9}  live")
+        for i in range(1, args.conversations + 1):
+            conversation(saver, f"thread-{i}", args.turns)
+            if i % args.report_every == 0 or i == args.conversations:
+                live = saver.info() if isinstance(saver, SQLiteCheckpointSaver) else {"threads": len(saver.storage)}
+                live = {k: v for k, v in live.items() if k.startswith("live") or k == "threads"}
+                print(f"{i:>13} {rss_mb():>8.1f} {time.perf_counter() - start:>9.1f}  {live}")
+        if isinstance(saver, SQLiteCheckpointSaver):
+            print(saver.info())
+            saver.close()
+            size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+            print(f"database size on disk: {size / (1024 * 1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--saver", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--conversations", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--keep-last", type=int, default=3)
+    parser.add_argument("--ttl", type=float, default=5.0)
+    parser.add_argument("--report-every", type=int, default=10_000)
+    run(parser.parse_args())
@@ -0,0 +1,64 @@
+"""Measure the local fast-path classifiers on a labelled set of replies.
+
+For each confidence threshold, reports how many replies would be answered
+locally (no LLM call) and how accurate those local answers are. Replies below
+the threshold go to the query model and are not counted against accuracy.
+
+Usage:
+    python -m benchmarks.bench_classifiers --thresholds 0.6 0.8 0.9
+"""
+
+import argparse
+import json
+import os
+import time
+
+from src.shared.classifiers import classify_yes_no, extract_email
+
+CASES_PATH = os.path.join(os.path.dirname(__file__), "classifier_cases.jsonl")
+
+CLASSIFIERS = {"yes_no": classify_yes_no, "email": extract_email}
+
+
+def load_cases(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(cases: list[dict], threshold: float, verbose: bool) -> None:
+    print(f"threshold {threshold:.2f}")
+    for kind, classify in CLASSIFIERS.items():
+        subset = [case for case in cases if case["kind"] == kind]
+        local = correct = 0
+        for case in subset:
+            result = classify(case["text"])
+            if result.confidence < threshold:
+                continue
+            local += 1
+            if result.label == case["label"]:
+                correct += 1
+            elif verbose:
+                print(f"    wrong: {case['text']!r} -> {result.label} ({result.confidence}), expected {case['label']}")
+        accuracy = correct / local if local else 1.0
+        print(f"  {kind:7s} local {local:3d}/{len(subset):<3d} ({local / len(subset):6.1%})  accuracy {accuracy:6.1%}")
+
+
+def time_classifiers(cases: list[dict], rounds: int = 200) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            CLASSIFIERS[case["kind"]](case["text"])
+    elapsed = time.perf_counter() - start
+    print(f"mean local classification time: {elapsed / (rounds * len(cases)) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=CASES_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.8, 0.9])
+    parser.add_argument("--verbose", action="store_true", help="Print locally answered cases that were wrong.")
+    args = parser.parse_args()
+    cases = load_cases(args.cases)
+    for threshold in args.thresholds:
+        evaluate(cases, threshold, args.verbose)
+    time_classifiers(cases)
@@ -0,0 +1,89 @@
+"""Check that concurrent sessions don't serialize on the event loop.
+
+Runs the full graph flow (overview -> yes -> research -> yes -> email) with a
+fake model that takes `--latency` seconds per call, first for one session and
+then for N simultaneous sessions. With non-blocking nodes N sessions finish in
+the longer of single-session time and the CPU time they need; any node that
+blocks the loop while waiting (a sync HTTP call, a sleep, a lock) adds wall
+time on top and shows up in the loop monitor's stalls.
+
+Exits with status 1 if N sessions take more than `--max-ratio` times that
+expected time, so it can gate a change. Dividing by the CPU time keeps the
+gate about blocking rather than about how fast the machine is.
+
+Usage:
+    python -m benchmarks.bench_concurrency --sessions 50 --latency 0.2 --max-ratio 2
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.retrieval_graph.graph import app
+from src.shared.loop_monitor import LoopLagMonitor
+
+REPLIES = ("yes", "yes", "visitor@example.com")
+
+
+async def run_session(session_id: str, configurable: dict) -> None:
+    config = {"configurable": {**configurable, "thread_id": session_id}}
+    async for _ in app.astream({"messages": [("user", "Hi")]}, config, stream_mode="messages"):
+        pass
+    for reply in REPLIES:
+        state = await app.aget_state(config)
+        if not state.next:
+            break
+        await app.aupdate_state(config, {"user_feedback": reply}, as_node=state.next[0])
+        async for _ in app.astream(None, config, stream_mode="messages"):
+            pass
+
+
+async def timed(sessions: int, prefix: str, configurable: dict) -> tuple[float, float]:
+    """Return the wall time and the process CPU time of `sessions` concurrent sessions."""
+    start, cpu = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(run_session(f"{prefix}-{i}", configurable) for i in range(sessions)))
+    return time.perf_counter() - start, time.process_time() - cpu
+
+
+async def run(sessions: int, latency: float) -> float:
+    """Return the time of `sessions` concurrent sessions relative to the expected time."""
+    register_fake_models(latency=latency)
+    monitor = LoopLagMonitor(threshold=latency / 4)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        configurable = fake_configurable(index_path)
+        await timed(1, "warmup", configurable)
+
+        monitor.start()
+        single, _ = await timed(1, "single", configurable)
+        concurrent, cpu = await timed(sessions, "concurrent", configurable)
+        await monitor.stop()
+
+    stats = monitor.stats()
+    expected = max(single, cpu)
+    print(f"1 session:          {single:6.2f}s")
+    print(f"{sessions} sessions:  {concurrent:6.2f}s ({concurrent / single:.2f}x single-session time), {cpu:.2f}s CPU")
+    print(f"expected:          {expected:6.2f}s (the longer of one session and the CPU time), {concurrent / expected:.2f}x")
+    print(f"loop lag: mean {stats['mean_lag'] * 1000:.2f} ms, max {stats['max_lag'] * 1000:.2f} ms")
+    for stall in stats["stalls"]:
+        print(f"  stall {stall['duration'] * 1000:.0f} ms in {stall['location']}")
+    return concurrent / expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument(
+        "--max-ratio", type=float, default=2.0, help="fail if N sessions take longer than this many times the expected time"
+    )
+    args = parser.parse_args()
+    ratio = asyncio.run(run(args.sessions, args.latency))
+    if ratio > args.max_ratio:
+        print(f"FAIL: {args.sessions} sessions took {ratio:.2f}x the expected time (bound {args.max_ratio:.2f}x)")
+        sys.exit(1)
+    print(f"OK: {ratio:.2f}x the expected time is within {args.max_ratio:.2f}x")
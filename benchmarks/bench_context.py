@@ -0,0 +1,65 @@
+"""Prompt context size: raw `Document` reprs vs. the token-budgeted context.
+
+Builds retrieval results like the ones the graph gets (ranked chunks with
+ingest metadata, some of them repeated or re-chunked with small changes),
+then compares the tokens the old `{docs}` interpolation put into a prompt
+with `build_context` at several budgets, and times `build_context`.
+
+Usage:
+    python -m benchmarks.bench_context --chunks 8 --budgets 500 1000 1500
+"""
+
+import argparse
+import time
+
+from langchain_core.documents import Document
+
+from src.shared.context import build_context, count_tokens
+
+FACTS = (
+    "Our sensors report temperature, vibration and pressure readings to the cloud platform every few seconds.",
+    "The platform raises alerts when a reading drifts outside the range learned for each machine.",
+    "Pricing starts at 99 dollars per device per year, with volume discounts above 500 devices.",
+    "Installation takes under an hour per line and needs no changes to existing controllers.",
+    "Customers in food processing, mining and logistics run more than 40,000 sensors in production.",
+    "Data is stored in the customer's region and encrypted at rest and in transit.",
+)
+
+
+def retrieved_chunks(count: int) -> list[Document]:
+    docs = []
+    for i in range(count):
+        fact = FACTS[i % len(FACTS)]
+        # Every third chunk is an overlapping re-chunk of the previous one.
+        text = (fact + " ") * 6 if i % 3 != 2 else (FACTS[(i - 1) % len(FACTS)] + " ") * 6 + "See page 4."
+        docs.append(Document(
+            page_content=text,
+            metadata={"source": f"/srv/app/src/shared/docs/company_profile_{i % 2}.pdf", "page": i, "uuid": f"{i:032x}"},
+        ))
+    return docs
+
+
+def main(chunks: int, budgets: list[int], iterations: int) -> None:
+    docs = retrieved_chunks(chunks)
+    old = count_tokens(str({"documents": docs}))
+    print(f"{chunks} retrieved chunks: old prompt context {old} tokens")
+    for budget in budgets:
+        context, stats = build_context(docs, budget)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            build_context(docs, budget)
+        elapsed = (time.perf_counter() - start) / iterations * 1000
+        print(
+            f"budget {budget:5d}: {stats.tokens:5d} tokens ({stats.tokens / old:5.1%} of old), "
+            f"{stats.unique}/{stats.retrieved} unique, {stats.used} used, truncated {stats.truncated}, "
+            f"{elapsed:.2f} ms per build"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[500, 1000, 1500])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.chunks, args.budgets, args.iterations)
@@ -0,0 +1,100 @@
+"""Micro-benchmark: list-rebuilding reduce_docs vs. the DocumentStore reducer.
+
+Grows the `documents` channel to 10, 1k and 100k documents by merging
+batches of `--batch` retrieved documents (a tenth of them already present),
+the way LangGraph applies the reducer on every state update. Reports the
+total and worst merge time and the cost of a membership check, for the old
+reducer (kept below as `legacy_reduce_docs`) and for `reduce_docs`.
+
+Usage:
+    python -m benchmarks.bench_document_store --sizes 10 1000 100000 --batch 100
+"""
+
+import argparse
+import time
+from typing import Any, Callable
+
+from langchain_core.documents import Document
+
+from src.shared.state import _generate_uuid, reduce_docs
+
+
+def legacy_reduce_docs(existing: Any, new: Any) -> list[Document]:
+    """The reducer before DocumentStore: rebuilds the ID set and the list, deep-copies documents."""
+    if new == "delete":
+        return []
+    existing_list = list(existing) if existing else []
+    if isinstance(new, str):
+        return existing_list + [Document(page_content=new, metadata={"uuid": _generate_uuid(new)})]
+    new_list = []
+    if isinstance(new, list):
+        existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
+        for item in new:
+            item_id = item.metadata.get("uuid", "") or _generate_uuid(item.page_content)
+            if item_id not in existing_ids:
+                new_item = item.copy(deep=True)
+                new_item.metadata["uuid"] = item_id
+                new_list.append(new_item)
+            existing_ids.add(item_id)
+    return existing_list + new_list
+
+
+def batches(size: int, batch: int) -> list[list[Document]]:
+    docs = [
+        Document(page_content=f"Product fact {i}: sensors report every {i % 60 + 1} seconds.", metadata={"page": i % 40})
+        for i in range(size)
+    ]
+    result, seen = [], 0
+    while seen < size:
+        fresh = docs[seen : seen + batch]
+        # Retrieval often returns chunks the state already holds.
+        repeats = docs[max(0, seen - batch // 10) : seen]
+        result.append(repeats + fresh)
+        seen += len(fresh)
+    return result
+
+
+def grow(reducer: Callable[[Any, Any], Any], merges: list[list[Document]]) -> tuple[float, float, Any]:
+    state: Any = []
+    worst = total = 0.0
+    for merge in merges:
+        start = time.perf_counter()
+        state = reducer(state, merge)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        worst = max(worst, elapsed)
+    return total, worst, state
+
+
+def membership_us(contains: Callable[[str], bool], ids: list[str]) -> float:
+    start = time.perf_counter()
+    for doc_id in ids:
+        contains(doc_id)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+
+def main(sizes: list[int], batch: int, legacy_limit: int) -> None:
+    print(f"{'docs':>7} {'reducer':>14} {'merges':>7} {'total ms':>10} {'worst ms':>9} {'lookup us':>10}")
+    for size in sizes:
+        merges = batches(size, batch)
+        probe = [_generate_uuid(f"Product fact {i}: sensors report every {i % 60 + 1} seconds.") for i in range(0, size, max(1, size // 1000))]
+        if size <= legacy_limit:
+            total, worst, state = grow(legacy_reduce_docs, merges)
+            assert len(state) == size
+            lookup = membership_us(lambda doc_id: any(d.metadata.get("uuid") == doc_id for d in state), probe[:50])
+            print(f"{size:7d} {'list':>14} {len(merges):7d} {total * 1000:10.2f} {worst * 1000:9.3f} {lookup:10.2f}")
+        else:
+            print(f"{size:7d} {'list':>14} skipped (above --legacy-limit)")
+        total, worst, store = grow(reduce_docs, merges)
+        assert len(store) == size
+        lookup = membership_us(lambda doc_id: doc_id in store, probe)
+        print(f"{size:7d} {'DocumentStore':>14} {len(merges):7d} {total * 1000:10.2f} {worst * 1000:9.3f} {lookup:10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--legacy-limit", type=int, default=100_000, help="skip the old reducer above this size")
+    args = parser.parse_args()
+    main(args.sizes, args.batch, args.legacy_limit)
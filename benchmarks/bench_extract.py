@@ -0,0 +1,62 @@
+"""Measure PDF text extraction throughput against the number of worker processes.
+
+Generates a set of text-heavy PDFs, then extracts them serially and with
+process pools of increasing size, reporting pages/sec for each.
+
+Usage:
+    python -m benchmarks.bench_extract --files 8 --pages 300
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from src.shared.ingest import iter_pages_parallel
+
+PARAGRAPH = (
+    "Our product line covers industrial sensors, gateways and the cloud platform that "
+    "ties them together, with support contracts available in every region. "
+)
+
+
+def generate_pdfs(directory: str, files: int, pages: int) -> list[str]:
+    """Write `files` PDFs of `pages` pages each and return their paths."""
+    paths = []
+    for i in range(files):
+        doc = fitz.open()
+        for page_num in range(pages):
+            page = doc.new_page()
+            text = f"Manual {i}, page {page_num + 1}\n" + PARAGRAPH * 25
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+        path = os.path.join(directory, f"manual_{i}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def run(files: int, pages: int, pages_per_task: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate_pdfs(directory, files, pages)
+        total = files * pages
+        worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            extracted = sum(1 for _ in iter_pages_parallel(paths, workers, pages_per_task))
+            elapsed = time.perf_counter() - start
+            assert extracted == total
+            baseline = baseline or elapsed
+            print(f"{workers:3d} workers: {total / elapsed:8.1f} pages/sec ({baseline / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+    run(args.files, args.pages, args.pages_per_task)
@@ -0,0 +1,95 @@
+"""Prompt size per turn over a long conversation: full history vs. the managed window.
+
+Plays `--turns` turns (a user question and a detailed answer each) and, for
+every turn, measures the history tokens the response nodes used to send (all
+of `state.messages`) and what `manage_history` sends with the default
+`AgentConfiguration` (window plus rolling summary), along with the time spent
+managing the history and the number of summary folds.
+
+The summary is extractive by default; `--summary-model fake` folds with the
+local fake chat model instead, to include the model call path.
+
+Usage:
+    python -m benchmarks.bench_history --turns 200 --summary-model fake
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from benchmarks.fakes import SlowFakeChatModel
+from src.retrieval_graph.configuration import AgentConfiguration
+from src.shared.context import messages_tokens
+from src.shared.history import HistorySummary, manage_history
+
+QUESTIONS = (
+    "How often do the sensors report readings?",
+    "What does installation involve for a line with older controllers?",
+    "How is pricing calculated for 800 devices?",
+    "Where is our data stored, and is it encrypted?",
+)
+
+ANSWER = (
+    "Our sensors report temperature, vibration and pressure every few seconds to the cloud platform, "
+    "which learns the normal range of each machine and raises an alert when a reading drifts. "
+    "Installation takes under an hour per line and needs no changes to existing controllers. "
+    "Pricing starts at 99 dollars per device per year, with volume discounts above 500 devices, "
+    "and data stays in your region, encrypted at rest and in transit. "
+) * 2
+
+
+def message(cls: type, content: str) -> BaseMessage:
+    return cls(content=content, id=str(uuid.uuid4()))
+
+
+async def run(turns: int, summary_model: str, report_every: int) -> None:
+    configuration = AgentConfiguration()
+    model = SlowFakeChatModel(latency=0.0) if summary_model == "fake" else None
+    messages: list[BaseMessage] = []
+    summary = HistorySummary()
+    folds = 0
+    sizes: list[int] = []
+    elapsed: list[float] = []
+
+    print(f"{'turn':>5} {'messages':>9} {'full tokens':>12} {'window tokens':>14} {'window msgs':>12} {'ms':>7}")
+    for turn in range(1, turns + 1):
+        messages.append(message(HumanMessage, f"{QUESTIONS[turn % len(QUESTIONS)]} (turn {turn})"))
+        start = time.perf_counter()
+        prompt, refreshed = await manage_history(
+            messages,
+            summary,
+            max_turns=configuration.history_max_turns,
+            max_tokens=configuration.history_max_tokens,
+            fold_batch=configuration.history_summary_batch,
+            summary_max_tokens=configuration.history_summary_max_tokens,
+            model=model,
+        )
+        elapsed.append(time.perf_counter() - start)
+        folds += refreshed is not summary
+        summary = refreshed
+        sizes.append(messages_tokens(prompt))
+        if turn == 1 or turn % report_every == 0:
+            print(
+                f"{turn:5d} {len(messages):9d} {messages_tokens(messages):12d} {sizes[-1]:14d} "
+                f"{len(prompt):12d} {elapsed[-1] * 1000:7.2f}"
+            )
+        messages.append(message(AIMessage, ANSWER))
+
+    steady = sizes[configuration.history_max_turns :]
+    print(
+        f"\nwindow tokens after the first {configuration.history_max_turns} turns: "
+        f"min {min(steady, default=0)}, max {max(steady, default=0)}; "
+        f"{folds} summary folds, {sum(elapsed) / len(elapsed) * 1000:.2f} ms mean per turn"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--summary-model", choices=("extractive", "fake"), default="extractive")
+    parser.add_argument("--report-every", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.summary_model, args.report_every))
@@ -0,0 +1,82 @@
+"""Compare per-call FAISS loading against the cached index registry.
+
+Builds a synthetic index of random vectors, then times `FAISS.load_local`
+followed by a search (the old per-turn path) against a search through
+`IndexRegistry.get` (the cached path).
+
+Usage:
+    python -m benchmarks.bench_index_cache --vectors 100000 --dim 256
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from src.shared.retrieval import IndexRegistry
+
+
+class RandomEmbeddings(Embeddings):
+    """Deterministic random embeddings so the benchmark needs no API key."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    def _vector(self, text: str) -> list[float]:
+        rng = np.random.default_rng(abs(hash(text)) % (2**32))
+        return rng.random(self.dim, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def build_index(path: str, vectors: int, dim: int) -> None:
+    """Write a synthetic index of `vectors` random vectors to `path`."""
+    rng = np.random.default_rng(0)
+    matrix = rng.random((vectors, dim), dtype=np.float32)
+    texts = [f"synthetic chunk {i}" for i in range(vectors)]
+    db = FAISS.from_embeddings(zip(texts, matrix.tolist()), RandomEmbeddings(dim))
+    db.save_local(path, index_name="index")
+
+
+def run(vectors: int, dim: int, calls: int) -> None:
+    embeddings = RandomEmbeddings(dim)
+    with tempfile.TemporaryDirectory() as path:
+        print(f"Building synthetic index: {vectors} x {dim}")
+        build_index(path, vectors, dim)
+
+        start = time.perf_counter()
+        for i in range(calls):
+            vstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+            vstore.similarity_search(f"query {i}", k=3)
+        per_call = (time.perf_counter() - start) / calls
+
+        registry = IndexRegistry()
+        start = time.perf_counter()
+        registry.get(embeddings, path)
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(calls):
+            registry.get(embeddings, path).similarity_search(f"query {i}", k=3)
+        cached = (time.perf_counter() - start) / calls
+
+    print(f"load_local per call: {per_call * 1000:9.2f} ms")
+    print(f"registry first load: {first * 1000:9.2f} ms")
+    print(f"registry cached:     {cached * 1000:9.2f} ms")
+    print(f"speedup:             {per_call / cached:9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    run(args.vectors, args.dim, args.calls)
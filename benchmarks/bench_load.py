@@ -0,0 +1,232 @@
+"""Offline end-to-end load test of the /chat websocket.
+
+Boots `main.app` in-process (lifespan startup included), routes every model
+and embedding call to the deterministic local fakes, and drives
+`--conversations` scripted conversations through the whole interrupt flow,
+at most `--concurrency` at a time:
+
+    Hi -> overview, yes -> research, yes -> email question, <email> -> sent
+
+Clients speak the typed protocol (`chat.v1.json` by default), so each turn
+ends at its `turn_end` event. The report covers throughput, p50/p95/p99 turn
+latency and time to first byte per step, errors, event-loop lag and RSS. It
+is printed and written as JSON to `--output` (by default under
+.cache/loadtest/) so runs can be compared over time.
+
+Usage:
+    python -m benchmarks.bench_load --conversations 2000 --concurrency 200 --latency 0.2 --tokens-per-second 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from typing import Any, Optional
+
+import main
+from benchmarks.asgi_ws import ASGIWebSocket, WebSocketClosed
+from benchmarks.bench_checkpointer import rss_mb
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.shared.loop_monitor import loop_monitor
+from src.shared.protocol import Error, Message, Token, TurnEnd, UserMessage, WireCodec
+
+STEPS = (("overview", "Hi"), ("research", "yes"), ("email_interest", "yes"), ("send_profile", "visitor@example.com"))
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        **{f"p{q}_ms": percentile(values, q) * 1000 for q in (50, 95, 99)},
+        "max_ms": max(values) * 1000 if values else 0.0,
+    }
+
+
+class Lifespan:
+    """Run an ASGI app's startup and shutdown events, as a server would."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _event(self, name: str) -> None:
+        await self._to_app.put({"type": f"lifespan.{name}"})
+        message = await self._from_app.get()
+        if message["type"] != f"lifespan.{name}.complete":
+            raise RuntimeError(f"lifespan {name} failed: {message}")
+
+    async def __aenter__(self) -> "Lifespan":
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._task = asyncio.create_task(self.app(scope, self._to_app.get, self._from_app.put))
+        await self._event("startup")
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._event("shutdown")
+        await self._task
+
+
+class LoadClient:
+    """One scripted conversation; records latency and time to first byte per step."""
+
+    def __init__(self, subprotocol: str, timeout: float) -> None:
+        self.subprotocol = subprotocol
+        self.codec = WireCodec(main.SUBPROTOCOLS[subprotocol])
+        self.timeout = timeout
+
+    async def turn(self, ws: ASGIWebSocket, text: str) -> tuple[float, Optional[float]]:
+        frame = self.codec.encode(UserMessage(text))
+        start = time.perf_counter()
+        await (ws.send_bytes(frame) if self.codec.binary else ws.send_text(frame))
+        first = None
+        while True:
+            event = self.codec.decode_event(await asyncio.wait_for(ws.receive(), self.timeout))
+            if first is None and isinstance(event, (Token, Message)):
+                first = time.perf_counter() - start
+            if isinstance(event, Error):
+                raise RuntimeError(event.detail)
+            if isinstance(event, TurnEnd):
+                return time.perf_counter() - start, first
+
+    async def converse(self, results: dict[str, dict[str, list]]) -> None:
+        ws = await ASGIWebSocket(main.app, "/chat", subprotocols=(self.subprotocol,)).connect()
+        try:
+            for step, text in STEPS:
+                latency, first = await self.turn(ws, text)
+                results[step]["latency"].append(latency)
+                if first is not None:
+                    results[step]["ttfb"].append(first)
+        finally:
+            await ws.close()
+
+
+async def sample_rss(samples: list[float], interval: float, done: asyncio.Event) -> None:
+    while not done.is_set():
+        samples.append(rss_mb())
+        try:
+            await asyncio.wait_for(done.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    register_fake_models(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    results = {step: {"latency": [], "ttfb": []} for step, _ in STEPS}
+    errors: dict[str, int] = {}
+    rss: list[float] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        index_path = os.path.join(workdir, "index")
+        build_fake_index(index_path)
+        main.DEFAULT_CONFIGURABLE.update({**fake_configurable(index_path), "response_cache": args.response_cache})
+        # Attached before startup, so the app keeps it instead of opening .cache/checkpoints.sqlite.
+        scratch_checkpointer(workdir)
+        main.sessions.max_sessions = max(main.sessions.max_sessions, args.concurrency)
+
+        async with Lifespan(main.app):
+            client = LoadClient(args.protocol, args.timeout)
+            rss_start = rss_mb()
+            done = asyncio.Event()
+            sampler = asyncio.create_task(sample_rss(rss, 0.25, done))
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one() -> None:
+                async with semaphore:
+                    try:
+                        await client.converse(results)
+                    except (asyncio.TimeoutError, RuntimeError, WebSocketClosed) as e:
+                        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.conversations)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await sampler
+            lag = loop_monitor.stats()
+
+    completed = len(results[STEPS[-1][0]]["latency"])
+    turns = sum(len(r["latency"]) for r in results.values())
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_s": elapsed,
+        "conversations_completed": completed,
+        "errors": errors,
+        "throughput": {"conversations_per_s": completed / elapsed, "turns_per_s": turns / elapsed},
+        "turns": {
+            step: {"latency": summarize(r["latency"]), "ttfb": summarize(r["ttfb"])} for step, r in results.items()
+        },
+        "loop_lag_ms": {"mean": lag["mean_lag"] * 1000, "max": lag["max_lag"] * 1000, "stalls": len(lag["stalls"])},
+        "rss_mb": {
+            "start": rss_start,
+            "peak": max(rss, default=rss_start),
+            "end": rss[-1] if rss else rss_start,
+            "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+
+
+def report(result: dict[str, Any]) -> None:
+    throughput = result["throughput"]
+    print(
+        f"{result['conversations_completed']} conversations in {result['elapsed_s']:.2f}s: "
+        f"{throughput['conversations_per_s']:.1f} conv/s, {throughput['turns_per_s']:.1f} turns/s, "
+        f"errors {result['errors'] or 0}"
+    )
+    for step, stats in result["turns"].items():
+        latency, ttfb = stats["latency"], stats["ttfb"]
+        print(
+            f"{step:>15}: p50 {latency['p50_ms']:8.1f}  p95 {latency['p95_ms']:8.1f}  p99 {latency['p99_ms']:8.1f} ms"
+            f"   ttfb p50 {ttfb['p50_ms']:8.1f}  p99 {ttfb['p99_ms']:8.1f} ms"
+        )
+    rss, lag = result["rss_mb"], result["loop_lag_ms"]
+    print(f"RSS {rss['start']:.0f} -> peak {rss['peak']:.0f} -> {rss['end']:.0f} MB; "
+          f"loop lag mean {lag['mean']:.2f} ms, max {lag['max']:.1f} ms, {lag['stalls']} stalls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--protocol", choices=sorted(main.SUBPROTOCOLS), default="chat.v1.json")
+    parser.add_argument("--response-cache", choices=("none", "memory"), default="none")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for any event before failing")
+    parser.add_argument("--output", help="JSON report path (default: .cache/loadtest/<timestamp>.json)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    report(result)
+    output = args.output or os.path.join(".cache", "loadtest", time.strftime("%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {output}")
@@ -0,0 +1,89 @@
+"""Instrumentation overhead, and what /metrics and /debug/traces report.
+
+Times `Histogram.time()` with and without an active trace, then runs a few
+full conversations over the /chat websocket against the fake models, prints
+the latency summary of every histogram scraped from /metrics, and prints the
+timeline of the last traced turn.
+
+Usage:
+    python -m benchmarks.bench_metrics --conversations 20 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import tempfile
+import time
+
+import main
+from benchmarks.bench_sessions import converse
+from benchmarks.bench_sse import SSERequest
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.shared.metrics import Histogram, tracer
+
+SAMPLE = re.compile(r'^(\w+)_(sum|count)(\{[^}]*\})? (\S+)$')
+
+
+def overhead(iterations: int) -> None:
+    histogram = Histogram("bench_seconds", "Overhead benchmark.", ["node"])
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with histogram.time(node="n"):
+            pass
+    untraced = (time.perf_counter() - start) / iterations * 1e6
+    with tracer.trace("bench"):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with histogram.time(node="n"):
+                pass
+        traced = (time.perf_counter() - start) / iterations * 1e6
+    print(f"Histogram.time(): {untraced:.2f} us without a trace, {traced:.2f} us inside one")
+
+
+async def scrape() -> str:
+    request = SSERequest("/metrics", {}).start()
+    body = await request.read()
+    await request.task
+    return body.decode()
+
+
+def summarize(text: str) -> None:
+    sums: dict[tuple[str, str], dict[str, float]] = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            name, kind, labels, value = match.groups()
+            sums.setdefault((name, labels or ""), {})[kind] = float(value)
+    for (name, labels), values in sorted(sums.items()):
+        if values.get("count"):
+            mean = values["sum"] / values["count"]
+            unit = "" if name.endswith("tokens") else " ms"
+            mean = mean if unit == "" else mean * 1000
+            print(f"{name}{labels}: n={values['count']:.0f} mean={mean:.2f}{unit}")
+
+
+async def run(conversations: int, latency: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    register_fake_models(latency=latency)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        main.DEFAULT_CONFIGURABLE.update({**fake_configurable(index_path), "response_cache": "none"})
+        await asyncio.gather(*(converse() for _ in range(conversations)))
+        summarize(await scrape())
+
+        trace = tracer.recent(1)[0]
+        print(f"\nlast trace {trace['name']} {trace['labels']} {trace['duration'] * 1000:.1f} ms")
+        for span in trace["spans"]:
+            print(f"  +{span['start'] * 1000:8.1f} ms {span['duration'] * 1000:8.1f} ms  {span['name']} {span['labels']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    overhead(args.iterations)
+    asyncio.run(run(args.conversations, args.latency))
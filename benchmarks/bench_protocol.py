@@ -0,0 +1,115 @@
+"""Encode/decode cost of the typed chat protocol, and a typed conversation.
+
+Part one times encoding and decoding representative events with msgspec
+JSON, msgspec MessagePack and stdlib `json` (the same envelopes as plain
+dicts), reporting microseconds and bytes per event, and checks that every
+event round-trips. Part two runs the full conversation over the /chat
+websocket in-process with each subprotocol and checks that sequence numbers
+increase by one and every turn ends with `turn_end`.
+
+Usage:
+    python -m benchmarks.bench_protocol --iterations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+import msgspec
+
+import main
+from benchmarks.asgi_ws import ASGIWebSocket
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.shared.protocol import (
+    Interrupt,
+    Message,
+    MessageEnd,
+    RetrievalDone,
+    Token,
+    TurnEnd,
+    UserMessage,
+    WireCodec,
+)
+
+MESSAGE_ID = "run-3f2a9c1e-5b7d-4e8f-9a0b-1c2d3e4f5a6b"
+EVENTS = {
+    "token": Token(41, MESSAGE_ID, "Our sensors report temperature and "),
+    "message": Message(42, MESSAGE_ID, "Would you like more details about the product? " * 3),
+    "message_end": MessageEnd(43, MESSAGE_ID),
+    "retrieval_done": RetrievalDone(44, "product overview", 4),
+    "interrupt": Interrupt(45, "ask_user_interest"),
+    "turn_end": TurnEnd(46, "0b6f3c2e9d8a4f7e"),
+}
+REPLIES = ("Hi", "yes", "yes", "visitor@example.com")
+
+
+def per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_codecs(iterations: int) -> None:
+    codecs = {"msgspec json": WireCodec("json"), "msgspec msgpack": WireCodec("msgpack")}
+    print(f"{'event':>15} {'codec':>16} {'encode us':>10} {'decode us':>10} {'bytes':>6}")
+    for name, event in EVENTS.items():
+        for label, codec in codecs.items():
+            frame = codec.encode(event)
+            assert codec.decode_event(frame) == event, (label, name)
+            encode = per_call(lambda: codec.encode(event), iterations)
+            decode = per_call(lambda: codec.decode_event(frame), iterations)
+            size = len(frame.encode()) if isinstance(frame, str) else len(frame)
+            print(f"{name:>15} {label:>16} {encode:10.2f} {decode:10.2f} {size:6d}")
+        as_dict = {"type": name, **msgspec.structs.asdict(event)}
+        frame = json.dumps(as_dict)
+        assert json.loads(frame) == as_dict
+        encode = per_call(lambda: json.dumps({"type": name, **msgspec.structs.asdict(event)}), iterations)
+        decode = per_call(lambda: json.loads(frame), iterations)
+        print(f"{name:>15} {'stdlib json':>16} {encode:10.2f} {decode:10.2f} {len(frame.encode()):6d}")
+
+
+async def typed_conversation(subprotocol: str) -> None:
+    ws = await ASGIWebSocket(main.app, "/chat", subprotocols=(subprotocol,)).connect()
+    assert ws.subprotocol == subprotocol, ws.subprotocol
+    codec = WireCodec(main.SUBPROTOCOLS[subprotocol])
+    counts: dict[str, int] = {}
+    last_seq, frames, size = 0, 0, 0
+    for reply in REPLIES:
+        frame = codec.encode(UserMessage(reply))
+        await (ws.send_bytes(frame) if codec.binary else ws.send_text(frame))
+        while True:
+            raw = await ws.receive()
+            event = codec.decode_event(raw)
+            assert event.seq == last_seq + 1, (last_seq, event)
+            last_seq = event.seq
+            frames += 1
+            size += len(raw) if isinstance(raw, bytes) else len(raw.encode())
+            kind = type(event).__name__
+            counts[kind] = counts.get(kind, 0) + 1
+            if isinstance(event, TurnEnd):
+                break
+    await ws.close()
+    print(f"{subprotocol:>16}: {frames} events, {size} bytes, seq 1..{last_seq} contiguous, {counts}")
+
+
+async def run_conversations() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    register_fake_models(latency=0.01, tokens_per_second=500)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        main.DEFAULT_CONFIGURABLE.update({**fake_configurable(index_path), "response_cache": "none"})
+        for subprotocol in main.SUBPROTOCOLS:
+            await typed_conversation(subprotocol)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+    bench_codecs(args.iterations)
+    asyncio.run(run_conversations())
@@ -0,0 +1,72 @@
+"""Compare a full index build with an incremental re-index of a slightly changed corpus.
+
+Embeddings come from a local fake with a fixed per-batch latency, standing in
+for the embedding API round trip that dominates real builds.
+
+Usage:
+    python -m benchmarks.bench_reindex --chunks 20000 --changed 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import tempfile
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.shared.ingest import IngestConfig, ingest_documents
+
+
+class SlowFakeEmbeddings(Embeddings):
+    """Deterministic embeddings that sleep like a remote API call."""
+
+    def __init__(self, dim: int = 256, batch_latency: float = 0.05) -> None:
+        self.dim = dim
+        self.batch_latency = batch_latency
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).random(self.dim, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.batch_latency)
+        return self.embed_documents(texts)
+
+
+def corpus(chunks: int, changed: int = 0) -> list[Document]:
+    """Return a synthetic corpus whose first `changed` chunks have new content."""
+    return [
+        Document(
+            page_content=f"chunk {i} revision {1 if i < changed else 0} " + "lorem ipsum " * 40,
+            metadata={"source": "synthetic.pdf", "page": i // 10 + 1},
+        )
+        for i in range(chunks)
+    ]
+
+
+async def run(chunks: int, changed_fraction: float) -> None:
+    embeddings = SlowFakeEmbeddings()
+    config = IngestConfig(batch_size=64, max_in_flight=4)
+    changed = int(chunks * changed_fraction)
+    with tempfile.TemporaryDirectory() as path:
+        full = await ingest_documents(corpus(chunks), embeddings, path, config=config)
+        print(f"full build:   {full}")
+        incremental = await ingest_documents(corpus(chunks, changed), embeddings, path, config=config)
+        print(f"re-index:     {incremental}")
+    print(f"re-index took {incremental.seconds / full.seconds:.1%} of a full build for {changed_fraction:.1%} changed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--changed", type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args.chunks, args.changed))
@@ -0,0 +1,65 @@
+"""Compare the initial overview turn with a cold and a warm response cache.
+
+Each session sends the same opening message in a fresh thread. The first one
+generates the overview with a fake model that takes `--latency` seconds; the
+rest should be served from the response cache and still arrive as a stream of
+`AIMessageChunk`s with identical text.
+
+Usage:
+    python -m benchmarks.bench_response_cache --sessions 20 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from langchain_core.messages import AIMessageChunk
+
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.retrieval_graph.graph import app
+from src.shared.response_cache import response_cache_stats
+
+
+async def opening_turn(thread_id: str, configurable: dict) -> tuple[float, int, str]:
+    """Return time to first token, number of chunks and the streamed text."""
+    config = {"configurable": {**configurable, "thread_id": thread_id}}
+    start = time.perf_counter()
+    first, chunks, text = None, 0, ""
+    async for message, _ in app.astream({"messages": [("user", "Hi")]}, config, stream_mode="messages"):
+        if isinstance(message, AIMessageChunk) and message.content:
+            first = first or time.perf_counter() - start
+            chunks += 1
+            text += message.content
+    return first or 0.0, chunks, text
+
+
+async def run(sessions: int, latency: float) -> None:
+    register_fake_models(latency=latency, tokens_per_second=200)
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "index")
+        build_fake_index(index_path)
+        scratch_checkpointer(tmp)
+        configurable = {
+            **fake_configurable(index_path),
+            "response_cache": "sqlite",
+            "response_cache_path": os.path.join(tmp, "responses.sqlite"),
+        }
+        cold_ttft, cold_chunks, cold_text = await opening_turn("cold", configurable)
+        warm = [await opening_turn(f"warm-{i}", configurable) for i in range(sessions)]
+
+    warm_ttft = sorted(ttft for ttft, _, _ in warm)
+    print(f"cold: first token after {cold_ttft * 1000:7.1f} ms, {cold_chunks} chunks")
+    print(f"warm: first token after {warm_ttft[len(warm_ttft) // 2] * 1000:7.1f} ms (median of {sessions})")
+    print(f"warm responses identical and chunked: {all(text == cold_text and chunks > 1 for _, chunks, text in warm)}")
+    for name, stats in response_cache_stats().items():
+        print(f"{name}: hit rate {stats.hit_rate:.1%} ({stats})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.latency))
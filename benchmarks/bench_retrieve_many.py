@@ -0,0 +1,104 @@
+"""Check and time `retrieve_many` against one `retrieve` call per query.
+
+Over a small fake index, retrieves `--queries` queries (two of them repeated,
+as generated queries often are) with `retrieve_many` and compares the result
+with searching each query on its own:
+
+* every document appears once (dedup across queries);
+* documents are interleaved by rank, each query's best hit first;
+* with a `score_threshold` in `search_kwargs`, only documents within it are
+  returned, exactly as the per-query search returns them.
+
+Exits with status 1 if any check fails, then reports the time of one batched
+call against sequential `retrieve` calls.
+
+Usage:
+    python -m benchmarks.bench_retrieve_many --queries 5 --rounds 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.fakes import build_fake_index, fake_configurable
+from src.shared.retrieval import index_registry, retrieve, retrieve_many
+
+
+def expected(index_path: str, queries: list[str], search_kwargs: dict) -> list[Document]:
+    """Search each query on its own, interleave the results by rank and drop repeats."""
+    embeddings = DeterministicFakeEmbedding(size=64)
+    vstore = index_registry.get(embeddings, index_path)
+    kwargs = dict(search_kwargs)
+    k = kwargs.pop("k", 4)
+    per_query = [vstore.similarity_search_by_vector(embeddings.embed_query(query), k=k, **kwargs) for query in queries]
+    seen, merged = set(), []
+    for rank in range(max(map(len, per_query))):
+        for docs in per_query:
+            if rank < len(docs) and docs[rank].page_content not in seen:
+                seen.add(docs[rank].page_content)
+                merged.append(docs[rank])
+    return merged
+
+
+def threshold_for(index_path: str, queries: list[str], k: int) -> float:
+    """A distance threshold that keeps about half of the top-k hits."""
+    embeddings = DeterministicFakeEmbedding(size=64)
+    vstore = index_registry.get(embeddings, index_path)
+    scores = [
+        score
+        for query in queries
+        for _, score in vstore.similarity_search_with_score_by_vector(embeddings.embed_query(query), k=k)
+    ]
+    return statistics.median(scores)
+
+
+async def check(name: str, index_path: str, queries: list[str], search_kwargs: dict) -> bool:
+    config = {"configurable": {**fake_configurable(index_path), "search_kwargs": search_kwargs}}
+    got = [doc.page_content for doc in await retrieve_many(queries, config)]
+    want = [doc.page_content for doc in expected(index_path, queries, search_kwargs)]
+    ok = got == want and len(got) == len(set(got))
+    print(f"{name:16s} {len(got):3d} documents  {'ok' if ok else 'MISMATCH'}")
+    if not ok:
+        print(f"  got:      {got}\n  expected: {want}")
+    return ok
+
+
+async def run(queries: int, rounds: int) -> bool:
+    texts = [f"How often do sensors on line {i} report?" for i in range(queries)]
+    texts += texts[:2]
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        ok = await check("k=3", index_path, texts, {"k": 3})
+        ok &= await check("k=8", index_path, texts, {"k": 8})
+        threshold = threshold_for(index_path, texts, 8)
+        ok &= await check("score_threshold", index_path, texts, {"k": 8, "score_threshold": threshold})
+
+        config = {"configurable": fake_configurable(index_path)}
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                await retrieve(text, config)
+        sequential = (time.perf_counter() - start) / rounds
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await retrieve_many(texts, config)
+        batched = (time.perf_counter() - start) / rounds
+    print(f"{len(texts)} queries: sequential retrieve {sequential * 1000:.2f} ms, retrieve_many {batched * 1000:.2f} ms")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    if not asyncio.run(run(args.queries, args.rounds)):
+        print("FAIL: retrieve_many differs from per-query retrieval")
+        sys.exit(1)
+    print("OK")
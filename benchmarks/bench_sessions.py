@@ -0,0 +1,101 @@
+"""Load-test the /chat websocket session manager with simultaneous fake clients.
+
+Every client opens its own connection to `main.app` in-process and runs the
+full conversation (greeting -> yes -> yes -> email) against the fake models.
+Afterwards the script checks that every client got a distinct thread, that no
+thread saw another client's messages, and exercises resume, the session limit
+and idle eviction.
+
+Usage:
+    python -m benchmarks.bench_sessions --clients 500 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+import main
+from benchmarks.asgi_ws import ASGIWebSocket, WebSocketClosed
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.shared.streaming import END_OF_MESSAGE
+
+# (message, number of messages the server sends back for it)
+CONVERSATION = (("Hi", 1), ("yes", 2), ("yes", 1), ("visitor@example.com", 2))
+
+
+async def converse(turns=CONVERSATION, thread_id=None) -> tuple[str, float]:
+    params = {"thread_id": thread_id} if thread_id else None
+    ws = await ASGIWebSocket(main.app, "/chat", params).connect()
+    start = time.perf_counter()
+    for message, replies in turns:
+        await ws.send_text(message)
+        while replies:
+            if await ws.receive() == END_OF_MESSAGE:
+                replies -= 1
+    await ws.close()
+    return ws.headers["x-thread-id"], time.perf_counter() - start
+
+
+async def check_isolation(thread_ids: list[str]) -> bool:
+    expected = None
+    for thread_id in thread_ids:
+        state = await main.chat_graph.aget_state(main.thread_config(thread_id))
+        human = [m.content for m in state.values["messages"] if m.type == "human"]
+        expected = expected or human
+        if human != expected:
+            return False
+    return True
+
+
+async def run(clients: int, latency: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    register_fake_models(latency=latency)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        main.DEFAULT_CONFIGURABLE.update(fake_configurable(index_path))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(converse() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        thread_ids = [thread_id for thread_id, _ in results]
+        durations = sorted(duration for _, duration in results)
+        print(f"{clients} simultaneous conversations in {elapsed:.2f}s "
+              f"(p50 {durations[len(durations) // 2]:.2f}s, max {durations[-1]:.2f}s)")
+        print(f"distinct threads: {len(set(thread_ids)) == clients}")
+        print(f"threads isolated: {await check_isolation(thread_ids)}")
+
+        thread_id, _ = await converse(CONVERSATION[:1])
+        resumed, _ = await converse(CONVERSATION[1:2], thread_id=thread_id)
+        state = await main.chat_graph.aget_state(main.thread_config(thread_id))
+        print(f"resume: same thread {resumed == thread_id}, next node {state.next}")
+
+        main.sessions.max_sessions = 2
+        held = [await ASGIWebSocket(main.app, "/chat").connect() for _ in range(2)]
+        try:
+            await ASGIWebSocket(main.app, "/chat").connect()
+            print("limit: third session was accepted (unexpected)")
+        except WebSocketClosed as e:
+            print(f"limit: third session rejected with code {e.code}")
+
+        main.sessions.idle_timeout = 0.1
+        main.sessions.start()
+        await asyncio.sleep(0.3)
+        for ws in held:
+            try:
+                await asyncio.wait_for(ws.receive(), 1.0)
+            except WebSocketClosed as e:
+                print(f"idle: session closed with code {e.code}")
+            await ws.close()
+        await main.sessions.stop()
+        print(main.sessions.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.latency))
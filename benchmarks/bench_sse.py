@@ -0,0 +1,137 @@
+"""Exercise the /stream_chat SSE endpoint in-process.
+
+Streams a full conversation turn by turn (each request resumes the thread
+from its interrupt), prints time to first token per turn, then disconnects in
+the middle of a slow generation and reports how quickly the request stops.
+
+Usage:
+    python -m benchmarks.bench_sse --latency 0.3 --tokens-per-second 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+import main
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+
+REPLIES = ("Hi", "yes", "yes", "visitor@example.com")
+
+
+class SSERequest:
+    """A GET request to an ASGI app whose body is read as Server-Sent Events."""
+
+    def __init__(self, path: str, params: dict[str, str]) -> None:
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": urlencode(params).encode(),
+            "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        self._disconnected = asyncio.Event()
+        self._request_sent = False
+        self._body: asyncio.Queue = asyncio.Queue()
+        self.headers: dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def _receive(self) -> dict:
+        if not self._request_sent:
+            self._request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.headers = {k.decode(): v.decode() for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            await self._body.put(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self._body.put(None)
+
+    def start(self) -> "SSERequest":
+        self.task = asyncio.create_task(main.app(self.scope, self._receive, self._send))
+        return self
+
+    async def events(self):
+        buffer = b""
+        while True:
+            body = await self._body.get()
+            if body is None:
+                return
+            buffer += body
+            while b"\n\n" in buffer:
+                raw, buffer = buffer.split(b"\n\n", 1)
+                fields = dict(line.split(": ", 1) for line in raw.decode().splitlines() if not line.startswith(":"))
+                if "event" in fields:
+                    yield fields["event"], json.loads(fields["data"])
+
+    async def read(self) -> bytes:
+        """Return the whole response body."""
+        body = b""
+        while (chunk := await self._body.get()) is not None:
+            body += chunk
+        return body
+
+    def disconnect(self) -> None:
+        self._disconnected.set()
+
+
+async def turn(content: str, thread_id: Optional[str]) -> tuple[str, float, Optional[str]]:
+    params = {"content": content, **({"thread_id": thread_id} if thread_id else {})}
+    request = SSERequest("/stream_chat", params).start()
+    start, first, interrupt = time.perf_counter(), None, None
+    async for event, data in request.events():
+        if event == "session":
+            thread_id = data["thread_id"]
+        elif event in ("token", "message") and first is None:
+            first = time.perf_counter() - start
+        elif event == "interrupt":
+            interrupt = data["node"]
+    await request.task
+    return thread_id, first or 0.0, interrupt
+
+
+async def run(latency: float, tokens_per_second: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    register_fake_models(latency=latency, tokens_per_second=tokens_per_second)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        main.DEFAULT_CONFIGURABLE.update({**fake_configurable(index_path), "response_cache": "none"})
+
+        thread_id = None
+        for reply in REPLIES:
+            thread_id, ttft, interrupt = await turn(reply, thread_id)
+            print(f"{reply!r:>24}: first token {ttft * 1000:7.1f} ms, waiting at {interrupt}")
+
+        request = SSERequest("/stream_chat", {"content": "Hi"}).start()
+        async for event, _ in request.events():
+            if event == "token":
+                break
+        start = time.perf_counter()
+        request.disconnect()
+        await request.task
+        print(f"disconnect mid-generation: request finished {(time.perf_counter() - start) * 1000:.1f} ms later; "
+              f"live sessions {main.sessions.stats()['live']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.tokens_per_second))
@@ -0,0 +1,85 @@
+"""Time to first byte on the /chat websocket: buffered vs. streamed frames.
+
+The fake model waits `--latency` seconds and then streams its reply at
+`--tokens-per-second`. "buffered" reproduces the old endpoint, which sent a
+message only once it was complete; "streamed" uses the default frame
+coalescing. A third run reads with a client that takes `--slow-read` seconds
+per frame and holds at most one unread frame, to show frames growing
+instead of piling up.
+
+Usage:
+    python -m benchmarks.bench_ttfb --clients 20 --latency 0.3 --tokens-per-second 50
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+import main
+from benchmarks.asgi_ws import ASGIWebSocket
+from benchmarks.fakes import build_fake_index, fake_configurable, register_fake_models, scratch_checkpointer
+from src.shared.streaming import END_OF_MESSAGE
+
+BUFFERED = {"max_delay": None, "max_bytes": None}
+
+
+async def opening_turn(slow_read: float = 0.0) -> dict:
+    ws = await ASGIWebSocket(main.app, "/chat", max_queued_frames=1 if slow_read else 0).connect()
+    start = time.perf_counter()
+    await ws.send_text("Hi")
+    first, frames, sizes = None, 0, []
+    while True:
+        frame = await ws.receive()
+        if frame == END_OF_MESSAGE:
+            break
+        first = first or time.perf_counter() - start
+        frames += 1
+        sizes.append(len(frame))
+        if slow_read:
+            await asyncio.sleep(slow_read)
+    total = time.perf_counter() - start
+    await ws.close()
+    return {"ttfb": first, "total": total, "frames": frames, "max_frame": max(sizes)}
+
+
+def report(label: str, results: list[dict]) -> None:
+    def median(key: str) -> float:
+        values = sorted(r[key] for r in results)
+        return values[len(values) // 2]
+
+    print(
+        f"{label:>9}: ttfb {median('ttfb') * 1000:7.1f} ms  complete {median('total') * 1000:7.1f} ms  "
+        f"frames/msg {median('frames'):4.0f}  largest frame {median('max_frame'):5.0f} B"
+    )
+
+
+async def run(clients: int, latency: float, tokens_per_second: float, slow_read: float) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    register_fake_models(latency=latency, tokens_per_second=tokens_per_second)
+    streamed = dict(main.STREAMING)
+    with tempfile.TemporaryDirectory() as index_path:
+        build_fake_index(index_path)
+        scratch_checkpointer(index_path)
+        # Without the response cache every opener is generated, so the timings are comparable.
+        main.DEFAULT_CONFIGURABLE.update({**fake_configurable(index_path), "response_cache": "none"})
+
+        main.STREAMING.clear()
+        main.STREAMING.update(BUFFERED)
+        report("buffered", await asyncio.gather(*(opening_turn() for _ in range(clients))))
+
+        main.STREAMING.clear()
+        main.STREAMING.update(streamed)
+        report("streamed", await asyncio.gather(*(opening_turn() for _ in range(clients))))
+        report("slow read", [await opening_turn(slow_read=slow_read)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--slow-read", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.latency, args.tokens_per_second, args.slow_read))
@@ -0,0 +1,126 @@
+"""Deterministic local stand-ins for the OpenAI chat model, for benchmarks."""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.retrieval_graph.graph import open_checkpointer
+from src.shared.flat_index import write_index
+from src.shared.models import model_registry
+
+STRUCTURED_ANSWERS = {
+    "more_company_details": "yes",
+    "recieve_email": "yes",
+    "email_address": "visitor@example.com",
+}
+
+REPLY = (
+    "Welcome! We build industrial sensors and the cloud platform that connects them. "
+    "Our products help teams monitor equipment in real time. "
+    "Would you like to learn more about the product in detail?"
+)
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Chat model that waits like a remote API, then streams a canned reply."""
+
+    latency: float = 0.2
+    """Seconds before the first token."""
+    tokens_per_second: float = 0.0
+    """Streaming rate after the first token; 0 sends all tokens at once."""
+    reply: str = REPLY
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _tokens(self) -> list[str]:
+        words = self.reply.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency + self._stream_time())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream_time(self) -> float:
+        return len(self._tokens()) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens():
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        def answer() -> Any:
+            return schema(**{name: STRUCTURED_ANSWERS.get(name, "yes") for name in schema.model_fields})
+
+        def respond(_: Any) -> Any:
+            time.sleep(self.latency)
+            return answer()
+
+        async def arespond(_: Any) -> Any:
+            await asyncio.sleep(self.latency)
+            return answer()
+
+        return RunnableLambda(respond, afunc=arespond)
+
+
+def register_fake_models(latency: float = 0.2, tokens_per_second: float = 0.0) -> None:
+    """Serve "fake/<name>" chat models from `SlowFakeChatModel` through the model registry."""
+    model_registry.register_provider(
+        "fake",
+        lambda name, **params: SlowFakeChatModel(latency=latency, tokens_per_second=tokens_per_second),
+    )
+
+
+def build_fake_index(path: str, dim: int = 64, chunks: int = 200) -> None:
+    """Write a small flat index embedded with the "fake/<dim>" embedding provider."""
+    embeddings = DeterministicFakeEmbedding(size=dim)
+    texts = [f"Product fact {i}: our sensors report readings every {i % 60 + 1} seconds." for i in range(chunks)]
+    write_index(path, embeddings.embed_documents(texts), ((str(i), Document(page_content=t)) for i, t in enumerate(texts)))
+
+
+def fake_configurable(index_path: str, dim: int = 64) -> dict[str, Any]:
+    """Configurable values that route every model and embedding call to the local fakes.
+
+    Nothing is cached on disk, so runs don't share state through the app's .cache/.
+    """
+    return {
+        "query_model": "fake/query",
+        "response_model": "fake/response",
+        "history_summary_model": "fake/summary",
+        "embedding_model": f"fake/{dim}",
+        "embedding_cache": "memory",
+        "response_cache": "none",
+        "index_path": index_path,
+    }
+
+
+def scratch_checkpointer(directory: str) -> None:
+    """Checkpoint benchmark conversations to a database in `directory`, not the app's .cache/."""
+    open_checkpointer(os.path.join(directory, "checkpoints.sqlite"))
@@ -2,17 +2,27 @@ import logging
 import uuid
 from typing import AsyncGenerator
 import asyncio
+import contextlib
 import json
 from fastapi import FastAPI, WebSocket, Request, WebSocketDisconnect, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.messages import AIMessageChunk, AIMessage, HumanMessage, BaseMessage
-from src.retrieval_graph.graph import app as chat_graph
+from src.retrieval_graph.graph import app as chat_graph, open_checkpointer, warm_up
 from src.retrieval_graph.state import AgentState
+from src.shared.classifiers import fast_path
+from src.shared.loop_monitor import loop_monitor
+from src.shared.metrics import TURN_SECONDS, registry as metrics, tracer
+from src.shared.protocol import SUBPROTOCOLS, ChatStream, TypedChatStream, negotiate
+from src.shared.response_cache import response_cache_stats
+from src.shared.retrieval import encoder_stats
+from src.shared.sessions import SessionLimitError, SessionManager
 
 from fastapi.middleware.cors import CORSMiddleware
 
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 
 
 class Thread(BaseModel):
@@ -28,7 +38,7 @@ origins = [
 
 
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Company Information Chatbot")
@@ -40,89 +50,385 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-    
 
-@app.websocket("/chat")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for streaming chat responses."""
-    await websocket.accept()
 
+@app.on_event("startup")
+async def open_checkpoint_store():
+    """Open the conversation checkpointer, unless one was attached before startup."""
+    if chat_graph.checkpointer is None:
+        await asyncio.to_thread(open_checkpointer, max_sessions=sessions.max_sessions)
+
+
+@app.on_event("startup")
+async def warm_up_retrieval():
+    """Load the index and precompute the graph's fixed retrievals before serving."""
+    loop_monitor.start()
+    sessions.start()
     try:
-        state = {"messages": []}
-        config = {"configurable": {"thread_id": 123}}
+        await warm_up({"configurable": DEFAULT_CONFIGURABLE})
+    except Exception as e:
+        logger.error(f"Retrieval warm-up failed, falling back to on-demand retrieval: {e}")
 
-        while True:
-            
-            message = await websocket.receive_text()
-            print(f"\n\nMessage: {message}\n\n")
 
-            state["messages"].append(HumanMessage(content=message))
-            buffer = ""
+@app.on_event("shutdown")
+async def stop_monitors():
+    await loop_monitor.stop()
+    await sessions.stop()
 
-            async for event in chat_graph.astream({"messages": state["messages"]}, config, stream_mode='messages'):
-                if isinstance(event[0], AIMessageChunk):
-                    buffer += event[0].content
-                
-                else:
-                    await websocket.send_text(event[0].content)
 
-                logger.info(f"Event: {event}")
-            
-            if buffer:
-                await websocket.send_text(buffer)
-                buffer=""
+@app.on_event("shutdown")
+async def close_checkpointer():
+    """Commit buffered checkpoints before the worker exits."""
+    if chat_graph.checkpointer is not None:
+        await asyncio.to_thread(chat_graph.checkpointer.close)
 
 
-            print(f"\nNext node is: {chat_graph.get_state(config)}\n")
-            current_state = chat_graph.get_state(config)
+@app.get("/debug/loop")
+async def loop_stats():
+    """Event-loop lag samples and recent stalls, with the code that caused them."""
+    return loop_monitor.stats()
 
-            while len(current_state.next) > 0 and current_state.next[0] in ["ask_user_interest", "ask_email_interest", "collect_email"]:
-                logger.info(f"\n\Interrupt state: {current_state.next[0]}\n\n")
-                message = await websocket.receive_text()
-                chat_graph.update_state(config, {"user_feedback": message}, as_node=current_state.next[0])
 
-                logger.info("--State after update--")
-                logger.info(chat_graph.get_state(config))
+INTERRUPT_NODES = ("ask_user_interest", "ask_email_interest", "collect_email")
 
-                logger.info(f"\n\n{chat_graph.get_state(config).next}\n")
+# Configurable values applied to every conversation, e.g. models or index path.
+DEFAULT_CONFIGURABLE: Dict[str, Any] = {}
 
-                async for event in chat_graph.astream(None, config, stream_mode='messages'):
-                    logger.info(f"\n\nEvent after breakpoint: {event}\n\n")
-                    if isinstance(event[0], AIMessageChunk):
-                        buffer += event[0].content
-                    
-                    else:
-                        await websocket.send_text(event[0].content)
-                
-                if buffer:
-                    await websocket.send_text(buffer)
-                    buffer=""
+sessions = SessionManager(max_sessions=1000, idle_timeout=15 * 60)
 
-                current_state = chat_graph.get_state(config)
-                logger.info(f"Next state is: {current_state.next}")
+# Token frames go out every 20 ms or 256 bytes; each message ends with an empty frame.
+STREAMING: Dict[str, Any] = {"max_delay": 0.02, "max_bytes": 256}
 
-    except WebSocketDisconnect:
-        print("WebSocket disconnected")
 
+# Seconds between SSE comment frames that keep idle connections and proxies alive.
+HEARTBEAT_INTERVAL = 15.0
 
 
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {**DEFAULT_CONFIGURABLE, "thread_id": thread_id}}
+
+
+async def turn_input(config: Dict[str, Any], message: str) -> Optional[Dict[str, Any]]:
+    """Prepare the graph for a user message and return the input to stream.
+
+    The conversation lives in the checkpointer: a reply to a pending interrupt
+    becomes user_feedback and the run resumes (input None); anything else is a
+    new message on the thread.
+    """
+    current_state = await chat_graph.aget_state(config)
+    if current_state.next and current_state.next[0] in INTERRUPT_NODES:
+        await chat_graph.aupdate_state(config, {"user_feedback": message}, as_node=current_state.next[0])
+        return None
+    return {"messages": [HumanMessage(content=message)]}
+
+
+class RetrievalEvents(AsyncCallbackHandler):
+    """Forward the graph's `retrieval_done` events to a chat stream."""
+
+    def __init__(self, stream: ChatStream) -> None:
+        self.stream = stream
+
+    async def on_custom_event(self, name: str, data: Any, **kwargs: Any) -> None:
+        if name == "retrieval_done":
+            await self.stream.retrieval_done(data["query"], data["documents"])
+
+
+metrics.collector("sessions_live", "Open chat sessions on this worker.", lambda: [("", {}, sessions.stats()["live"])])
+metrics.collector(
+    "sessions",
+    "Chat sessions by outcome.",
+    lambda: [("_total", {"outcome": key}, sessions.stats()[key]) for key in ("opened", "rejected", "evicted")],
+    kind="counter",
+)
+metrics.collector(
+    "loop_lag_seconds",
+    "Event-loop scheduling delay.",
+    lambda: [(suffix, {}, loop_monitor.lag_stats()[key]) for suffix, key in (("_mean", "mean_lag"), ("_max", "max_lag"))],
+)
+metrics.collector(
+    "fast_path",
+    "Classifications answered locally or by the LLM.",
+    lambda: [
+        ("_total", {"classifier": name, "outcome": outcome}, count)
+        for outcome, counts in (("local", fast_path.stats.local), ("llm", fast_path.stats.fallback))
+        for name, count in list(counts.items())
+    ],
+    kind="counter",
+)
+metrics.collector(
+    "response_cache",
+    "Response cache lookups by result.",
+    lambda: [
+        ("_total", {"cache": name, "result": result}, getattr(stats, result))
+        for name, stats in response_cache_stats().items()
+        for result in ("memory_hits", "disk_hits", "misses")
+    ],
+    kind="counter",
+)
+metrics.collector(
+    "embedding_cache",
+    "Embedding cache lookups by result.",
+    lambda: [
+        ("_total", {"model": model, "result": result}, getattr(entry["cache"], result))
+        for model, entry in encoder_stats().items()
+        if "cache" in entry
+        for result in ("memory_hits", "disk_hits", "misses")
+    ],
+    kind="counter",
+)
+metrics.collector(
+    "embedding_batches",
+    "Micro-batched embedding calls.",
+    lambda: [
+        ("_total", {"model": model}, entry["batcher"].batches)
+        for model, entry in encoder_stats().items()
+        if "batcher" in entry
+    ],
+    kind="counter",
+)
+metrics.collector(
+    "embedding_batch_size",
+    "Texts per micro-batched embedding call.",
+    lambda: [
+        (suffix, {"model": model}, value)
+        for model, entry in encoder_stats().items()
+        if "batcher" in entry
+        for suffix, value in (("_mean", entry["batcher"].mean_batch_size), ("_max", entry["batcher"].max_batch_size))
+    ],
+)
+metrics.collector(
+    "embedding_batch_wait_seconds",
+    "Time a text waits in the micro-batcher's queue.",
+    lambda: [
+        (suffix, {"model": model}, value)
+        for model, entry in encoder_stats().items()
+        if "batcher" in entry
+        for suffix, value in (("_mean", entry["batcher"].mean_wait), ("_max", entry["batcher"].max_wait))
+    ],
+)
+metrics.collector(
+    "checkpointer",
+    "Checkpointer operations.",
+    lambda: [
+        ("_total", {"op": op}, count)
+        for op, count in (vars(chat_graph.checkpointer.stats).items() if chat_graph.checkpointer is not None else ())
+    ],
+    kind="counter",
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/traces")
+async def recent_traces(limit: int = 50):
+    """Timelines of the most recent chat turns: nodes, retrieval, model calls and checkpoints."""
+    return tracer.recent(limit)
+
+
+@app.get("/debug/sessions")
+async def session_stats():
+    """Live websocket sessions on this worker."""
+    return sessions.stats()
+
+
+async def stream_turn(stream: ChatStream, config: Dict[str, Any], message: str) -> None:
+    """Run the graph for one user message and stream its output to `stream`."""
+    graph_input = await turn_input(config, message)
+    streaming_id = None
+    async for chunk, _ in chat_graph.astream(graph_input, config, stream_mode='messages'):
+        if isinstance(chunk, AIMessageChunk):
+            if streaming_id is not None and chunk.id != streaming_id:
+                await stream.message_end(streaming_id)
+            streaming_id = chunk.id
+            await stream.token(chunk.id, chunk.content)
+        else:
+            if streaming_id is not None:
+                await stream.message_end(streaming_id)
+                streaming_id = None
+            await stream.message(chunk.id, chunk.content)
+    if streaming_id is not None:
+        await stream.message_end(streaming_id)
+    state = await chat_graph.aget_state(config)
+    if state.next and state.next[0] in INTERRUPT_NODES:
+        await stream.interrupt(state.next[0])
+
+
+@app.websocket("/chat")
+async def websocket_endpoint(websocket: WebSocket, thread_id: Optional[str] = None):
+    """WebSocket endpoint for streaming chat responses.
+
+    Each connection gets its own conversation thread, returned in the
+    `x-thread-id` handshake header. Reconnect with `?thread_id=<id>` to resume it.
+    Clients offering the `chat.v1.json` or `chat.v1.msgpack` subprotocol get
+    typed events (see `src.shared.protocol`); others get plain text frames,
+    coalesced as tokens are generated, with an empty frame after every message.
+    """
+    async def close() -> None:
+        await websocket.close(code=1001)
+
+    try:
+        session = await sessions.open(thread_id, close)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    except SessionLimitError:
+        await websocket.close(code=1013)
+        return
+
+    subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol, headers=[(b"x-thread-id", session.thread_id.encode())])
+    if subprotocol is None:
+        stream = ChatStream(websocket.send_text, **STREAMING)
+    else:
+        stream = TypedChatStream(websocket.send_text, websocket.send_bytes, SUBPROTOCOLS[subprotocol], **STREAMING)
+    config = {**thread_config(session.thread_id), "callbacks": [RetrievalEvents(stream)]}
 
-@app.get("/stream_chat")
-async def stream_chat(content: str, request: Request):
-    """HTTP endpoint for streaming chat responses."""
     try:
-        client_ip = request.client.host
-        thread_id = client_ip
-        config = {"configurable": {"thread_id": "1"}}
+        async with stream:
+            while True:
+                received = await websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(received.get("code", 1000))
+                try:
+                    message = stream.parse(received)
+                except ValueError as e:
+                    await stream.error(f"Invalid message: {e}")
+                    continue
+                session.touch()
+
+                async with session.turn_lock:
+                    try:
+                        with tracer.trace("chat_turn", transport="websocket", thread_id=session.thread_id), \
+                                TURN_SECONDS.time(transport="websocket"):
+                            await stream_turn(stream, config, message)
+                    except (WebSocketDisconnect, asyncio.CancelledError):
+                        raise
+                    except Exception as e:
+                        logger.error(f"Error in chat turn for thread {session.thread_id}: {e}")
+                        await stream.error("The response could not be completed.")
+                    await stream.turn_end(session.thread_id)
+                session.touch()
 
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket for thread {session.thread_id} disconnected")
+    finally:
+        sessions.release(session)
 
-        async for event in chat_graph.astream({"messages": [("user", content)]}, config):
-            for value in event.values():
-                print("\n\n\nAssistant:", value)
-                # return f"Assistant: {value}\n\n"
-                return f"\n\nAssistant: {value['messages'][-1].content}\n\n"
 
+def sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    except Exception as e:
-        logger.error(f"Error in stream_chat endpoint: {e}")
-        raise
\ No newline at end of file
+
+@app.get("/stream_chat")
+async def stream_chat(content: str, request: Request, thread_id: Optional[str] = None):
+    """Server-Sent Events endpoint streaming one chat turn.
+
+    Without `thread_id` a new conversation is started; its ID is sent in the
+    first `session` event and the `x-thread-id` header. Pass it back to
+    continue: if the previous turn stopped at an interrupt, `content` answers
+    it. Events: `session`, `token` (a chunk of the message being generated),
+    `message` (a complete message), `message_end`, `interrupt` (the node
+    waiting for the user), `error` and `done`, plus comment heartbeats. If the
+    client disconnects, the graph run and its model request are cancelled.
+    """
+    run: Optional[asyncio.Task] = None
+
+    async def cancel() -> None:
+        if run is not None:
+            run.cancel()
+
+    try:
+        session = await sessions.open(thread_id, cancel)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SessionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    config = thread_config(session.thread_id)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            async with session.turn_lock:
+                with tracer.trace("chat_turn", transport="sse", thread_id=session.thread_id), \
+                        TURN_SECONDS.time(transport="sse"):
+                    graph_input = await turn_input(config, content)
+                    async for chunk, _ in chat_graph.astream(graph_input, config, stream_mode="messages"):
+                        queue.put_nowait(chunk)
+                        session.touch()
+        finally:
+            queue.put_nowait(None)
+
+    async def watch_disconnect() -> None:
+        # Servers that don't cancel the response on disconnect only notice it on
+        # the next write; poll so the run stops without waiting for a heartbeat.
+        while not await request.is_disconnected():
+            await asyncio.sleep(0.1)
+        run.cancel()
+
+    async def release() -> None:
+        # Async so Starlette runs it on the loop rather than in a worker thread.
+        sessions.release(session)
+
+    async def events():
+        nonlocal run
+        run = asyncio.create_task(produce())
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            yield sse("session", {"thread_id": session.thread_id})
+            streaming_id = None
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if chunk is None:
+                    break
+                if isinstance(chunk, AIMessageChunk):
+                    if streaming_id is not None and chunk.id != streaming_id:
+                        yield sse("message_end", {"id": streaming_id})
+                    streaming_id = chunk.id
+                    if chunk.content:
+                        yield sse("token", {"id": chunk.id, "content": chunk.content})
+                else:
+                    if streaming_id is not None:
+                        yield sse("message_end", {"id": streaming_id})
+                        streaming_id = None
+                    yield sse("message", {"id": chunk.id, "content": chunk.content})
+            if streaming_id is not None:
+                yield sse("message_end", {"id": streaming_id})
+
+            # The watcher cancels the run when the client goes away; then nobody is left to tell.
+            with contextlib.suppress(asyncio.CancelledError):
+                await run
+            if run.cancelled():
+                return
+            try:
+                run.result()
+            except Exception as e:
+                logger.error(f"Error in stream_chat for thread {session.thread_id}: {e}")
+                yield sse("error", {"detail": "The response could not be completed."})
+            else:
+                state = await chat_graph.aget_state(config)
+                if state.next and state.next[0] in INTERRUPT_NODES:
+                    yield sse("interrupt", {"node": state.next[0]})
+            yield sse("done", {"thread_id": session.thread_id})
+        finally:
+            # Runs on normal completion and when the server cancels the response
+            # because the client went away, so no work continues for nobody.
+            run.cancel()
+            watcher.cancel()
+            sessions.release(session)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "x-thread-id": session.thread_id},
+        # Also releases the session when the client left before the body was iterated.
+        background=BackgroundTask(release),
+    )
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
 from ..retrieval_graph import prompts
 from ..shared.configuration import BaseConfiguration
@@ -16,19 +16,140 @@ class AgentConfiguration(BaseConfiguration):
     # models
 
     query_model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = field(
-        default="gpt-4o",
+        default="openai/gpt-4o-mini",
         metadata={
-            "description": "The language model used for processing and refining queries. Should be in the form: provider/model-name."
+            "description": "The language model used for classifying and extracting from user replies. Should be in the form: provider/model-name."
         },
     )
 
     response_model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = field(
-        default="gpt-4o",
+        default="openai/gpt-4o-mini",
         metadata={
             "description": "The language model used for generating responses. Should be in the form: provider/model-name."
         },
     )
 
+    http_max_connections: int = field(
+        default=100,
+        metadata={
+            "description": "Maximum open HTTP connections shared by all model clients."
+        },
+    )
+
+    http_max_keepalive_connections: int = field(
+        default=20,
+        metadata={
+            "description": "Maximum idle keep-alive HTTP connections kept for reuse by model clients."
+        },
+    )
+
+    http_keepalive_expiry: float = field(
+        default=30.0,
+        metadata={
+            "description": "Seconds an idle keep-alive connection is kept open."
+        },
+    )
+
+    response_cache: Literal["none", "memory", "sqlite"] = field(
+        default="sqlite",
+        metadata={
+            "description": "Where responses of deterministic turns (e.g. the initial overview) are cached: "
+            "not at all, in process memory, or in memory backed by SQLite."
+        },
+    )
+
+    response_cache_path: str = field(
+        default=".cache/responses.sqlite",
+        metadata={
+            "description": "SQLite file used when response_cache is 'sqlite'."
+        },
+    )
+
+    response_cache_size: int = field(
+        default=1_000,
+        metadata={
+            "description": "Maximum number of responses kept in memory (the SQLite store keeps 10x as many)."
+        },
+    )
+
+    response_cache_ttl: Optional[float] = field(
+        default=24 * 3600,
+        metadata={
+            "description": "Seconds before a cached response expires; None keeps entries until evicted by size."
+        },
+    )
+
+    fast_path_min_confidence: float = field(
+        default=0.8,
+        metadata={
+            "description": "Minimum confidence for answering yes/no and email replies locally "
+            "instead of calling the query model. Values above 1 disable the fast path."
+        },
+    )
+
+    # context
+
+    context_max_tokens: int = field(
+        default=1_500,
+        metadata={
+            "description": "Token budget for the retrieved documents placed in a response prompt."
+        },
+    )
+
+    context_mmr_lambda: float = field(
+        default=0.7,
+        metadata={
+            "description": "Relevance/diversity trade-off when ordering retrieved documents: "
+            "1 keeps retrieval order, lower values prefer documents unlike those already chosen."
+        },
+    )
+
+    context_duplicate_threshold: float = field(
+        default=0.85,
+        metadata={
+            "description": "Word-shingle similarity at or above which a retrieved chunk is dropped as a duplicate."
+        },
+    )
+
+    # history
+
+    history_max_turns: int = field(
+        default=6,
+        metadata={
+            "description": "Most recent conversation turns (each starting at a user message) sent to the response model verbatim."
+        },
+    )
+
+    history_max_tokens: int = field(
+        default=2_000,
+        metadata={
+            "description": "Token budget for the verbatim turns; older turns are dropped from the window first. "
+            "The newest turn is always sent."
+        },
+    )
+
+    history_summary_batch: int = field(
+        default=4,
+        metadata={
+            "description": "Turns beyond history_max_turns collected before they are folded into the summary in one call."
+        },
+    )
+
+    history_summary_max_tokens: int = field(
+        default=300,
+        metadata={
+            "description": "Token budget for the rolling summary of the turns outside the window."
+        },
+    )
+
+    history_summary_model: str = field(
+        default="openai/gpt-4o-mini",
+        metadata={
+            "description": "The language model that folds older turns into the rolling summary. "
+            "Empty keeps an extractive summary (short lines of the folded turns) without a model call."
+        },
+    )
+
     # prompts
 
     router_system_prompt: str = field(
@@ -1,20 +1,132 @@
+import asyncio
+import functools
+import logging
+import os
 from typing import Any, Literal, TypedDict, cast, Dict, Optional
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.documents import Document
 
+from . import prompts
 from .configuration import AgentConfiguration
-from ..shared.utils import format_docs, load_chat_model, send_email
+from ..shared.utils import format_docs, send_email
 from ..shared import retrieval
+from ..shared.context import build_context, messages_tokens
+from ..shared.history import manage_history
+from ..shared.metrics import CONTEXT_TOKENS, NODE_SECONDS, PROMPT_TOKENS
+from ..shared.classifiers import classify_yes_no, extract_email, fast_path
+from ..shared.models import ModelRegistry, model_registry
+from ..shared.response_cache import CachedChatModel, get_response_cache, is_deterministic
+from ..shared.sqlite_checkpoint import SQLiteCheckpointSaver
 from .state import AgentState, InputState
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
+logger = logging.getLogger(__name__)
+
+
+class UserInterest(BaseModel):
+    """Binary score for interest check."""
+    more_company_details: str = Field(description="User's interest in detailed product info 'yes' or 'no'")
+
+
+class EmailProfileInterest(BaseModel):
+    """Binary score for email profile interest check."""
+    recieve_email: str = Field(description="User's interest in recieving product profile via email 'yes' or 'no'")
+
+
+class EmailExtraction(BaseModel):
+    """Model to extract email address from user's message."""
+    email_address: str = Field(description="The user's email address or None")
+
+
+USER_INTEREST_PROMPT = PromptTemplate(template=prompts.USER_INTEREST_PROMPT, input_variables=["user_response"])
+
+EMAIL_PROFILE_INTEREST_PROMPT = PromptTemplate(template=prompts.EMAIL_PROFILE_INTEREST_PROMPT, input_variables=["user_response"])
+
+EMAIL_EXTRACTION_PROMPT = PromptTemplate(template=prompts.EMAIL_EXTRACTION_PROMPT, input_variables=["user_response"])
+
+
+def get_models(config: RunnableConfig) -> tuple[AgentConfiguration, ModelRegistry]:
+    """Return the agent configuration and the shared model registry sized for it."""
+    configuration = AgentConfiguration.from_runnable_config(config)
+    model_registry.configure(
+        configuration.http_max_connections,
+        configuration.http_max_keepalive_connections,
+        configuration.http_keepalive_expiry,
+    )
+    return configuration, model_registry
+
+
+async def with_response_cache(
+    model: BaseChatModel, configuration: AgentConfiguration, config: RunnableConfig
+) -> BaseChatModel:
+    """Wrap a deterministic model so identical requests against the same index reuse the response.
+
+    Only call this from nodes whose messages carry no user-specific content
+    beyond the conversation opener.
+    """
+    if configuration.response_cache == "none" or not is_deterministic(model):
+        return model
+    cache = get_response_cache(
+        configuration.response_cache,
+        configuration.response_cache_path,
+        configuration.response_cache_size,
+        configuration.response_cache_ttl,
+    )
+    return CachedChatModel(
+        underlying=model,
+        response_cache=cache,
+        namespace=await retrieval.index_version(config),
+        callbacks=model.callbacks,
+    )
+
+
+def render_context(node: str, documents: list[Document], configuration: AgentConfiguration) -> str:
+    """Build the token-budgeted document context for a prompt and record its size."""
+    context, stats = build_context(
+        documents,
+        configuration.context_max_tokens,
+        mmr_lambda=configuration.context_mmr_lambda,
+        duplicate_threshold=configuration.context_duplicate_threshold,
+    )
+    CONTEXT_TOKENS.observe(stats.tokens, node=node)
+    logger.debug("%s context: %s", node, stats)
+    return context
+
+
+async def history_messages(
+    state: AgentState, configuration: AgentConfiguration, models: ModelRegistry, config: RunnableConfig
+) -> tuple[list[BaseMessage], dict[str, Any]]:
+    """The conversation window to send the response model, and the state update for a refreshed summary."""
+    summary_model = None
+    if configuration.history_summary_model:
+        summary_model = models.chat_model(configuration.history_summary_model, temperature=0)
+    messages, summary = await manage_history(
+        state.messages,
+        state.history_summary,
+        max_turns=configuration.history_max_turns,
+        max_tokens=configuration.history_max_tokens,
+        fold_batch=configuration.history_summary_batch,
+        summary_max_tokens=configuration.history_summary_max_tokens,
+        model=summary_model,
+        config=config,
+    )
+    return messages, ({} if summary is state.history_summary else {"history_summary": summary})
+
+
+def record_prompt_size(node: str, messages: list[BaseMessage]) -> None:
+    """Record the token count of the text sent to the model."""
+    tokens = messages_tokens(messages)
+    PROMPT_TOKENS.observe(tokens, node=node)
+    logger.debug("%s prompt: %d tokens in %d messages", node, tokens, len(messages))
+
+
 async def retrieve_documents(
     query: str, *, config: RunnableConfig
 ) -> dict[str, list[Document]]:
@@ -29,36 +141,50 @@ async def retrieve_documents(
     Returns:
         dict[str, list[Document]]: A dictionary with a 'documents' key containing the list of retrieved documents.
     """
-    with retrieval.make_retriever(config) as retriever:
-        response = await retriever.ainvoke(query, config)
-        return {"documents": response}
-    
+    response = await retrieval.retrieve(query, config)
+    await adispatch_custom_event("retrieval_done", {"query": query, "documents": len(response)}, config=config)
+    return {"documents": response}
+
+
+OVERVIEW_QUERY = "product overview"
+RESEARCH_QUERY = "Provide comprehensive details about the product"
+
+
+async def warm_up(config: Optional[RunnableConfig] = None) -> None:
+    """Precompute retrieval for the fixed queries used by the graph's nodes."""
+    await retrieval.warm_up([OVERVIEW_QUERY, RESEARCH_QUERY], config)
+
+
 
 async def initial_overview(
     state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Generate initial company overview."""
-    
-    messages = state.messages
-    print("inside initial")
-    
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=False)
-    docs = await retrieve_documents("product overview", config=config)
+
+    configuration, models = get_models(config)
+    messages, history = await history_messages(state, configuration, models, config)
+    model = models.chat_model(configuration.response_model, temperature=0, streaming=True)
+    docs = await retrieve_documents(OVERVIEW_QUERY, config=config)
+    context = render_context("initial_overview", docs["documents"], configuration)
+    # The overview depends only on the opening message and the fixed retrieval.
+    model = await with_response_cache(model, configuration, config)
     
     overview_prompt = f"""
     Start by greeting the user and providing a brief overview of the company.
     Provide a concise 2-sentence overview of our product information enclosed in triple backticks. Focus on being engaging and informative. \
-    The information about product is; ```{docs}```
+    The information about product is; ```{context}```
 
     After prvoding the overview, ask the user if they would like to learn more about the product in detail.
     """
     messages = messages + [SystemMessage(content=overview_prompt)]
-        
+    record_prompt_size("initial_overview", messages)
+
     response = await model.ainvoke(messages, config)
     
     return {
         "messages": [response],
-        "router": {"type": "initial", "logic": "ask_user_interest"} 
+        "router": {"type": "initial", "logic": "ask_user_interest"},
+        **history,
     }
 
 
@@ -75,31 +201,18 @@ async def check_user_interest(
 ) -> dict[str, list[BaseMessage]]:
     """Checks user interest in more company details."""
 
-    class UserInterest(BaseModel):
-        """Binary score for interest check."""
-        more_company_details: str = Field(description="User's interest in detailed product info 'yes' or 'no'")
-
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
-    model_with_tool = model.with_structured_output(UserInterest)
-    llm_with_tool = model_with_tool.with_config(tags=["nostream"])
-
-    # Prompt
-    prompt = PromptTemplate(
-        template="""You are a virtual assistant helping a user learn more about a product. 
-        The user has been provided with an initial overview of the product. 
-        Now, you need to determine if the user is interested in more detailed information about the company.
-        Here is the user's response: {user_response}
-        Based on this response, indicate if the user wants more detailed information about the company with a 'yes' or 'no'.""",
-        input_variables=["user_response"],
-    )
-
-    chain = prompt | llm_with_tool
-
+    configuration, models = get_models(config)
     user_response = state.user_feedback
 
-    scored_result = chain.invoke({"user_response": user_response})
-
-    score = scored_result.more_company_details
+    local = classify_yes_no(user_response)
+    if fast_path.accept("user_interest", local, configuration.fast_path_min_confidence):
+        score = local.label
+    else:
+        chain = models.structured(
+            configuration.query_model, UserInterest, USER_INTEREST_PROMPT, temperature=0, streaming=True
+        )
+        scored_result = await chain.ainvoke({"user_response": user_response}, config)
+        score = scored_result.more_company_details
 
     if score == "yes":
         return {
@@ -117,26 +230,29 @@ async def conduct_research(
     state: AgentState, *, config: RunnableConfig
 ) -> dict[str, Any]:
     """Conduct research based on user's interest."""
-    
-    messages = state.messages
-    
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=False)
 
-    docs = await retrieve_documents("Provide comprehensive details about the product", config=config)
+    configuration, models = get_models(config)
+    messages, history = await history_messages(state, configuration, models, config)
+    model = models.chat_model(configuration.response_model, temperature=0, streaming=True)
+
+    docs = await retrieve_documents(RESEARCH_QUERY, config=config)
+    context = render_context("conduct_research", docs["documents"], configuration)
     prompt = f"""
     Give a response to the user provinding more detailed information about the company \
     Provide the company details directly without starting with words like 'sure' or 'okay.
     Detailed overview of our product:
-    ```{docs}```
+    ```{context}```
 
     After providing the detailed overview, ALWAYS ask the user if they would like to receive a comprehensive company profile via email.
     """
     messages = messages + [SystemMessage(content=prompt)]
-        
+    record_prompt_size("conduct_research", messages)
+
     response = await model.ainvoke(messages, config)
     
     return {
         "messages": [response],
+        **history,
     }
 
 
@@ -154,36 +270,22 @@ async def check_email_profile_interest(
 ) -> dict[str, list[BaseMessage] | dict]:
     """Checks user interest in more company details."""
 
-    class UserInterest(BaseModel):
-        """Binary score for email profile interest check."""
-        recieve_email: str = Field(description="User's interest in recieving product profile via email 'yes' or 'no'")
-
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=True)
-    model_with_tool = model.with_structured_output(UserInterest)
-    llm_with_tool = model_with_tool.with_config(tags=["nostream"])
-
-    # Prompt
-    prompt = PromptTemplate(
-    template="""You are a virtual assistant helping a user provide their email address.
-    The user was asked to provide their email address to receive the company profile.
-    Extract the email address from the user's response.
-
-    If the user's response includes phrases like "I don't have email", "No email", "Not applicable", or any other indication that they do not want to provide an email, output 'None'.
-    Otherwise, extract the email address and return it.
-
-    User's response: {user_response}
-
-    IF THE USER DID NOT PROVIDE AN EMAIL ADDRESS or IF IT DID NOT MATCH A COMMON EMAIL FORMAT, OUTPUT 'None'.""",
-    input_variables=["user_response"],
-)
-
-    chain = prompt | llm_with_tool
-
+    configuration, models = get_models(config)
     user_response = state.user_feedback
 
-    scored_result = chain.invoke({"user_response": user_response})
-
-    score = scored_result.recieve_email
+    local = classify_yes_no(user_response)
+    if fast_path.accept("email_interest", local, configuration.fast_path_min_confidence):
+        score = local.label
+    else:
+        chain = models.structured(
+            configuration.query_model,
+            EmailProfileInterest,
+            EMAIL_PROFILE_INTEREST_PROMPT,
+            temperature=0,
+            streaming=True,
+        )
+        scored_result = await chain.ainvoke({"user_response": user_response}, config)
+        score = scored_result.recieve_email
 
     if score == "yes":
         return {
@@ -210,35 +312,19 @@ async def validate_email(
 ) -> dict[str, Any]:
     """Validate and collect user email."""
 
-    class EmailExtraction(BaseModel):
-        """Model to extract email address from user's message."""
-        email_address: str = Field(description="The user's email address or None")
-
-
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=False)
-    model_with_tool = model.with_structured_output(EmailExtraction)
-    llm_with_tool = model_with_tool.with_config(tags=["nostream"])
-
-    # Prompt
-    prompt = PromptTemplate(
-            template="""You are a virtual assistant helping a user provide their email address.
-            The user was asked to provide their email address to receive the company profile.
-            Extract the email address from the user's response.
-
-            User's response: {user_response}
-
-            IF THE USER DID NOT PROVIDE AN EMAIL ADDRESS or IR DID NOT MATCH COMMON EMAIL FORMAT, OUTPUT 'None'.""",
-            input_variables=["user_response"],
-    )
-
-    chain = prompt | llm_with_tool
-
+    configuration, models = get_models(config)
     user_response = state.user_feedback
 
-    extracted_result = chain.invoke({"user_response": user_response})
-
-    email_address = extracted_result.email_address
-    print(f"\n\nExtracted email address: {email_address}\n\n")
+    local = extract_email(user_response)
+    if fast_path.accept("email_extraction", local, configuration.fast_path_min_confidence):
+        email_address = local.label
+    else:
+        chain = models.structured(
+            configuration.query_model, EmailExtraction, EMAIL_EXTRACTION_PROMPT, temperature=0, streaming=False
+        )
+        extracted_result = await chain.ainvoke({"user_response": user_response}, config)
+        email_address = extracted_result.email_address
+    logger.debug("Email extraction result: %s", "none" if email_address.lower() == "none" else "found")
 
     if email_address.lower() != "none":
         state.email = email_address
@@ -259,7 +345,7 @@ async def send_company_profile(
     state: AgentState, *, config: RunnableConfig
 ) -> dict[str, Any]:
     """Send company profile via email."""
-    send_email(state.email, format_docs(state.documents))
+    await asyncio.to_thread(send_email, state.email, format_docs(state.documents))
     
     return {
         "messages": [
@@ -271,16 +357,27 @@ async def send_company_profile(
 
 
 
+def timed_node(node: Any) -> Any:
+    """Record the latency of a node in the node_seconds histogram and the request trace."""
+
+    @functools.wraps(node)
+    async def wrapper(state: AgentState, **kwargs: Any) -> Any:
+        with NODE_SECONDS.time(node=node.__name__):
+            return await node(state, **kwargs)
+
+    return wrapper
+
+
 builder = StateGraph(AgentState, input=InputState, config_schema=AgentConfiguration)
-builder.add_node("initial_overview", initial_overview)
-builder.add_node("ask_user_interest", ask_user_interest)
-builder.add_node("check_user_interest", check_user_interest)
-builder.add_node("conduct_research", conduct_research)
-builder.add_node("ask_email_interest", ask_email_interest)
-builder.add_node("check_email_profile_interest", check_email_profile_interest)
-builder.add_node("collect_email", collect_email)
-builder.add_node("validate_email", validate_email)
-builder.add_node("send_company_profile", send_company_profile)
+builder.add_node("initial_overview", timed_node(initial_overview))
+builder.add_node("ask_user_interest", timed_node(ask_user_interest))
+builder.add_node("check_user_interest", timed_node(check_user_interest))
+builder.add_node("conduct_research", timed_node(conduct_research))
+builder.add_node("ask_email_interest", timed_node(ask_email_interest))
+builder.add_node("check_email_profile_interest", timed_node(check_email_profile_interest))
+builder.add_node("collect_email", timed_node(collect_email))
+builder.add_node("validate_email", timed_node(validate_email))
+builder.add_node("send_company_profile", timed_node(send_company_profile))
 
 
 builder.add_edge(START, "initial_overview")
@@ -316,11 +413,29 @@ builder.add_edge("collect_email", "validate_email")
 builder.add_edge("validate_email", "send_company_profile")
 builder.add_edge("send_company_profile", END)
 
-memory = MemorySaver()
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
+"""SQLite file for conversation checkpoints, relative to the working directory unless absolute."""
+
+
+def open_checkpointer(path: Optional[str] = None, max_sessions: int = 1000) -> SQLiteCheckpointSaver:
+    """Open the conversation checkpointer and attach it to `app`, closing any previous one.
+
+    Keeps the last 20 checkpoints per thread and drops threads idle for a week.
+    Decoded states are cached for up to twice `max_sessions` threads, so with
+    every session active each checkpoint still finds its parent and is stored
+    as a delta rather than a keyframe.
+    """
+    previous = app.checkpointer
+    app.checkpointer = SQLiteCheckpointSaver(
+        path or CHECKPOINT_PATH, keep_last=20, ttl=7 * 24 * 3600, state_cache_size=2 * max_sessions
+    )
+    if isinstance(previous, SQLiteCheckpointSaver):
+        previous.close()
+    return app.checkpointer
 
 
+# The checkpointer is attached at startup (see `open_checkpointer`), not on import.
 app = builder.compile(
-    checkpointer=memory, 
     interrupt_before=[
         "ask_user_interest", 
         "ask_email_interest",
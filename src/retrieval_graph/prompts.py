@@ -44,4 +44,30 @@ The plan should be 1-3 steps, focusing on:
 - Leadership team
 - Contact information"""
 
-GENERATE_QUERIES_SYSTEM_PROMPT = """Generate 3 diverse search queries to find relevant company information. Focus on different aspects of the question."""
\ No newline at end of file
+GENERATE_QUERIES_SYSTEM_PROMPT = """Generate 3 diverse search queries to find relevant company information. Focus on different aspects of the question."""
+
+# Interrupt replies
+USER_INTEREST_PROMPT = """You are a virtual assistant helping a user learn more about a product. 
+The user has been provided with an initial overview of the product. 
+Now, you need to determine if the user is interested in more detailed information about the company.
+Here is the user's response: {user_response}
+Based on this response, indicate if the user wants more detailed information about the company with a 'yes' or 'no'."""
+
+EMAIL_PROFILE_INTEREST_PROMPT = """You are a virtual assistant helping a user provide their email address.
+The user was asked to provide their email address to receive the company profile.
+Extract the email address from the user's response.
+
+If the user's response includes phrases like "I don't have email", "No email", "Not applicable", or any other indication that they do not want to provide an email, output 'None'.
+Otherwise, extract the email address and return it.
+
+User's response: {user_response}
+
+IF THE USER DID NOT PROVIDE AN EMAIL ADDRESS or IF IT DID NOT MATCH A COMMON EMAIL FORMAT, OUTPUT 'None'."""
+
+EMAIL_EXTRACTION_PROMPT = """You are a virtual assistant helping a user provide their email address.
+The user was asked to provide their email address to receive the company profile.
+Extract the email address from the user's response.
+
+User's response: {user_response}
+
+IF THE USER DID NOT PROVIDE AN EMAIL ADDRESS or IR DID NOT MATCH COMMON EMAIL FORMAT, OUTPUT 'None'."""
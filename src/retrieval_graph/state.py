@@ -5,13 +5,14 @@ definitions for agent state, input state, and router classification schema.
 """
 
 from dataclasses import dataclass, field
-from typing import Annotated, Literal, TypedDict
+from typing import Annotated, Literal, Sequence, TypedDict
 
 from langchain_core.documents import Document
 from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
 
-from ..shared.state import reduce_docs
+from ..shared.history import HistorySummary
+from ..shared.state import DocumentStore, reduce_docs
 
 
 # Optional, the InputState is a restricted version of the State that is used to
@@ -68,7 +69,10 @@ class AgentState(InputState):
     """State of the retrieval graph / agent."""
     router: Router = field(default_factory=lambda: Router(type="overview", logic=""))
     steps: list[str] = field(default_factory=list)
-    documents: Annotated[list[Document], reduce_docs] = field(default_factory=list)
+    documents: Annotated[Sequence[Document], reduce_docs] = field(default_factory=DocumentStore)
+    """Retrieved documents, one per content ID, as an append-only `DocumentStore`."""
+    history_summary: HistorySummary = field(default_factory=HistorySummary)
+    """Rolling summary of the messages older than the window sent to the response model."""
     email_collected: bool = field(default=False)
     needs_overview: bool = field(default=True)
     user_feedback: str = field(default="")
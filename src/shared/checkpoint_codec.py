@@ -0,0 +1,177 @@
+"""Delta encoding of checkpoints with msgspec.
+
+Every graph step checkpoints the whole `AgentState`, including the growing
+`messages` list and the retrieved `documents`. Serializing all of it each time
+makes checkpoint size and time grow with the length of the conversation.
+
+`DeltaCheckpointCodec` encodes a checkpoint relative to its parent instead:
+
+- channels whose value is the parent's object are recorded by name only;
+- list channels that extend the parent's list (messages) and `DocumentStore`
+  channels (documents) store the length of the shared prefix and the appended
+  items; for two versions of one store the prefix is known without comparing;
+- everything else is stored in full.
+
+Documents are stored once, in a content-addressed side table shared by all
+threads, and referenced from checkpoints by ID. A checkpoint without a usable
+parent is written as a keyframe, which decodes on its own.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import msgspec
+from langchain_core.documents import Document
+
+from ..shared.state import DocumentStore
+
+DOC_REF = "docref"
+
+
+class Item(msgspec.Struct, array_like=True):
+    """A value serialized with the checkpointer's serde, or a reference to a stored document."""
+
+    type: str
+    data: bytes
+
+
+class ListDelta(msgspec.Struct, array_like=True):
+    """A list channel as `parent[:keep] + append`, or a `DocumentStore` if `store`."""
+
+    keep: int
+    append: list[Item]
+    store: bool = False
+
+
+class DeltaRecord(msgspec.Struct, array_like=True):
+    """A checkpoint encoded relative to its parent (or on its own for a keyframe)."""
+
+    header: Item
+    values: dict[str, Item] = {}
+    lists: dict[str, ListDelta] = {}
+    unchanged: list[str] = []
+
+
+def _shared_prefix(old: Any, new: Any) -> int:
+    """Length of the common prefix of two sequences, comparing by identity first."""
+    if isinstance(old, DocumentStore) and isinstance(new, DocumentStore):
+        shared = new.shared_prefix(old)
+        if shared is not None:
+            return shared
+    limit = min(len(old), len(new))
+    for i in range(limit):
+        if old[i] is not new[i] and old[i] != new[i]:
+            return i
+    return limit
+
+
+_SEQUENCES = (list, DocumentStore)
+
+
+class DeltaCheckpointCodec:
+    """Encode checkpoints as msgspec deltas against their parent's channel values."""
+
+    def __init__(self, serde: Any, doc_cache_size: int = 4096) -> None:
+        self.serde = serde
+        self.doc_cache_size = doc_cache_size
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder(DeltaRecord)
+        self._docs: OrderedDict[str, Document] = OrderedDict()
+        # Checkpointers encode and decode from several worker threads at once.
+        self._docs_lock = threading.Lock()
+
+    def _item(self, value: Any, new_docs: list[tuple[str, str, bytes]]) -> Item:
+        type_, data = self.serde.dumps_typed(value)
+        if isinstance(value, Document):
+            key = hashlib.sha256(type_.encode() + b"\0" + data).hexdigest()[:32]
+            new_docs.append((key, type_, data))
+            self._remember_doc(key, value)
+            return Item(DOC_REF, key.encode())
+        return Item(type_, data)
+
+    def _value(self, item: Item, load_doc: Callable[[str], tuple[str, bytes]]) -> Any:
+        if item.type != DOC_REF:
+            return self.serde.loads_typed((item.type, item.data))
+        key = item.data.decode()
+        with self._docs_lock:
+            doc = self._docs.get(key)
+            if doc is not None:
+                self._docs.move_to_end(key)
+                return doc
+        doc = self.serde.loads_typed(load_doc(key))
+        self._remember_doc(key, doc)
+        return doc
+
+    def _remember_doc(self, key: str, doc: Document) -> None:
+        with self._docs_lock:
+            self._docs[key] = doc
+            self._docs.move_to_end(key)
+            while len(self._docs) > self.doc_cache_size:
+                self._docs.popitem(last=False)
+
+    def doc_refs(self, blob: bytes) -> set[str]:
+        """Keys of the stored documents a record references directly (not through its parent)."""
+        record = self._decoder.decode(blob)
+        items = [*record.values.values(), *(item for delta in record.lists.values() for item in delta.append)]
+        return {item.data.decode() for item in items if item.type == DOC_REF}
+
+    def encode(
+        self, checkpoint: dict[str, Any], parent_values: Optional[dict[str, Any]]
+    ) -> tuple[bytes, list[tuple[str, str, bytes]]]:
+        """Encode `checkpoint`; return the record and the documents it references.
+
+        With `parent_values` None the record is a keyframe.
+        """
+        new_docs: list[tuple[str, str, bytes]] = []
+        header = {key: value for key, value in checkpoint.items() if key != "channel_values"}
+        record = DeltaRecord(header=Item(*self.serde.dumps_typed(header)), values={}, lists={}, unchanged=[])
+        for channel, value in checkpoint["channel_values"].items():
+            if parent_values is not None and channel in parent_values:
+                previous = parent_values[channel]
+                if value is previous:
+                    record.unchanged.append(channel)
+                    continue
+                if isinstance(value, _SEQUENCES) and isinstance(previous, _SEQUENCES):
+                    keep = _shared_prefix(previous, value)
+                    record.lists[channel] = ListDelta(
+                        keep, [self._item(v, new_docs) for v in value[keep:]], isinstance(value, DocumentStore)
+                    )
+                    continue
+            if isinstance(value, _SEQUENCES):
+                record.lists[channel] = ListDelta(
+                    0, [self._item(v, new_docs) for v in value], isinstance(value, DocumentStore)
+                )
+            else:
+                record.values[channel] = self._item(value, new_docs)
+        return self._encoder.encode(record), new_docs
+
+    def decode(
+        self,
+        blob: bytes,
+        parent_values: Optional[dict[str, Any]],
+        load_doc: Callable[[str], tuple[str, bytes]],
+    ) -> dict[str, Any]:
+        """Rebuild a checkpoint from its record and its parent's channel values."""
+        record = self._decoder.decode(blob)
+        checkpoint = self.serde.loads_typed((record.header.type, record.header.data))
+        values: dict[str, Any] = {}
+        for channel in record.unchanged:
+            values[channel] = parent_values[channel]
+        for channel, delta in record.lists.items():
+            appended = [self._value(item, load_doc) for item in delta.append]
+            if delta.store:
+                parent = parent_values[channel] if delta.keep else DocumentStore()
+                if not isinstance(parent, DocumentStore):
+                    parent = DocumentStore(parent)
+                values[channel] = parent.prefix(delta.keep).extend(appended)
+            else:
+                base = list(parent_values[channel][: delta.keep]) if delta.keep else []
+                values[channel] = base + appended
+        for channel, item in record.values.items():
+            values[channel] = self._value(item, load_doc)
+        checkpoint["channel_values"] = values
+        return checkpoint
@@ -0,0 +1,180 @@
+"""Local fast-path classifiers for interrupt replies.
+
+Most replies to "would you like to know more?" or "what is your email?" are
+unambiguous ("yes", "no thanks", "jane@example.com"). These classifiers
+answer them deterministically with a confidence score, so the structured-output
+LLM call is only needed when the local answer is uncertain.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field
+
+AFFIRMATIVES = {
+    "yes": 1.0, "yeah": 1.0, "yep": 1.0, "yup": 1.0, "ya": 0.8, "y": 0.8, "sure": 1.0, "ok": 0.9,
+    "okay": 0.9, "k": 0.6, "please": 0.7, "absolutely": 1.0, "definitely": 1.0, "certainly": 1.0,
+    "of course": 1.0, "go ahead": 1.0, "sounds good": 1.0, "why not": 0.9, "tell me more": 1.0,
+    "i would": 0.8, "i'd like": 0.8, "i want": 0.7, "send it": 1.0, "go on": 0.9, "alright": 0.9,
+    "interested": 0.8, "yes please": 1.0, "sure thing": 1.0, "correct": 0.7, "👍": 1.0,
+    "don't mind": 0.9, "wouldn't mind": 0.9, "would not mind": 0.9,
+}
+
+NEGATIVES = {
+    "no": 1.0, "nope": 1.0, "nah": 1.0, "n": 0.8, "not now": 1.0, "no thanks": 1.0, "no thank you": 1.0,
+    "not interested": 1.0, "don't": 0.8, "do not": 0.8, "dont": 0.8, "never": 0.9, "skip": 0.9,
+    "maybe later": 0.9, "i'm good": 0.9, "im good": 0.9, "stop": 0.9, "not really": 1.0,
+    "i'm fine": 0.8, "pass": 0.8, "no need": 1.0, "i don't have": 0.9, "no email": 1.0, "👎": 1.0,
+}
+
+# Phrases that flip or blur the meaning of otherwise clear words.
+HEDGES = {
+    phrase: 1.0
+    for phrase in (
+        "not sure", "unsure", "not certain", "don't know", "dont know", "do not know", "no idea",
+        "maybe", "i guess", "depends", "what", "how", "why", "?", "but", "unless", "instead",
+    )
+}
+
+# Words that turn an adjacent affirmative into a refusal ("absolutely not", "I would not").
+NEGATORS = {"not", "never", "dont", "cannot"}
+
+EMAIL_PATTERN = re.compile(
+    r"(?<![\w.+-])"
+    r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@"
+    r"(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}"
+    r"(?![\w-])"
+)
+
+_TOKEN = re.compile(r"[\w']+|[^\w\s]")
+
+
+@dataclass(frozen=True)
+class Classification:
+    """A local classifier's answer and how sure it is of it."""
+
+    label: str
+    confidence: float
+
+
+def _is_negator(token: str) -> bool:
+    return token in NEGATORS or token.endswith("n't")
+
+
+def _affirmative_hits(text: str) -> tuple[float, float]:
+    """Score the affirmative phrases in `text`, split into plain and negated uses.
+
+    An affirmative directly preceded or followed by a negator ("not sure",
+    "of course not", "I would not") counts towards the refusal instead.
+    """
+    tokens = _TOKEN.findall(text)
+    padded = f" {' '.join(tokens)} "
+    plain = negated = 0.0
+    for phrase, weight in AFFIRMATIVES.items():
+        words = _TOKEN.findall(phrase)
+        if f" {' '.join(words)} " not in padded:
+            continue
+        size = len(words)
+        found_plain = found_negated = False
+        for i in range(len(tokens) - size + 1):
+            if tokens[i : i + size] != words:
+                continue
+            if (i > 0 and _is_negator(tokens[i - 1])) or (i + size < len(tokens) and _is_negator(tokens[i + size])):
+                found_negated = True
+            else:
+                found_plain = True
+        if found_plain:
+            plain = max(plain, weight) + 0.1 * min(plain, weight)
+        if found_negated:
+            negated = max(negated, weight) + 0.1 * min(negated, weight)
+    return plain, negated
+
+
+def _phrase_hits(text: str, lexicon: dict[str, float]) -> float:
+    """Score the strongest lexicon phrase found in `text`, matching whole tokens."""
+    padded = f" {' '.join(_TOKEN.findall(text))} "
+    score = 0.0
+    for phrase, weight in lexicon.items():
+        if f" {' '.join(_TOKEN.findall(phrase))} " in padded:
+            score = max(score, weight) + 0.1 * min(score, weight)
+    return score
+
+
+def classify_yes_no(text: str) -> Classification:
+    """Classify a reply as "yes" or "no".
+
+    Affirmative and negative lexicon scores are compared, with negated
+    affirmatives counted as negative; hedges, questions and long replies lower
+    the confidence so they fall through to the LLM.
+    """
+    normalized = text.strip().lower()
+    if not normalized:
+        return Classification("no", 0.0)
+
+    positive, negated = _affirmative_hits(normalized)
+    negative = _phrase_hits(normalized, NEGATIVES)
+    if negated:
+        negative = max(negative, negated) + 0.1 * min(negative, negated)
+    if positive == negative:
+        return Classification("no", 0.0)
+
+    label = "yes" if positive > negative else "no"
+    confidence = abs(positive - negative) / max(positive, negative)
+    confidence *= min(1.0, max(positive, negative))
+    if _phrase_hits(normalized, HEDGES):
+        confidence *= 0.5
+    words = len(normalized.split())
+    if words > 8:
+        confidence *= 8 / words
+    return Classification(label, round(min(confidence, 1.0), 3))
+
+
+def extract_email(text: str) -> Classification:
+    """Extract an email address, or "None" if the user declined to give one."""
+    found = list(dict.fromkeys(match.group(0).rstrip(".") for match in EMAIL_PATTERN.finditer(text)))
+    if len(found) == 1:
+        return Classification(found[0], 1.0)
+    if len(found) > 1:
+        return Classification(found[0], 0.3)
+    refusal = classify_yes_no(text)
+    if refusal.label == "no" and refusal.confidence > 0:
+        return Classification("None", refusal.confidence)
+    if "@" in text:
+        # Something email-like that doesn't parse; let the model look at it.
+        return Classification("None", 0.2)
+    return Classification("None", 0.5)
+
+
+@dataclass
+class FastPathStats:
+    """How often each local classifier answered without an LLM call."""
+
+    local: dict[str, int] = field(default_factory=dict)
+    fallback: dict[str, int] = field(default_factory=dict)
+
+    def hit_rate(self, name: str | None = None) -> float:
+        names = [name] if name else set(self.local) | set(self.fallback)
+        local = sum(self.local.get(n, 0) for n in names)
+        total = local + sum(self.fallback.get(n, 0) for n in names)
+        return local / total if total else 0.0
+
+
+class FastPath:
+    """Decide between the local answer and the LLM, and count the outcome."""
+
+    def __init__(self) -> None:
+        self.stats = FastPathStats()
+        self._lock = threading.Lock()
+
+    def accept(self, name: str, result: Classification, min_confidence: float) -> bool:
+        """Return True if `result` is confident enough to skip the LLM call."""
+        accepted = result.confidence >= min_confidence
+        counts = self.stats.local if accepted else self.stats.fallback
+        with self._lock:
+            counts[name] = counts.get(name, 0) + 1
+        return accepted
+
+
+fast_path = FastPath()
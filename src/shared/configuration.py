@@ -1,6 +1,7 @@
 """Define the configurable parameters for the agent."""
 
 from __future__ import annotations
+import os
 from dataclasses import dataclass, field, fields
 from typing import Annotated, Any, Literal, Optional, Type, TypeVar
 from langchain_core.runnables import RunnableConfig, ensure_config
@@ -12,7 +13,49 @@ class BaseConfiguration:
     embedding_model: Annotated[str, {"__template_metadata__": {"kind": "embeddings"}}] = field(
         default="openai/text-embedding-3-small",
         metadata={
-            "description": "Embedding model for company document vectorization."
+            "description": "Embedding model for company document vectorization, e.g. openai/text-embedding-3-small or fake/1536 for local testing."
+        },
+    )
+
+    embedding_cache: Literal["none", "memory", "sqlite"] = field(
+        default="sqlite",
+        metadata={
+            "description": "Where query embeddings are cached: not at all, in process memory, or in memory backed by SQLite."
+        },
+    )
+
+    embedding_cache_path: str = field(
+        default=".cache/embeddings.sqlite",
+        metadata={
+            "description": "SQLite file used when embedding_cache is 'sqlite'."
+        },
+    )
+
+    embedding_cache_size: int = field(
+        default=10_000,
+        metadata={
+            "description": "Maximum number of embeddings kept in memory (the SQLite store keeps 10x as many)."
+        },
+    )
+
+    embedding_cache_ttl: Optional[float] = field(
+        default=7 * 24 * 3600,
+        metadata={
+            "description": "Seconds before a cached embedding expires; None keeps entries until evicted by size."
+        },
+    )
+
+    embedding_batch_size: int = field(
+        default=64,
+        metadata={
+            "description": "Most query embeddings from concurrent requests sent to the provider in one call."
+        },
+    )
+
+    embedding_batch_wait_ms: float = field(
+        default=5.0,
+        metadata={
+            "description": "How long to gather concurrent embedding requests into a batch; 0 disables batching."
         },
     )
 
@@ -23,10 +66,24 @@ class BaseConfiguration:
         },
     )
 
+    index_path: str = field(
+        default=os.path.join(os.path.dirname(__file__), "index"),
+        metadata={
+            "description": "Directory holding the vector index."
+        },
+    )
+
+    index_type: Literal["flat", "ivf_flat", "ivf_pq", "hnsw", "sq8"] = field(
+        default="flat",
+        metadata={
+            "description": "Vector index searched: exact 'flat' scan, or the ANN index of this type trained at ingestion. Falls back to an exact scan if no matching ANN index was built."
+        },
+    )
+
     search_kwargs: dict[str, Any] = field(
         default_factory=lambda: {"k": 3},
         metadata={
-            "description": "Search parameters for document retrieval"
+            "description": "Search parameters for document retrieval, e.g. k, and nprobe (IVF) or ef_search (HNSW) for ANN indexes"
         },
     )
 
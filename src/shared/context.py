@@ -0,0 +1,160 @@
+"""Token-budgeted assembly of retrieved documents into prompt context.
+
+`build_context` turns a ranked list of retrieved chunks into the compact text
+placed in a prompt:
+
+1. near-duplicate chunks (word 3-shingle Jaccard similarity at or above
+   `duplicate_threshold`) are dropped, keeping the better-ranked copy;
+2. the rest are ordered by maximal marginal relevance, trading rank (or a
+   `score` in the metadata) against word overlap with chunks already chosen;
+3. chunks are added in that order until `max_tokens` is reached, the last
+   one truncated if at least `MIN_PARTIAL_TOKENS` still fit;
+4. the result is rendered with `format_docs`, keeping only the `source` file
+   name and `page` metadata.
+
+Tokens are counted with tiktoken when it is installed and its encoding is
+available offline, and estimated from word and punctuation counts otherwise.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from langchain_core.documents import Document
+
+from ..shared.utils import format_docs
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_ENCODING = "o200k_base"
+MIN_PARTIAL_TOKENS = 64
+CONTEXT_METADATA = ("source", "page")
+
+_WORD = re.compile(r"\w+")
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Any:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:  # not installed, or the encoding file cannot be fetched offline
+        logger.info("tiktoken unavailable (%s); estimating token counts", e)
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text` for the response model's tokenizer (or an estimate)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_PIECE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Return the longest prefix of `text` with at most `max_tokens` tokens."""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    pieces = list(_PIECE.finditer(text))
+    return text if len(pieces) <= max_tokens else text[: pieces[max_tokens].start()]
+
+
+def messages_tokens(messages: Iterable[Any]) -> int:
+    """Tokens in the text content of chat messages, as sent to the model."""
+    return sum(count_tokens(m.content) for m in messages if isinstance(getattr(m, "content", None), str))
+
+
+@dataclass
+class ContextStats:
+    """What `build_context` kept from the retrieved documents."""
+
+    retrieved: int = 0
+    unique: int = 0
+    used: int = 0
+    truncated: bool = False
+    tokens: int = 0
+
+
+def _shingles(words: list[str], size: int = 3) -> frozenset:
+    if len(words) < size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i : i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _relevance(doc: Document, rank: int, total: int) -> float:
+    score = doc.metadata.get("score")
+    return float(score) if isinstance(score, (int, float)) else 1.0 - rank / max(total, 1)
+
+
+def _compact(doc: Document, page_content: Optional[str] = None) -> Document:
+    metadata = {key: doc.metadata[key] for key in CONTEXT_METADATA if doc.metadata.get(key) not in (None, "")}
+    if isinstance(metadata.get("source"), str):
+        metadata["source"] = os.path.basename(metadata["source"])
+    return Document(page_content=doc.page_content if page_content is None else page_content, metadata=metadata)
+
+
+def build_context(
+    docs: Optional[list[Document]],
+    max_tokens: int,
+    *,
+    mmr_lambda: float = 0.7,
+    duplicate_threshold: float = 0.85,
+) -> tuple[str, ContextStats]:
+    """Render `docs` (best first) as deduplicated, MMR-ordered context of at most about `max_tokens` tokens."""
+    docs = list(docs or [])
+    stats = ContextStats(retrieved=len(docs))
+
+    candidates: list[tuple[Document, float, frozenset, frozenset]] = []
+    for rank, doc in enumerate(docs):
+        words = _WORD.findall(doc.page_content.lower())
+        shingles = _shingles(words)
+        if any(_jaccard(shingles, kept[2]) >= duplicate_threshold for kept in candidates):
+            continue
+        candidates.append((doc, _relevance(doc, rank, len(docs)), shingles, frozenset(words)))
+    stats.unique = len(candidates)
+
+    ordered: list[tuple[Document, float, frozenset, frozenset]] = []
+    while candidates:
+        best = max(
+            candidates,
+            key=lambda c: mmr_lambda * c[1]
+            - (1 - mmr_lambda) * max((_jaccard(c[3], chosen[3]) for chosen in ordered), default=0.0),
+        )
+        candidates.remove(best)
+        ordered.append(best)
+
+    # format_docs wraps the documents in <documents> tags, one document per line block.
+    wrapper = count_tokens("<documents>\n\n</documents>")
+    selected: list[Document] = []
+    remaining = max_tokens - wrapper
+    for doc, *_ in ordered:
+        compact = _compact(doc)
+        tokens = count_tokens(format_docs([compact])) - wrapper + 1
+        if tokens <= remaining:
+            selected.append(compact)
+            remaining -= tokens
+            continue
+        overhead = tokens - count_tokens(compact.page_content)
+        if remaining - overhead >= MIN_PARTIAL_TOKENS:
+            selected.append(_compact(doc, truncate_tokens(doc.page_content, remaining - overhead)))
+            stats.truncated = True
+        break
+
+    context = format_docs(selected)
+    stats.used = len(selected)
+    stats.tokens = count_tokens(context)
+    return context, stats
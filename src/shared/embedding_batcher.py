@@ -0,0 +1,124 @@
+"""Cross-request micro-batching of embedding calls.
+
+Concurrent coroutines (one per websocket session) each embed a single query.
+`MicroBatchingEmbeddings` holds those requests for a short window, sends them
+to the underlying model as one `aembed_documents` call, and resolves each
+caller's future with its own vector.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class BatcherStats:
+    """Batch size and queue wait metrics for a micro-batcher."""
+
+    batches: int = 0
+    items: int = 0
+    max_batch_size: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    errors: int = 0
+    batch_sizes: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.items if self.items else 0.0
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Embeddings wrapper that coalesces concurrent async requests into batches.
+
+    A batch is sent once `max_batch_size` texts are queued or `max_wait`
+    seconds after the first one arrived, whichever comes first. Synchronous
+    calls go straight to the underlying model.
+    """
+
+    def __init__(self, underlying: Embeddings, max_batch_size: int = 64, max_wait: float = 0.005) -> None:
+        self.underlying = underlying
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = BatcherStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._submit(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        (vector,) = await self._submit([text])
+        return vector
+
+    async def _submit(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures belong to one event loop; start afresh if we moved loops.
+            self._loop, self._pending, self._timer = loop, [], None
+        now = time.perf_counter()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future, now))
+            futures.append(future)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future, float]]) -> None:
+        now = time.perf_counter()
+        waits = [now - queued_at for _, _, queued_at in batch]
+        stats = self.stats
+        stats.batches += 1
+        stats.items += len(batch)
+        stats.max_batch_size = max(stats.max_batch_size, len(batch))
+        stats.batch_sizes[len(batch)] = stats.batch_sizes.get(len(batch), 0) + 1
+        stats.total_wait += sum(waits)
+        stats.max_wait = max(stats.max_wait, *waits)
+
+        # The same text from several callers is only embedded once.
+        unique = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = dict(zip(unique, await self.underlying.aembed_documents(unique)))
+        except Exception as e:
+            stats.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[text])
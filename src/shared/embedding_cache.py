@@ -0,0 +1,270 @@
+"""Persistent cache for text embeddings.
+
+`CachedEmbeddings` wraps any `Embeddings` with an in-memory LRU in front of an
+optional SQLite store, so repeated questions and the graph's fixed retrieval
+queries are embedded once rather than on every session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different spellings share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Return the cache key for `text` embedded with `model`."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for an embedding cache."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+
+class SQLiteEmbeddingStore:
+    """On-disk key/vector store with TTL and size-bounded eviction."""
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed_at)")
+        # Kept up to date by every write, so eviction never scans the table.
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[float, list[float]]]:
+        """Return the stored, unexpired `(created_at, vector)` pairs for `keys`."""
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            found, expired = {}, []
+            for key, blob, created_at in rows:
+                if self.ttl is not None and now - created_at > self.ttl:
+                    expired.append(key)
+                else:
+                    found[key] = (created_at, array("f", blob).tolist())
+            if expired:
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k in expired])
+                self._count -= len(expired)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE key = ?", [(now, k) for k in found]
+                )
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> int:
+        """Store vectors and evict least recently used rows; return the number evicted."""
+        if not items:
+            return 0
+        now = time.time()
+        keys = list(items)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                (replaced,) = self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys
+                ).fetchone()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    [(key, array("f", vector).tobytes(), now, now) for key, vector in items.items()],
+                )
+                count = self._count + len(keys) - replaced
+                evicted = 0
+                if self.ttl is not None:
+                    evicted += self._conn.execute(
+                        "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl,)
+                    ).rowcount
+                if count - evicted > self.max_entries:
+                    evicted += self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                        (count - evicted - self.max_entries,),
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._count = count - evicted
+        return evicted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-memory LRU and an optional on-disk store."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        store: Optional[SQLiteEmbeddingStore] = None,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.underlying = underlying
+        self.model = model
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memory_lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                created_at, vector = entry
+                if self.ttl is not None and now - created_at > self.ttl:
+                    del self._memory[key]
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = vector
+            self.stats.memory_hits += len(found)
+        return found
+
+    def _disk_hits(self, from_disk: dict[str, tuple[float, list[float]]]) -> dict[str, list[float]]:
+        self._remember(from_disk)
+        with self._lock:
+            self.stats.disk_hits += len(from_disk)
+        return {key: vector for key, (_, vector) in from_disk.items()}
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = self._memory_lookup(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if self.store is not None and missing:
+            found.update(self._disk_hits(self.store.get_many(missing)))
+        return found
+
+    async def _alookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = self._memory_lookup(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if self.store is not None and missing:
+            found.update(self._disk_hits(await asyncio.to_thread(self.store.get_many, missing)))
+        return found
+
+    def _remember(self, entries: dict[str, tuple[float, list[float]]]) -> None:
+        """Add `(created_at, vector)` entries; disk hits keep their original age so reads do not extend the TTL."""
+        with self._lock:
+            for key, entry in entries.items():
+                self._memory[key] = entry
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _count_evictions(self, evicted: int) -> None:
+        with self._lock:
+            self.stats.evictions += evicted
+
+    def _store(self, vectors: dict[str, list[float]]) -> None:
+        now = time.time()
+        self._remember({key: (now, vector) for key, vector in vectors.items()})
+        if self.store is not None:
+            self._count_evictions(self.store.put_many(vectors))
+
+    async def _astore(self, vectors: dict[str, list[float]]) -> None:
+        now = time.time()
+        self._remember({key: (now, vector) for key, vector in vectors.items()})
+        if self.store is not None:
+            self._count_evictions(await asyncio.to_thread(self.store.put_many, vectors))
+
+    def _misses(self, keys: list[str], found: dict[str, list[float]]) -> list[str]:
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        with self._lock:
+            self.stats.misses += len(missing)
+        return missing
+
+    def _split(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], list[str]]:
+        keys = [cache_key(self.model, text) for text in texts]
+        found = self._lookup(keys)
+        return keys, found, self._misses(keys, found)
+
+    async def _asplit(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], list[str]]:
+        keys = [cache_key(self.model, text) for text in texts]
+        found = await self._alookup(keys)
+        return keys, found, self._misses(keys, found)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            text_for = dict(zip(keys, texts))
+            vectors = self.underlying.embed_documents([text_for[key] for key in missing])
+            computed = dict(zip(missing, vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        keys, found, missing = self._split([text])
+        if missing:
+            vector = self.underlying.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = await self._asplit(texts)
+        if missing:
+            text_for = dict(zip(keys, texts))
+            vectors = await self.underlying.aembed_documents([text_for[key] for key in missing])
+            computed = dict(zip(missing, vectors))
+            await self._astore(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        keys, found, missing = await self._asplit([text])
+        if missing:
+            vector = await self.underlying.aembed_query(text)
+            await self._astore({keys[0]: vector})
+            return vector
+        return found[keys[0]]
@@ -0,0 +1,517 @@
+"""Pickle-free, memory-mapped vector index format.
+
+An index named `index` is stored as four files in one directory:
+
+- `index.header.json`: format version, vector count, dimension, metric and build ID.
+- `index.vectors`: raw little-endian float32 vectors, one row per document.
+- `index.offsets`: `count + 1` uint64 byte offsets into the document blob.
+- `index.docs`: UTF-8 JSON records (`id`, `page_content`, `metadata`) back to back.
+
+Every file is opened read-only with `mmap`, so forked workers share the same
+physical pages and opening an index costs the same regardless of its size.
+
+Optionally an approximate nearest-neighbour index trained over the same
+vectors (`index.ann.faiss`, described by `index.ann.json`) is searched instead
+of scanning every vector; see `build_ann_index` and `INDEX_TYPES`. The ANN
+index records a fingerprint of the flat files it was built from and is
+ignored once they are rewritten, even with the same number of vectors.
+
+Convert an existing `FAISS.save_local` index with:
+
+    python -m src.shared.flat_index convert src/shared/index --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import uuid
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SUFFIXES = ("header.json", "vectors", "offsets", "docs")
+ANN_SUFFIXES = ("ann.json", "ann.faiss")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
+"""Index types: exact scan, or FAISS IVF-Flat, IVF-PQ, HNSW and 8-bit scalar quantization."""
+
+
+def index_files(index_path: str, index_name: str = "index") -> list[str]:
+    """Return the paths of the files making up a flat index."""
+    return [os.path.join(index_path, f"{index_name}.{suffix}") for suffix in SUFFIXES]
+
+
+def ann_files(index_path: str, index_name: str = "index") -> list[str]:
+    """Return the paths of the optional ANN index files."""
+    return [os.path.join(index_path, f"{index_name}.{suffix}") for suffix in ANN_SUFFIXES]
+
+
+def exists(index_path: str, index_name: str = "index") -> bool:
+    """Check whether a complete flat index is present at `index_path`."""
+    return all(os.path.exists(path) for path in index_files(index_path, index_name))
+
+
+class FlatIndexWriter:
+    """Write a flat index incrementally, one batch of vectors at a time.
+
+    Data goes to temporary files beside the destination and only a constant
+    amount of it is held in memory. `close` moves the data files into place and
+    writes the header last, so a reader never sees a header describing data
+    that has not been written yet.
+    """
+
+    def __init__(self, index_path: str, index_name: str = "index", metric: str = "l2") -> None:
+        if metric not in ("l2", "ip"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        os.makedirs(index_path, exist_ok=True)
+        self.paths = index_files(index_path, index_name)
+        self.metric = metric
+        self.count = 0
+        self.dim: Optional[int] = None
+        _, vectors_path, offsets_path, docs_path = self.paths
+        self._vectors = open(f"{vectors_path}.tmp", "wb")
+        self._offsets = open(f"{offsets_path}.tmp", "wb")
+        self._docs = open(f"{docs_path}.tmp", "wb")
+        self._offsets.write(np.zeros(1, dtype="<u8").tobytes())
+
+    def add(self, vectors: Any, documents: Iterable[tuple[str, Document]]) -> None:
+        """Append vectors and their `(id, Document)` pairs."""
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        if vectors.ndim != 2:
+            raise ValueError("Expected a 2-D array of vectors")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim and len(vectors):
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        offsets = []
+        for doc_id, doc in documents:
+            record = {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+            self._docs.write(json.dumps(record, ensure_ascii=False).encode())
+            offsets.append(self._docs.tell())
+        if len(offsets) != len(vectors):
+            raise ValueError(f"Got {len(offsets)} documents for {len(vectors)} vectors")
+        self._vectors.write(vectors.tobytes())
+        self._offsets.write(np.asarray(offsets, dtype="<u8").tobytes())
+        self.count += len(vectors)
+
+    def close(self) -> int:
+        """Publish the index and return the number of vectors written."""
+        header_path, *data_paths = self.paths
+        for f in (self._vectors, self._offsets, self._docs):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        for path in data_paths:
+            os.replace(f"{path}.tmp", path)
+
+        header = {
+            "format": "flat-mmap",
+            "version": FORMAT_VERSION,
+            "count": self.count,
+            "dim": self.dim or 0,
+            "metric": self.metric,
+            "build": uuid.uuid4().hex,
+        }
+        with open(f"{header_path}.tmp", "wb") as f:
+            f.write(json.dumps(header).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{header_path}.tmp", header_path)
+        return self.count
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        for f, path in zip((self._vectors, self._offsets, self._docs), self.paths[1:]):
+            f.close()
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+
+    def __enter__(self) -> "FlatIndexWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_index(
+    index_path: str,
+    vectors: np.ndarray,
+    documents: Iterable[tuple[str, Document]],
+    index_name: str = "index",
+    metric: str = "l2",
+) -> None:
+    """Write vectors and their `(id, Document)` pairs as a flat index."""
+    with FlatIndexWriter(index_path, index_name, metric) as writer:
+        writer.add(vectors, documents)
+
+
+class MmapVectorStore(VectorStore):
+    """Read-only vector store over a memory-mapped flat index.
+
+    Searches the ANN index when one was built, and scans every vector exactly
+    otherwise or when `index_type="flat"` is passed to the search.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Optional[Embeddings],
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        metric: str = "l2",
+        ann: Any = None,
+        ann_type: str = "flat",
+    ) -> None:
+        self.embedding_function = embedding_function
+        self.vectors = vectors
+        self.offsets = offsets
+        self.docs = docs
+        self.metric = metric
+        self.ann = ann
+        self.ann_type = ann_type if ann is not None else "flat"
+        self._norms: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(
+        cls,
+        index_path: str,
+        embeddings: Optional[Embeddings] = None,
+        index_name: str = "index",
+        load_ann: bool = True,
+    ) -> "MmapVectorStore":
+        """Memory-map a flat index written by `write_index`."""
+        header_path, vectors_path, offsets_path, docs_path = index_files(index_path, index_name)
+        with open(header_path, "rb") as f:
+            header = json.load(f)
+        if header.get("format") != "flat-mmap" or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index header in {header_path}: {header}")
+
+        count, dim = header["count"], header["dim"]
+        if os.path.getsize(vectors_path) != count * dim * 4:
+            raise ValueError(f"{vectors_path} does not match header ({count} x {dim})")
+        if os.path.getsize(offsets_path) != (count + 1) * 8:
+            raise ValueError(f"{offsets_path} does not match header ({count} documents)")
+
+        def mmap(path: str, dtype: str, shape: tuple) -> np.ndarray:
+            if not all(shape):
+                return np.zeros(shape, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+        vectors = mmap(vectors_path, "<f4", (count, dim))
+        offsets = mmap(offsets_path, "<u8", (count + 1,))
+        docs = mmap(docs_path, "u1", (os.path.getsize(docs_path),))
+        ann, ann_type = _load_ann(index_path, index_name, count) if load_ann else (None, "flat")
+        return cls(embeddings, vectors, offsets, docs, metric=header["metric"], ann=ann, ann_type=ann_type)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def get_record(self, i: int) -> dict[str, Any]:
+        """Decode the stored record for row `i`."""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self.docs[start:end].tobytes())
+
+    def get_document(self, i: int) -> Document:
+        """Return the `Document` stored at row `i`."""
+        record = self.get_record(i)
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """Return (queries x rows) distances (l2, lower is closer) or similarities (ip)."""
+        dots = queries @ self.vectors.T
+        if self.metric == "ip":
+            return dots
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        return self._norms[None, :] - 2 * dots + np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    def search_rows(
+        self,
+        embedding: list[float],
+        k: int,
+        index_type: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> list[tuple[int, float]]:
+        """Return `(row, score)` for the `k` best rows, best first, like FAISS.
+
+        The ANN index is used unless `index_type` asks for a different one;
+        `nprobe` (IVF) and `ef_search` (HNSW) trade recall for speed per query.
+        """
+        return self.search_rows_batch([embedding], k, index_type, nprobe, ef_search)[0]
+
+    def search_rows_batch(
+        self,
+        embeddings: Any,
+        k: int,
+        index_type: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Like `search_rows`, for a matrix of queries searched in one vectorized pass."""
+        queries = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        n = len(self)
+        if n == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        k = min(k, n)
+        if self.ann is not None and index_type in (None, self.ann_type):
+            return self._search_ann(queries, k, nprobe, ef_search)
+        scores = self._scores(queries)
+        order = -scores if self.metric == "ip" else scores
+        top = np.argpartition(order, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(queries), 1))
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(order, top, axis=1), axis=1, kind="stable"), axis=1)
+        return [[(int(i), float(scores[q, i])) for i in row] for q, row in enumerate(top)]
+
+    def _search_ann(
+        self, queries: np.ndarray, k: int, nprobe: Optional[int], ef_search: Optional[int]
+    ) -> list[list[tuple[int, float]]]:
+        import faiss
+
+        # Per-query parameters instead of mutating the shared index keep
+        # concurrent searches with different settings independent.
+        params = None
+        if nprobe is not None and faiss.try_extract_index_ivf(self.ann) is not None:
+            params = faiss.SearchParametersIVF(nprobe=nprobe)
+        elif ef_search is not None and isinstance(self.ann, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=max(ef_search, k))
+        distances, rows = self.ann.search(queries, k, params=params)
+        return [
+            [(int(i), float(d)) for i, d in zip(row, dist) if i >= 0] for row, dist in zip(rows, distances)
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[dict[str, Any]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        rows = self.search_rows(
+            embedding,
+            fetch_k if filter else k,
+            index_type=kwargs.get("index_type"),
+            nprobe=kwargs.get("nprobe"),
+            ef_search=kwargs.get("ef_search"),
+        )
+        results = []
+        for i, score in rows:
+            doc = self.get_document(i)
+            if filter and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            results.append((doc, score))
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            keep = (lambda s: s >= score_threshold) if self.metric == "ip" else (lambda s: s <= score_threshold)
+            results = [(doc, score) for doc, score in results if keep(score)]
+        return results[:k]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        if self.metric == "ip":
+            return self._max_inner_product_relevance_score_fn
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[list[dict]] = None, **kwargs: Any) -> list[str]:
+        raise NotImplementedError("MmapVectorStore is read-only; rebuild the index to add documents")
+
+    @classmethod
+    def from_texts(
+        cls, texts: list[str], embedding: Embeddings, metadatas: Optional[list[dict]] = None, **kwargs: Any
+    ) -> "MmapVectorStore":
+        raise NotImplementedError("Build a FAISS index and convert it with convert_faiss_index")
+
+
+def data_fingerprint(index_path: str, index_name: str = "index") -> str:
+    """Identify one build of the flat files: the header (with its build ID) and the data files' sizes and mtimes."""
+    header_path, *data_paths = index_files(index_path, index_name)
+    digest = hashlib.sha256()
+    with open(header_path, "rb") as f:
+        digest.update(f.read())
+    for path in data_paths:
+        stat = os.stat(path)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def _ann_factory(index_type: str, count: int, dim: int, nlist: Optional[int], pq_m: int, hnsw_m: int) -> str:
+    """Return the FAISS index factory string for an index type."""
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # FAISS wants roughly 39+ training points per list.
+        nlist = nlist or int(4 * np.sqrt(count))
+        nlist = max(1, min(nlist, count // 39))
+        if index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        # PQ sub-quantizers must divide the dimension.
+        m = max(d for d in range(1, min(pq_m, dim) + 1) if dim % d == 0)
+        return f"IVF{nlist},PQ{m}x8"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    if index_type == "sq8":
+        return "SQ8"
+    raise ValueError(f"Unsupported index type: {index_type}")
+
+
+def build_ann_index(
+    index_path: str,
+    index_name: str = "index",
+    index_type: str = "flat",
+    nlist: Optional[int] = None,
+    pq_m: int = 64,
+    hnsw_m: int = 32,
+    train_size: int = 100_000,
+    add_batch_size: int = 65_536,
+) -> Optional[str]:
+    """Train an ANN index over the vectors of a flat index and store it beside them.
+
+    Vectors are read from the memory map in batches, so only the training
+    sample is ever fully resident. With `index_type="flat"` any previous ANN
+    index is removed. Returns the FAISS factory string used, if any.
+    """
+    import faiss
+
+    meta_path, faiss_path = ann_files(index_path, index_name)
+    # Taken before reading, so a flat index rewritten during the build leaves this ANN index stale.
+    fingerprint = data_fingerprint(index_path, index_name)
+    store = MmapVectorStore.load(index_path, index_name=index_name, load_ann=False)
+    if index_type == "flat" or len(store) == 0:
+        for path in (meta_path, faiss_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    count, dim = store.vectors.shape
+    factory = _ann_factory(index_type, count, dim, nlist, pq_m, hnsw_m)
+    metric = faiss.METRIC_INNER_PRODUCT if store.metric == "ip" else faiss.METRIC_L2
+    index = faiss.index_factory(dim, factory, metric)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, size=min(count, train_size), replace=False))
+        index.train(np.ascontiguousarray(store.vectors[sample]))
+    for start in range(0, count, add_batch_size):
+        index.add(np.ascontiguousarray(store.vectors[start : start + add_batch_size]))
+
+    faiss.write_index(index, f"{faiss_path}.tmp")
+    os.replace(f"{faiss_path}.tmp", faiss_path)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump({"index_type": index_type, "factory": factory, "count": count, "fingerprint": fingerprint}, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return factory
+
+
+def _load_ann(index_path: str, index_name: str, count: int) -> tuple[Any, str]:
+    """Load the ANN index beside a flat index if it matches the flat data."""
+    meta_path, faiss_path = ann_files(index_path, index_name)
+    if not (os.path.exists(meta_path) and os.path.exists(faiss_path)):
+        return None, "flat"
+    import faiss
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("fingerprint") != data_fingerprint(index_path, index_name):
+        logger.warning("Ignoring stale ANN index at %s (built from other flat data)", faiss_path)
+        return None, "flat"
+    index = faiss.read_index(faiss_path)
+    if meta.get("count") != count or index.ntotal != count:
+        logger.warning("Ignoring stale ANN index at %s (%d vectors, expected %d)", faiss_path, index.ntotal, count)
+        return None, "flat"
+    return index, meta["index_type"]
+
+
+def convert_faiss_index(index_path: str, out_path: Optional[str] = None, index_name: str = "index") -> None:
+    """Convert a `FAISS.save_local` index (index.faiss + index.pkl) to the flat format."""
+    import faiss
+
+    out_path = out_path or index_path
+    index = faiss.read_index(os.path.join(index_path, f"{index_name}.faiss"))
+    with open(os.path.join(index_path, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), np.float32)
+    metric = "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+    def documents() -> Iterable[tuple[str, Document]]:
+        for i in range(index.ntotal):
+            doc_id = index_to_docstore_id[i]
+            yield doc_id, docstore.search(doc_id)
+
+    write_index(out_path, vectors, documents(), index_name=index_name, metric=metric)
+
+
+def verify_conversion(index_path: str, out_path: Optional[str] = None, index_name: str = "index", samples: int = 50, k: int = 4) -> int:
+    """Check that both formats return the same results; return the number of mismatches.
+
+    Stored vectors are used as queries, so no embedding calls are made.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    original = FAISS.load_local(index_path, None, index_name=index_name, allow_dangerous_deserialization=True)
+    converted = MmapVectorStore.load(out_path or index_path, index_name=index_name)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(converted), size=min(samples, len(converted)), replace=False)
+
+    mismatches = 0
+    for row in rows:
+        query = np.asarray(converted.vectors[row]).tolist()
+        expected = original.similarity_search_with_score_by_vector(query, k=k)
+        actual = converted.similarity_search_with_score_by_vector(query, k=k)
+        same = [doc.page_content for doc, _ in expected] == [doc.page_content for doc, _ in actual] and np.allclose(
+            [s for _, s in expected], [s for _, s in actual], rtol=1e-4, atol=1e-4
+        )
+        mismatches += not same
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage memory-mapped flat indexes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="Convert a FAISS save_local index.")
+    convert.add_argument("index_path")
+    convert.add_argument("--out", default=None, help="Output directory (defaults to index_path).")
+    convert.add_argument("--index-name", default="index")
+    convert.add_argument("--verify", action="store_true", help="Compare search results of both formats.")
+    args = parser.parse_args()
+
+    convert_faiss_index(args.index_path, args.out, args.index_name)
+    print(f"Converted {args.index_path} to flat format")
+    if args.verify:
+        mismatches = verify_conversion(args.index_path, args.out, args.index_name)
+        print("Search results identical" if not mismatches else f"{mismatches} queries differ")
+        raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
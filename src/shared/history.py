@@ -0,0 +1,183 @@
+"""Token-budgeted conversation history with a rolling summary.
+
+`add_messages` only appends, so `state.messages` grows for as long as a
+thread lives. Instead of sending all of it, nodes send `manage_history`'s
+window:
+
+1. the last `max_turns` turns verbatim (a turn starts at each human
+   message), fewer if they do not fit in `max_tokens` (the newest turn is
+   always kept);
+2. before them, one system message with a summary of everything older.
+
+The summary is kept in the graph state as a `HistorySummary` and refreshed
+incrementally: turns leaving the window are folded into the previous summary
+with one model call, at least `fold_batch` turns at a time, and only the
+messages after the summary are ever scanned or counted. With no summary
+model, or if the call fails, the folded turns are appended as short
+extractive lines and the oldest lines are dropped to stay within budget.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+from ..shared.context import count_tokens, messages_tokens, truncate_tokens
+from ..shared.metrics import HISTORY_FOLDS
+
+logger = logging.getLogger(__name__)
+
+FOLDED_MESSAGE_TOKENS = 500
+EXTRACTIVE_LINE_TOKENS = 60
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a company's product assistant.
+Update the current summary with the new messages. Keep what the user asked for, what they were told, \
+their decisions and any details they gave (such as an email address). Drop greetings and repetition.
+Reply with the updated summary only, in at most {max_tokens} tokens."""
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+_ROLES = {"human": "User", "ai": "Assistant", "system": "System", "tool": "Tool"}
+
+
+@dataclass
+class HistorySummary:
+    """Rolling summary of the leading messages no longer sent verbatim."""
+
+    text: str = ""
+    covered: int = 0
+    """Number of leading messages folded into `text`."""
+    last_id: Optional[str] = None
+    """ID of the last folded message, to notice a history rewritten since."""
+
+    def matches(self, messages: Sequence[BaseMessage]) -> bool:
+        if self.covered == 0:
+            return True
+        return self.covered <= len(messages) and messages[self.covered - 1].id == self.last_id
+
+
+@dataclass
+class HistoryWindow:
+    """The turns `plan_window` keeps verbatim."""
+
+    start: int
+    """Index of the first message sent verbatim; everything before it is summarized."""
+    turns: int
+    tokens: int
+
+
+def _turn_starts(messages: Sequence[BaseMessage], start: int) -> list[int]:
+    return [start] + [i for i in range(start + 1, len(messages)) if isinstance(messages[i], HumanMessage)]
+
+
+def plan_window(
+    messages: Sequence[BaseMessage],
+    summary: HistorySummary,
+    *,
+    max_turns: int,
+    max_tokens: int,
+    fold_batch: int = 1,
+) -> HistoryWindow:
+    """Choose the turns sent verbatim; `summary` must match `messages`."""
+    start = summary.covered
+    if start >= len(messages):
+        return HistoryWindow(start=start, turns=0, tokens=0)
+    starts = _turn_starts(messages, start)
+    ends = starts[1:] + [len(messages)]
+    turn_tokens = [messages_tokens(messages[s:e]) for s, e in zip(starts, ends)]
+
+    excess = len(starts) - max(1, max_turns)
+    folded = excess if excess >= max(1, fold_batch) else 0
+    tokens = sum(turn_tokens[folded:])
+    while tokens > max_tokens and folded < len(starts) - 1:
+        tokens -= turn_tokens[folded]
+        folded += 1
+    return HistoryWindow(start=starts[folded], turns=len(starts) - folded, tokens=tokens)
+
+
+def _transcript(messages: Sequence[BaseMessage], max_tokens: int) -> list[str]:
+    lines = []
+    for message in messages:
+        if isinstance(message.content, str) and message.content.strip():
+            content = truncate_tokens(" ".join(message.content.split()), max_tokens)
+            lines.append(f"{_ROLES.get(message.type, message.type)}: {content}")
+    return lines
+
+
+def extractive_summary(previous: str, messages: Sequence[BaseMessage], max_tokens: int) -> str:
+    """Append a short line per folded message to `previous`, dropping the oldest lines beyond `max_tokens`."""
+    lines = (previous.splitlines() if previous else []) + _transcript(messages, EXTRACTIVE_LINE_TOKENS)
+    counts = [count_tokens(line) + 1 for line in lines]
+    total = sum(counts)
+    first = 0
+    while total > max_tokens and first < len(lines):
+        total -= counts[first]
+        first += 1
+    return "\n".join(lines[first:])
+
+
+async def fold(
+    summary: HistorySummary,
+    messages: Sequence[BaseMessage],
+    end: int,
+    *,
+    max_tokens: int,
+    model: Optional[BaseChatModel] = None,
+    config: Optional[RunnableConfig] = None,
+) -> HistorySummary:
+    """Return `summary` extended with `messages[summary.covered:end]`."""
+    folded = messages[summary.covered : end]
+    text = None
+    if model is not None:
+        request = "Current summary:\n{}\n\nNew messages:\n{}".format(
+            summary.text or "(none)", "\n".join(_transcript(folded, FOLDED_MESSAGE_TOKENS))
+        )
+        try:
+            # Tagged so the summary is not streamed to the client as part of the turn.
+            response = await model.with_config(tags=["nostream"]).ainvoke(
+                [SystemMessage(content=SUMMARY_PROMPT.format(max_tokens=max_tokens)), HumanMessage(content=request)],
+                config,
+            )
+            text = truncate_tokens(str(response.content).strip(), max_tokens)
+        except Exception as e:
+            logger.warning("History summary failed (%s: %s); using an extractive summary", type(e).__name__, e)
+    method = "model" if text else "extractive"
+    if not text:
+        text = extractive_summary(summary.text, folded, max_tokens)
+    HISTORY_FOLDS.inc(sum(isinstance(m, HumanMessage) for m in folded) or 1, method=method)
+    return HistorySummary(text=text, covered=end, last_id=messages[end - 1].id)
+
+
+async def manage_history(
+    messages: Sequence[BaseMessage],
+    summary: Optional[HistorySummary],
+    *,
+    max_turns: int,
+    max_tokens: int,
+    fold_batch: int = 1,
+    summary_max_tokens: int = 300,
+    model: Optional[BaseChatModel] = None,
+    config: Optional[RunnableConfig] = None,
+) -> tuple[list[BaseMessage], HistorySummary]:
+    """Return the messages to send a model and the (possibly refreshed) summary.
+
+    The summary is returned unchanged, as the same object, when no turns left
+    the window.
+    """
+    if summary is None or not summary.matches(messages):
+        if summary is not None:
+            logger.info("History changed before message %d; rebuilding the summary", summary.covered)
+        summary = HistorySummary()
+    window = plan_window(messages, summary, max_turns=max_turns, max_tokens=max_tokens, fold_batch=fold_batch)
+    if window.start > summary.covered:
+        summary = await fold(summary, messages, window.start, max_tokens=summary_max_tokens, model=model, config=config)
+    prompt: list[BaseMessage] = list(messages[window.start :])
+    if summary.text:
+        prompt.insert(0, SystemMessage(content=SUMMARY_HEADER + summary.text))
+    return prompt, summary
+
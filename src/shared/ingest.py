@@ -0,0 +1,439 @@
+"""Build the company document index from PDFs.
+
+Pages are extracted from the input PDFs across a process pool, split into overlapping chunks,
+embedded in bounded batches with a limited number of requests in flight, and
+appended to a memory-mapped flat index as each batch completes, so memory use
+stays flat regardless of corpus size.
+
+A manifest of chunk IDs is kept beside the index, so re-running over a changed
+corpus only embeds new chunks and drops vanished ones. With `--index-type` an
+ANN index (IVF-Flat, IVF-PQ, HNSW or SQ8) is trained over the result.
+
+Usage:
+    python -m src.shared.ingest docs/*.pdf --out src/shared/index
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional, TypeVar
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ..shared import flat_index
+from ..shared.flat_index import INDEX_TYPES, FlatIndexWriter, MmapVectorStore, build_ann_index
+from ..shared.retrieval import INDEX_NAME, INDEX_PATH, make_text_encoder
+from ..shared.state import _generate_uuid
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(kw_only=True)
+class IngestConfig:
+    """Tuning knobs for an ingestion run."""
+
+    embedding_model: str = "openai/text-embedding-3-small"
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    batch_size: int = 64
+    max_in_flight: int = 4
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    extract_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    pages_per_task: int = 16
+    index_type: str = "flat"
+    nlist: Optional[int] = None
+    pq_m: int = 64
+    hnsw_m: int = 32
+
+
+@dataclass
+class IngestReport:
+    """Summary of an ingestion run."""
+
+    pages: int = 0
+    chunks: int = 0
+    reused: int = 0
+    removed: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    """Peak RSS of this process."""
+    extract_workers: int = 0
+    """Extraction worker processes used; 0 when pages were extracted in this process."""
+    worker_peak_rss_mb: float = 0.0
+    """Peak RSS of the largest extraction worker."""
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def total_peak_rss_mb(self) -> float:
+        """Upper bound on the run's peak memory: this process plus every worker at its peak."""
+        return self.peak_rss_mb + self.extract_workers * self.worker_peak_rss_mb
+
+    def __str__(self) -> str:
+        return (
+            f"{self.pages} pages, {self.chunks} chunks embedded in {self.batches} batches, "
+            f"{self.reused} reused, {self.removed} removed "
+            f"({self.retries} retries) in {self.seconds:.1f}s: "
+            f"{self.docs_per_second:.1f} docs/sec, peak RSS {self.total_peak_rss_mb:.1f} MB "
+            f"({self.peak_rss_mb:.1f} MB main + {self.extract_workers} x {self.worker_peak_rss_mb:.1f} MB workers)"
+        )
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Return the peak resident set size of this process in megabytes.
+
+    With `resource.RUSAGE_CHILDREN`, return that of its largest terminated
+    child instead, e.g. an extraction worker.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def iter_pages(pdf_paths: Iterable[str]) -> Iterator[tuple[str, int, str]]:
+    """Yield `(source, page_number, text)` for every page, one page in memory at a time."""
+    import fitz  # PyMuPDF
+
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            for page_num in range(len(doc)):
+                yield path, page_num + 1, doc.load_page(page_num).get_text("text")
+
+
+def page_ranges(pdf_paths: Iterable[str], pages_per_task: int) -> Iterator[tuple[str, int, int]]:
+    """Split every PDF into `(path, start, stop)` page ranges of at most `pages_per_task` pages."""
+    import fitz  # PyMuPDF
+
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            page_count = len(doc)
+        for start in range(0, page_count, pages_per_task):
+            yield path, start, min(start + pages_per_task, page_count)
+
+
+def extract_page_range(task: tuple[str, int, int]) -> list[tuple[str, int, str]]:
+    """Extract one page range; runs in a worker process."""
+    import fitz  # PyMuPDF
+
+    path, start, stop = task
+    with fitz.open(path) as doc:
+        return [(path, page_num + 1, doc.load_page(page_num).get_text("text")) for page_num in range(start, stop)]
+
+
+def iter_pages_parallel(
+    pdf_paths: Iterable[str], workers: int, pages_per_task: int = 16
+) -> Iterator[tuple[str, int, str]]:
+    """Like `iter_pages`, but extracts page ranges across a process pool.
+
+    Ranges from all files are fanned out to `workers` processes and yielded
+    back in document and page order. At most two ranges per worker are
+    outstanding, so memory stays bounded however large the corpus is.
+    """
+    if workers <= 1:
+        yield from iter_pages(pdf_paths)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque()
+        for task in page_ranges(pdf_paths, pages_per_task):
+            pending.append(pool.submit(extract_page_range, task))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_chunks(
+    pages: Iterable[tuple[str, int, str]], chunk_size: int, chunk_overlap: int, report: Optional[IngestReport] = None
+) -> Iterator[Document]:
+    """Split page text into overlapping chunks tagged with source and page number."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for source, page, text in pages:
+        if report is not None:
+            report.pages += 1
+        for chunk in splitter.split_text(text):
+            if chunk.strip():
+                yield Document(page_content=chunk, metadata={"source": source, "page": page})
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Group an iterable into lists of at most `size` items."""
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def embed_with_retry(
+    embeddings: Embeddings, texts: list[str], config: IngestConfig, report: Optional[IngestReport] = None
+) -> list[list[float]]:
+    """Embed one batch, retrying failures with exponential backoff and jitter."""
+    for attempt in range(config.max_retries + 1):
+        try:
+            return await embeddings.aembed_documents(texts)
+        except Exception as e:
+            if attempt == config.max_retries:
+                raise
+            delay = min(config.backoff_max, config.backoff_base * 2**attempt) * random.uniform(0.5, 1.0)
+            logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.1f}s")
+            if report is not None:
+                report.retries += 1
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def embed_batches(
+    batches: Iterable[list[Document]],
+    embeddings: Embeddings,
+    config: IngestConfig,
+    report: Optional[IngestReport] = None,
+) -> AsyncIterator[tuple[list[Document], list[list[float]]]]:
+    """Embed batches with at most `max_in_flight` requests outstanding, yielding in order.
+
+    `batches` is advanced in a worker thread: producing a batch extracts and
+    splits pages, which blocks, and would otherwise stall the embedding
+    requests in flight.
+    """
+    batches = iter(batches)
+    pending: deque[tuple[list[Document], asyncio.Task]] = deque()
+    try:
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            texts = [doc.page_content for doc in batch]
+            pending.append((batch, asyncio.create_task(embed_with_retry(embeddings, texts, config, report))))
+            if len(pending) >= config.max_in_flight:
+                done, task = pending.popleft()
+                yield done, await task
+        while pending:
+            done, task = pending.popleft()
+            yield done, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+def manifest_path(index_path: str, index_name: str = INDEX_NAME) -> str:
+    """Return the path of the chunk manifest stored beside an index."""
+    return os.path.join(index_path, f"{index_name}.manifest.json")
+
+
+def load_manifest(index_path: str, index_name: str = INDEX_NAME) -> Optional[dict[str, Any]]:
+    """Load the chunk manifest of an index, if there is one."""
+    try:
+        with open(manifest_path(index_path, index_name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(index_path: str, index_name: str, manifest: dict[str, Any]) -> None:
+    """Atomically replace the chunk manifest of an index."""
+    path = manifest_path(index_path, index_name)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _manifest_settings(config: IngestConfig) -> dict[str, Any]:
+    """Settings that, if changed, invalidate every stored vector."""
+    return {"embedding_model": config.embedding_model}
+
+
+def _open_previous(
+    index_path: str, index_name: str, config: IngestConfig
+) -> tuple[Optional[MmapVectorStore], dict[str, int]]:
+    """Open the existing index and map its chunk IDs to rows, if it can be reused."""
+    manifest = load_manifest(index_path, index_name)
+    if not manifest or manifest.get("settings") != _manifest_settings(config):
+        return None, {}
+    if not flat_index.exists(index_path, index_name):
+        return None, {}
+    previous = MmapVectorStore.load(index_path, index_name=index_name, load_ann=False)
+    if len(previous) != len(manifest["ids"]):
+        logger.warning("Manifest does not match the index; rebuilding from scratch")
+        return None, {}
+    return previous, {chunk_id: row for row, chunk_id in enumerate(manifest["ids"])}
+
+
+def _ann_type(index_path: str, index_name: str) -> str:
+    """Return the type of the ANN index currently stored beside an index; "flat" if none is current."""
+    meta_path, _ = flat_index.ann_files(index_path, index_name)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return "flat"
+    if meta.get("fingerprint") != flat_index.data_fingerprint(index_path, index_name):
+        return "flat"
+    return meta["index_type"]
+
+
+async def ingest_documents(
+    documents: Iterable[Document],
+    embeddings: Embeddings,
+    index_path: str = INDEX_PATH,
+    index_name: str = INDEX_NAME,
+    config: Optional[IngestConfig] = None,
+    report: Optional[IngestReport] = None,
+    incremental: bool = True,
+) -> IngestReport:
+    """Embed a stream of documents and write them to a flat index.
+
+    Each chunk is identified by `_generate_uuid` of its content, the same
+    scheme `reduce_docs` uses. With `incremental`, chunks already listed in the
+    index manifest keep their stored vectors; only new chunks are embedded and
+    chunks that no longer appear are dropped. If nothing changed the index
+    files are left untouched.
+    """
+    config = config or IngestConfig()
+    report = report or IngestReport()
+    start = time.perf_counter()
+    previous, previous_rows = _open_previous(index_path, index_name, config) if incremental else (None, {})
+
+    seen: set[str] = set()
+    written: list[str] = []
+    reused: list[tuple[str, Document, int]] = []
+
+    writer = FlatIndexWriter(index_path, index_name)
+
+    def flush_reused() -> None:
+        if not reused:
+            return
+        rows = [row for _, _, row in reused]
+        writer.add(previous.vectors[rows], ((chunk_id, doc) for chunk_id, doc, _ in reused))
+        written.extend(chunk_id for chunk_id, _, _ in reused)
+        report.reused += len(reused)
+        reused.clear()
+
+    def new_chunks() -> Iterator[Document]:
+        for doc in documents:
+            chunk_id = _generate_uuid(doc.page_content)
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            if chunk_id not in previous_rows:
+                yield doc
+                continue
+            # Unchanged chunks keep their stored vector but take the new metadata.
+            reused.append((chunk_id, doc, previous_rows[chunk_id]))
+            if len(reused) >= config.batch_size:
+                flush_reused()
+
+    try:
+        async for batch, vectors in embed_batches(batched(new_chunks(), config.batch_size), embeddings, config, report):
+            ids = [_generate_uuid(doc.page_content) for doc in batch]
+            writer.add(vectors, zip(ids, batch))
+            written.extend(ids)
+            report.chunks += len(batch)
+            report.batches += 1
+        flush_reused()
+    except BaseException:
+        writer.abort()
+        raise
+
+    report.removed = len(previous_rows.keys() - seen)
+    changed = previous is None or report.chunks or report.removed
+    if changed:
+        writer.close()
+        write_manifest(index_path, index_name, {"settings": _manifest_settings(config), "ids": written})
+    else:
+        writer.abort()
+    if changed or _ann_type(index_path, index_name) != config.index_type:
+        build_ann_index(
+            index_path,
+            index_name,
+            config.index_type,
+            nlist=config.nlist,
+            pq_m=config.pq_m,
+            hnsw_m=config.hnsw_m,
+        )
+    report.seconds = time.perf_counter() - start
+    report.peak_rss_mb = peak_rss_mb()
+    if report.extract_workers:
+        # The extraction pool has been shut down and its workers reaped by now.
+        report.worker_peak_rss_mb = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return report
+
+
+async def ingest_pdfs(
+    pdf_paths: Iterable[str],
+    embeddings: Embeddings,
+    index_path: str = INDEX_PATH,
+    index_name: str = INDEX_NAME,
+    config: Optional[IngestConfig] = None,
+    incremental: bool = True,
+) -> IngestReport:
+    """Stream PDFs through chunking and embedding into a flat index."""
+    config = config or IngestConfig()
+    report = IngestReport(extract_workers=config.extract_workers if config.extract_workers > 1 else 0)
+    pages = iter_pages_parallel(pdf_paths, config.extract_workers, config.pages_per_task)
+    chunks = iter_chunks(pages, config.chunk_size, config.chunk_overlap, report)
+    return await ingest_documents(chunks, embeddings, index_path, index_name, config, report, incremental)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the document index from PDFs.")
+    parser.add_argument("pdfs", nargs="+", help="PDF files to index.")
+    parser.add_argument("--out", default=INDEX_PATH, help="Index directory.")
+    parser.add_argument("--index-name", default=INDEX_NAME)
+    parser.add_argument("--embedding-model", default=IngestConfig.embedding_model)
+    parser.add_argument("--chunk-size", type=int, default=IngestConfig.chunk_size)
+    parser.add_argument("--chunk-overlap", type=int, default=IngestConfig.chunk_overlap)
+    parser.add_argument("--batch-size", type=int, default=IngestConfig.batch_size)
+    parser.add_argument("--max-in-flight", type=int, default=IngestConfig.max_in_flight)
+    parser.add_argument("--max-retries", type=int, default=IngestConfig.max_retries)
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-per-task", type=int, default=IngestConfig.pages_per_task)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=IngestConfig.index_type)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: about 4*sqrt(n)).")
+    parser.add_argument("--pq-m", type=int, default=IngestConfig.pq_m, help="IVF-PQ bytes per vector.")
+    parser.add_argument("--hnsw-m", type=int, default=IngestConfig.hnsw_m, help="HNSW neighbours per node.")
+    parser.add_argument("--full", action="store_true", help="Re-embed everything instead of reusing unchanged chunks.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = IngestConfig(
+        embedding_model=args.embedding_model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        max_retries=args.max_retries,
+        extract_workers=args.extract_workers,
+        pages_per_task=args.pages_per_task,
+        index_type=args.index_type,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        hnsw_m=args.hnsw_m,
+    )
+    embeddings = make_text_encoder(args.embedding_model)
+    report = asyncio.run(ingest_pdfs(args.pdfs, embeddings, args.out, args.index_name, config, not args.full))
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
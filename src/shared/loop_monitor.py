@@ -0,0 +1,152 @@
+"""Event-loop lag monitoring.
+
+A heartbeat task measures how late the event loop wakes it up. A watchdog
+thread notices when the heartbeat stops, and captures the loop thread's stack
+while it is still blocked, so each stall is recorded with the code that caused
+it rather than whatever ran afterwards.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf"))
+
+
+@dataclass
+class Stall:
+    """One period in which the event loop did not run other tasks."""
+
+    started_at: float
+    duration: float = 0.0
+    location: str = "unknown"
+    stack: list[str] = field(default_factory=list)
+
+
+class LoopLagMonitor:
+    """Sample event-loop scheduling delay and record stalls above a threshold."""
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, max_stalls: int = 256) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.buckets = [0] * len(LAG_BUCKETS)
+        self.stalls: deque[Stall] = deque(maxlen=max_stalls)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._current_stall: Optional[Stall] = None
+        # Guards _last_beat and _current_stall between the heartbeat and the watchdog.
+        self._beat_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop monitoring."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            with self._beat_lock:
+                # Move the beat first, so the watchdog never sees an old beat with no stall open.
+                self._last_beat = now
+                self._record(max(0.0, now - expected))
+
+    def _record(self, lag: float) -> None:
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        for i, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self.buckets[i] += 1
+                break
+        stall = self._current_stall
+        if lag > self.threshold:
+            if stall is None:
+                stall = Stall(started_at=time.time() - lag, location="unknown (missed by watchdog)")
+                self.stalls.append(stall)
+            stall.duration = lag
+        self._current_stall = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            with self._beat_lock:
+                blocked_for = time.monotonic() - self._last_beat - self.interval
+                if blocked_for <= self.threshold or self._current_stall is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                summary = traceback.extract_stack(frame)
+                stall = Stall(
+                    started_at=time.time() - blocked_for,
+                    location=_culprit(summary),
+                    stack=[f"{f.filename}:{f.lineno} in {f.name}" for f in summary[-8:]],
+                )
+                self._current_stall = stall
+                self.stalls.append(stall)
+
+    def lag_stats(self) -> dict[str, Any]:
+        """Return lag statistics without the stalls, for frequent scrapes."""
+        with self._beat_lock:
+            samples, total_lag, buckets = self.samples, self.total_lag, list(self.buckets)
+            max_lag = self.max_lag
+        return {
+            "samples": samples,
+            "mean_lag": total_lag / samples if samples else 0.0,
+            "max_lag": max_lag,
+            "threshold": self.threshold,
+            "lag_buckets": {str(bound): count for bound, count in zip(LAG_BUCKETS, buckets)},
+        }
+
+    def stats(self) -> dict[str, Any]:
+        """Return lag statistics and recent stalls."""
+        with self._beat_lock:
+            # The watchdog appends from its own thread; iterate over a copy.
+            stalls = list(self.stalls)
+        return {**self.lag_stats(), "stalls": [asdict(stall) for stall in stalls]}
+
+
+def _culprit(summary: traceback.StackSummary) -> str:
+    """Name the innermost project function on the stack, e.g. a graph node."""
+    for frame in reversed(summary):
+        if frame.filename.startswith(_PROJECT_DIR) and not frame.filename.endswith("loop_monitor.py"):
+            return f"{frame.name} ({os.path.relpath(frame.filename, _PROJECT_DIR)}:{frame.lineno})"
+    last = summary[-1]
+    return f"{last.name} ({last.filename}:{last.lineno})"
+
+
+loop_monitor = LoopLagMonitor()
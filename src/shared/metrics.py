@@ -0,0 +1,275 @@
+"""Latency histograms, counters and per-request traces.
+
+Metrics are kept in process and rendered in the Prometheus text exposition
+format by `registry.render()`, which `main.py` serves on `/metrics`. Timing a
+block with `Histogram.time()` also adds a span to the trace of the request it
+runs in, if one was started with `tracer.trace()`; the last `max_traces`
+finished traces are kept for `/debug/traces`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+TOKEN_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+Sample = tuple[str, dict[str, str], float]
+"""(metric name suffix, labels, value) as produced by a collector."""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+@dataclass
+class Span:
+    """One timed step within a trace, in seconds since the trace started."""
+
+    name: str
+    start: float
+    duration: float
+    labels: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """Timeline of one request, e.g. a chat turn."""
+
+    trace_id: str
+    name: str
+    started_at: float
+    labels: dict[str, str] = field(default_factory=dict)
+    duration: float = 0.0
+    error: Optional[str] = None
+    spans: list[Span] = field(default_factory=list)
+    _start: float = field(default=0.0, repr=False)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """Start request traces and keep the most recent ones in a ring buffer."""
+
+    def __init__(self, max_traces: int = 256, max_spans: int = 512) -> None:
+        self.max_spans = max_spans
+        self.traces: deque[Trace] = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **labels: str) -> Iterator[Trace]:
+        """Record the spans timed inside the block, including in tasks and threads it starts."""
+        trace = Trace(uuid.uuid4().hex[:16], name, time.time(), labels, _start=time.perf_counter())
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace._start
+            with self._lock:
+                self.traces.append(trace)
+
+    def record(self, name: str, start: float, duration: float, labels: dict[str, str]) -> None:
+        """Add a span, started at `start` (perf_counter), to the current trace, if any."""
+        trace = _current_trace.get()
+        if trace is not None and len(trace.spans) < self.max_spans:
+            trace.spans.append(Span(name, start - trace._start, duration, labels))
+
+    def recent(self, limit: int = 50) -> list[dict[str, Any]]:
+        """Return the last `limit` finished traces, newest first."""
+        with self._lock:
+            traces = list(self.traces)[-limit:]
+        result = []
+        for trace in reversed(traces):
+            data = asdict(trace)
+            data.pop("_start")
+            result.append(data)
+        return result
+
+
+tracer = Tracer()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the block and add it as a span to the current trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(duration, **labels)
+            tracer.record(self.name, start, duration, {k: str(v) for k, v in labels.items()})
+
+    def collect(self) -> list[Sample]:
+        samples: list[Sample] = []
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list[Sample]:
+        with self._lock:
+            values = dict(self._values)
+        return [("_total", dict(zip(self.labelnames, key)), value) for key, value in sorted(values.items())]
+
+
+class CollectorMetric:
+    """Gauges or counters read from existing stats objects at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._collect = collect
+
+    def collect(self) -> list[Sample]:
+        return list(self._collect())
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together in the Prometheus text format."""
+
+    def __init__(self, prefix: str = "chatbot_") -> None:
+        self.prefix = prefix
+        self._metrics: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Any) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, documentation, labelnames))
+
+    def collector(
+        self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]], kind: str = "gauge"
+    ) -> CollectorMetric:
+        """Export values computed by `collect()` on every scrape, as (suffix, labels, value) samples."""
+        return self._register(CollectorMetric(self.prefix + name, documentation, kind, collect))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            try:
+                samples = metric.collect()
+            except Exception as e:
+                lines.append(f"# {metric.name} collection failed: {type(e).__name__}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+NODE_SECONDS = registry.histogram("node_seconds", "Graph node latency.", ["node"])
+RETRIEVE_SECONDS = registry.histogram("retrieve_seconds", "Document retrieval latency.", ["source"])
+EMBED_SECONDS = registry.histogram("embed_seconds", "Query embedding latency.", ["model"])
+SEARCH_SECONDS = registry.histogram("search_seconds", "Vector search latency.", ["index"])
+LLM_TTFT_SECONDS = registry.histogram("llm_ttft_seconds", "Chat model time to first token.", ["model", "node"])
+LLM_SECONDS = registry.histogram("llm_seconds", "Chat model call latency.", ["model", "node"])
+LLM_OUTPUT_TOKENS = registry.histogram(
+    "llm_output_tokens", "Tokens generated per chat model call.", ["model", "node"], TOKEN_BUCKETS
+)
+LLM_ERRORS = registry.counter("llm_errors", "Chat model calls that failed.", ["model", "node"])
+CONTEXT_TOKENS = registry.histogram(
+    "context_tokens", "Tokens of retrieved context placed in a prompt.", ["node"], TOKEN_BUCKETS
+)
+PROMPT_TOKENS = registry.histogram("prompt_tokens", "Tokens of prompt text sent to a model.", ["node"], TOKEN_BUCKETS)
+HISTORY_FOLDS = registry.counter(
+    "history_folds", "Conversation turns folded into the rolling history summary.", ["method"]
+)
+CHECKPOINT_SECONDS = registry.histogram("checkpoint_seconds", "Checkpointer operation latency.", ["op"])
+TURN_SECONDS = registry.histogram("turn_seconds", "Latency of a whole chat turn.", ["transport"])
@@ -0,0 +1,237 @@
+"""Shared, pooled chat-model clients for company information bot."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable
+
+from ..shared.metrics import LLM_ERRORS, LLM_OUTPUT_TOKENS, LLM_SECONDS, LLM_TTFT_SECONDS, tracer
+from ..shared.utils import load_chat_model
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CLOSE_DELAY = 120.0
+"""Seconds replaced HTTP clients stay open, so requests already using them can finish."""
+
+
+def _freeze(params: dict[str, Any]) -> Hashable:
+    """Turn model parameters into a hashable cache key."""
+    return json.dumps(params, sort_keys=True, default=repr)
+
+
+class ModelMetricsHandler(BaseCallbackHandler):
+    """Record time to first token, latency and output tokens of every chat model call.
+
+    Calls that are not streamed count their whole latency as time to first token.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        # run_id -> [labels, start, first token time or None, streamed chunks]
+        self._runs: dict[UUID, list] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        labels = {"model": metadata.get("ls_model_name", "unknown"), "node": metadata.get("langgraph_node", "")}
+        with self._lock:
+            self._runs[run_id] = [labels, time.perf_counter(), None, 0]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None:
+            if run[2] is None:
+                run[2] = time.perf_counter()
+            run[3] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        labels, start, first, chunks = run
+        end = time.perf_counter()
+        LLM_TTFT_SECONDS.observe((first or end) - start, **labels)
+        LLM_SECONDS.observe(end - start, **labels)
+        LLM_OUTPUT_TOKENS.observe(_output_tokens(response, chunks), **labels)
+        tracer.record(LLM_SECONDS.name, start, end - start, {**labels, "ttft": f"{(first or end) - start:.4f}"})
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            LLM_ERRORS.inc(**run[0])
+
+
+def _output_tokens(response: LLMResult, chunks: int) -> int:
+    """Generated tokens as reported by the provider, else the number of streamed chunks."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage and usage.get("output_tokens"):
+                return usage["output_tokens"]
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("completion_tokens") or chunks
+
+
+model_metrics = ModelMetricsHandler()
+
+
+class ModelRegistry:
+    """Process-wide cache of configured chat models and structured-output chains.
+
+    Clients are built once per (model, parameters) and reuse a shared
+    keep-alive HTTP connection pool, instead of constructing a new client and
+    connection on every graph node invocation.
+    """
+
+    def __init__(
+        self, max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._models: dict[Hashable, BaseChatModel] = {}
+        self._runnables: dict[Hashable, Runnable] = {}
+        self._providers: dict[str, Callable[..., BaseChatModel]] = {}
+        self._lock = threading.Lock()
+
+    def register_provider(self, provider: str, factory: Callable[..., BaseChatModel]) -> None:
+        """Build models named "<provider>/<name>" with `factory(name, **params)`, e.g. local fakes."""
+        with self._lock:
+            self._providers[provider] = factory
+            self._models.clear()
+            self._runnables.clear()
+
+    def configure(
+        self, max_connections: int, max_keepalive_connections: int, keepalive_expiry: float
+    ) -> None:
+        """Change pool limits; clients built afterwards use a fresh pool."""
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        with self._lock:
+            if limits == self.limits:
+                return
+            self.limits = limits
+            old = (self._http_client, self._http_async_client)
+            self._http_client = self._http_async_client = None
+            self._models.clear()
+            self._runnables.clear()
+        if old[0] is not None:
+            _close_later(*old)
+
+    def _http_kwargs(self, fully_specified_name: str) -> dict[str, Any]:
+        provider = fully_specified_name.split("/", maxsplit=1)[0] if "/" in fully_specified_name else ""
+        if provider not in ("openai", ""):
+            return {}
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self.limits)
+            self._http_async_client = httpx.AsyncClient(limits=self.limits)
+        return {"http_client": self._http_client, "http_async_client": self._http_async_client}
+
+    def chat_model(self, fully_specified_name: str, **params: Any) -> BaseChatModel:
+        """Return the shared chat model for a provider/name string and parameters."""
+        key = (fully_specified_name, _freeze(params))
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    provider, _, name = fully_specified_name.partition("/")
+                    if name and provider in self._providers:
+                        model = self._providers[provider](name, **params)
+                    else:
+                        model = load_chat_model(fully_specified_name, **params, **self._http_kwargs(fully_specified_name))
+                    if model.callbacks is None:
+                        model.callbacks = [model_metrics]
+                    self._models[key] = model
+        return model
+
+    def structured(
+        self,
+        fully_specified_name: str,
+        schema: type,
+        prompt: Optional[BasePromptTemplate] = None,
+        **params: Any,
+    ) -> Runnable:
+        """Return a cached `prompt | model.with_structured_output(schema)` chain.
+
+        The structured model is tagged "nostream" so its tool-call output is
+        not streamed to the client.
+        """
+        prompt_key = prompt.template if prompt is not None and hasattr(prompt, "template") else id(prompt)
+        key = (fully_specified_name, _freeze(params), schema.__module__, schema.__qualname__, prompt_key)
+        runnable = self._runnables.get(key)
+        if runnable is None:
+            model = self.chat_model(fully_specified_name, **params)
+            runnable = model.with_structured_output(schema).with_config(tags=["nostream"])
+            if prompt is not None:
+                runnable = prompt | runnable
+            with self._lock:
+                runnable = self._runnables.setdefault(key, runnable)
+        return runnable
+
+
+def _close_later(client: httpx.Client, async_client: httpx.AsyncClient, delay: float = CLIENT_CLOSE_DELAY) -> None:
+    """Close a replaced pair of pooled clients once in-flight requests had time to finish."""
+
+    def close_sync() -> None:
+        try:
+            client.close()
+        except Exception:
+            logger.debug("Closing a replaced HTTP client failed", exc_info=True)
+
+    async def close() -> None:
+        await asyncio.sleep(delay)
+        await asyncio.to_thread(close_sync)
+        try:
+            await async_client.aclose()
+        except Exception:
+            logger.debug("Closing a replaced async HTTP client failed", exc_info=True)
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # No event loop here, so the async client was never used from one; only the sync pool holds sockets.
+        timer = threading.Timer(delay, close_sync)
+        timer.daemon = True
+        timer.start()
+        return
+    task = loop.create_task(close())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+_closing: set[asyncio.Task] = set()
+"""Pending `_close_later` tasks, referenced so they are not garbage collected."""
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,199 @@
+"""Typed wire protocol for the chat websocket.
+
+Clients that offer the `chat.v1.json` or `chat.v1.msgpack` websocket
+subprotocol get typed event envelopes, encoded with msgspec as JSON text
+frames or MessagePack binary frames. Every event carries a per-connection
+sequence number (`seq`) and a `type` tag:
+
+- `token`: a chunk of the message being generated;
+- `message`: a complete message that was not streamed;
+- `message_end`: the streamed message `message_id` is complete;
+- `retrieval_done`: a retrieval step finished;
+- `interrupt`: the graph is waiting for the user at `node`;
+- `error`: the turn failed;
+- `turn_end`: the server is done with the user's message.
+
+Clients send `{"type": "user_message", "text": ...}` in the same encoding.
+Clients that offer no subprotocol keep the plain-text protocol: coalesced
+text frames, each message followed by an empty frame.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Optional, Union
+
+import msgspec
+
+from ..shared.streaming import FrameCoalescer
+
+SUBPROTOCOLS = {"chat.v1.msgpack": "msgpack", "chat.v1.json": "json"}
+
+
+class Token(msgspec.Struct, tag="token"):
+    seq: int
+    message_id: str
+    text: str
+
+
+class Message(msgspec.Struct, tag="message"):
+    seq: int
+    message_id: str
+    content: str
+    role: str = "ai"
+
+
+class MessageEnd(msgspec.Struct, tag="message_end"):
+    seq: int
+    message_id: str
+
+
+class RetrievalDone(msgspec.Struct, tag="retrieval_done"):
+    seq: int
+    query: str
+    documents: int
+
+
+class Interrupt(msgspec.Struct, tag="interrupt"):
+    seq: int
+    node: str
+
+
+class Error(msgspec.Struct, tag="error"):
+    seq: int
+    detail: str
+
+
+class TurnEnd(msgspec.Struct, tag="turn_end"):
+    seq: int
+    thread_id: str
+
+
+class UserMessage(msgspec.Struct, tag="user_message"):
+    text: str
+
+
+ServerEvent = Union[Token, Message, MessageEnd, RetrievalDone, Interrupt, Error, TurnEnd]
+
+
+def negotiate(offered: list[str]) -> Optional[str]:
+    """Pick the first supported subprotocol the client offered, if any."""
+    return next((name for name in offered if name in SUBPROTOCOLS), None)
+
+
+class WireCodec:
+    """msgspec encoder/decoder for one encoding ("json" or "msgpack")."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        self.binary = encoding == "msgpack"
+        module = msgspec.msgpack if self.binary else msgspec.json
+        self._encoder = module.Encoder()
+        self._server_decoder = module.Decoder(ServerEvent)
+        self._client_decoder = module.Decoder(UserMessage)
+
+    def encode(self, event: Any) -> Union[bytes, str]:
+        data = self._encoder.encode(event)
+        return data if self.binary else data.decode()
+
+    def decode_event(self, frame: Union[bytes, str]) -> ServerEvent:
+        return self._server_decoder.decode(frame)
+
+    def decode_input(self, frame: Union[bytes, str]) -> UserMessage:
+        return self._client_decoder.decode(frame)
+
+
+class ChatStream:
+    """Plain-text protocol: coalesced text frames and an empty frame per message."""
+
+    def __init__(self, send_text: Callable[[str], Awaitable[None]], **streaming: Any) -> None:
+        self.out = FrameCoalescer(send_text, **streaming)
+
+    async def __aenter__(self) -> "ChatStream":
+        await self.out.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.out.__aexit__(*exc_info)
+
+    def parse(self, frame: dict) -> str:
+        """Extract the user's text from a received websocket message."""
+        return frame.get("text") or ""
+
+    async def token(self, message_id: str, text: str) -> None:
+        await self.out.write(text)
+
+    async def message(self, message_id: str, content: str) -> None:
+        await self.out.write(content)
+        await self.out.end_message()
+
+    async def message_end(self, message_id: str) -> None:
+        await self.out.end_message()
+
+    async def retrieval_done(self, query: str, documents: int) -> None:
+        pass
+
+    async def interrupt(self, node: str) -> None:
+        pass
+
+    async def error(self, detail: str) -> None:
+        pass
+
+    async def turn_end(self, thread_id: str) -> None:
+        pass
+
+
+class TypedChatStream(ChatStream):
+    """Typed protocol: msgspec events with sequence numbers, tokens still coalesced."""
+
+    def __init__(
+        self,
+        send_text: Callable[[str], Awaitable[None]],
+        send_bytes: Callable[[bytes], Awaitable[None]],
+        encoding: str,
+        **streaming: Any,
+    ) -> None:
+        self.codec = WireCodec(encoding)
+        self.seq = 0
+        self.message_id = ""
+        self.out = FrameCoalescer(
+            send_bytes if self.codec.binary else send_text,
+            encode=lambda text: self._encode(Token(0, self.message_id, text)),
+            **streaming,
+        )
+
+    def _encode(self, event: Any) -> Union[bytes, str]:
+        self.seq += 1
+        event.seq = self.seq
+        return self.codec.encode(event)
+
+    async def _send(self, event: Any) -> None:
+        # Encoded when actually sent, so sequence numbers follow send order.
+        await self.out.send_frame(lambda: self._encode(event))
+
+    def parse(self, frame: dict) -> str:
+        data = frame.get("bytes") if frame.get("bytes") is not None else frame.get("text")
+        return self.codec.decode_input(data).text
+
+    async def token(self, message_id: str, text: str) -> None:
+        if message_id != self.message_id:
+            await self.out.flush()
+            self.message_id = message_id
+        await self.out.write(text)
+
+    async def message(self, message_id: str, content: str) -> None:
+        await self._send(Message(0, message_id, content))
+
+    async def message_end(self, message_id: str) -> None:
+        await self._send(MessageEnd(0, message_id))
+
+    async def retrieval_done(self, query: str, documents: int) -> None:
+        await self._send(RetrievalDone(0, query, documents))
+
+    async def interrupt(self, node: str) -> None:
+        await self._send(Interrupt(0, node))
+
+    async def error(self, detail: str) -> None:
+        await self._send(Error(0, detail))
+
+    async def turn_end(self, thread_id: str) -> None:
+        await self._send(TurnEnd(0, thread_id))
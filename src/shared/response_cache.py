@@ -0,0 +1,323 @@
+"""Cache of completed chat-model responses for deterministic turns.
+
+A zero-temperature call over the same messages returns the same text, so
+turns like the initial overview only need to be generated once per model,
+prompt and index version. `CachedChatModel` wraps a chat model, answers hits
+from an in-memory LRU backed by an optional SQLite store, and replays them as
+a stream of `AIMessageChunk`s so `stream_mode="messages"` consumers cannot
+tell a hit from a live generation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from ..shared.embedding_cache import normalize_text
+
+_CHUNK = re.compile(r"\s*\S+")
+
+
+def response_key(llm_string: str, messages: list[BaseMessage], namespace: str = "") -> str:
+    """Return the cache key for `messages` sent to the model described by `llm_string`."""
+    normalized = [
+        (message.type, normalize_text(message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True)))
+        for message in messages
+    ]
+    payload = json.dumps([llm_string, namespace, normalized], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_deterministic(model: BaseChatModel) -> bool:
+    """Whether `model` samples greedily, so its responses are safe to reuse."""
+    return getattr(model, "temperature", 0) == 0
+
+
+@dataclass
+class ResponseCacheStats:
+    """Hit/miss counters for a response cache."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+
+class SQLiteResponseStore:
+    """On-disk key/text store with TTL and size-bounded eviction."""
+
+    def __init__(self, path: str, max_entries: int = 10_000, ttl: Optional[float] = None) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored, unexpired response for `key`."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return content
+
+    def put(self, key: str, content: str) -> int:
+        """Store a response and evict least recently used rows; return the number evicted."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, content, now, now),
+                )
+                evicted = 0
+                if self.ttl is not None:
+                    evicted += self._conn.execute(
+                        "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+                    ).rowcount
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                if count > self.max_entries:
+                    evicted += self._conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """In-memory LRU of response texts in front of an optional on-disk store."""
+
+    def __init__(
+        self, store: Optional[SQLiteResponseStore] = None, max_entries: int = 1_000, ttl: Optional[float] = None
+    ) -> None:
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = ResponseCacheStats()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] <= self.ttl):
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+            if self.store is None:
+                self.stats.misses += 1
+        return None
+
+    def _disk_hit(self, key: str, content: Optional[str], now: float) -> Optional[str]:
+        with self._lock:
+            if content is None:
+                self.stats.misses += 1
+                return None
+            self.stats.disk_hits += 1
+            self._remember(key, content, now)
+        return content
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        content = self._memory_get(key, now)
+        if content is not None or self.store is None:
+            return content
+        return self._disk_hit(key, self.store.get(key), now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """`get` with the SQLite lookup run in a worker thread."""
+        now = time.time()
+        content = self._memory_get(key, now)
+        if content is not None or self.store is None:
+            return content
+        return self._disk_hit(key, await asyncio.to_thread(self.store.get, key), now)
+
+    def put(self, key: str, content: str) -> None:
+        self._put_memory(key, content)
+        if self.store is not None:
+            self._count_evictions(self.store.put(key, content))
+
+    async def aput(self, key: str, content: str) -> None:
+        """`put` with the SQLite write run in a worker thread."""
+        self._put_memory(key, content)
+        if self.store is not None:
+            self._count_evictions(await asyncio.to_thread(self.store.put, key, content))
+
+    def _put_memory(self, key: str, content: str) -> None:
+        with self._lock:
+            self._remember(key, content, time.time())
+            self.stats.stores += 1
+
+    def _count_evictions(self, evicted: int) -> None:
+        with self._lock:
+            self.stats.evictions += evicted
+
+    def _remember(self, key: str, content: str, now: float) -> None:
+        self._memory[key] = (now, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+
+_caches: dict[tuple, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(kind: str, path: str, max_entries: int, ttl: Optional[float]) -> ResponseCache:
+    """Return the process-wide response cache for these settings ("memory" or "sqlite")."""
+    key = (kind, path, max_entries, ttl)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            store = SQLiteResponseStore(path, max_entries=max_entries * 10, ttl=ttl) if kind == "sqlite" else None
+            cache = _caches[key] = ResponseCache(store, max_entries=max_entries, ttl=ttl)
+        return cache
+
+
+def response_cache_stats() -> dict[str, ResponseCacheStats]:
+    """Return the stats of every shared response cache, keyed by backend and path."""
+    return {f"{kind}:{path}": cache.stats for (kind, path, _, _), cache in list(_caches.items())}
+
+
+class CachedChatModel(BaseChatModel):
+    """Chat model that serves repeated deterministic requests from a `ResponseCache`.
+
+    `namespace` is folded into the key; pass the index version so a re-index
+    invalidates responses generated from the old documents. Only plain text
+    responses are stored; tool calls and interrupted streams are not.
+    """
+
+    underlying: BaseChatModel
+    # Not `cache`: that field belongs to BaseLanguageModel, which would then
+    # look for a global LangChain LLM cache on every call.
+    response_cache: Any
+    namespace: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.underlying._llm_type}"
+
+    def _get_ls_params(self, stop: Optional[list[str]] = None, **kwargs: Any) -> Any:
+        return self.underlying._get_ls_params(stop=stop, **kwargs)
+
+    def _key(self, messages: list[BaseMessage], stop: Optional[list[str]], **kwargs: Any) -> str:
+        return response_key(self.underlying._get_llm_string(stop=stop, **kwargs), messages, self.namespace)
+
+    @staticmethod
+    def _replay(content: str) -> Iterator[ChatGenerationChunk]:
+        for piece in _CHUNK.findall(content) or [content]:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    @staticmethod
+    def _cacheable(message: BaseMessage) -> bool:
+        return isinstance(message.content, str) and bool(message.content) and not getattr(message, "tool_calls", None)
+
+    def _store(self, key: str, message: BaseMessage) -> None:
+        if self._cacheable(message):
+            self.response_cache.put(key, message.content)
+
+    async def _astore(self, key: str, message: BaseMessage) -> None:
+        if self._cacheable(message):
+            await self.response_cache.aput(key, message.content)
+
+    def _generate(
+        self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        key = self._key(messages, stop, **kwargs)
+        content = self.response_cache.get(key)
+        if content is not None:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+        result = self.underlying._generate(messages, stop=stop, **kwargs)
+        self._store(key, result.generations[0].message)
+        return result
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        key = self._key(messages, stop, **kwargs)
+        content = await self.response_cache.aget(key)
+        if content is not None:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+        result = await self.underlying._agenerate(messages, stop=stop, **kwargs)
+        await self._astore(key, result.generations[0].message)
+        return result
+
+    # Tokens are reported to callbacks by BaseChatModel for every chunk yielded
+    # here, so the underlying model is streamed without our run manager.
+    def _stream(
+        self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages, stop, **kwargs)
+        content = self.response_cache.get(key)
+        if content is not None:
+            yield from self._replay(content)
+            return
+        message = None
+        for chunk in self.underlying._stream(messages, stop=stop, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+            yield chunk
+        if message is not None:
+            self._store(key, message)
+
+    async def _astream(
+        self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._key(messages, stop, **kwargs)
+        content = await self.response_cache.aget(key)
+        if content is not None:
+            for chunk in self._replay(content):
+                yield chunk
+            return
+        message = None
+        async for chunk in self.underlying._astream(messages, stop=stop, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+            yield chunk
+        if message is not None:
+            await self._astore(key, message)
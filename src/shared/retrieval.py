@@ -1,39 +1,423 @@
 """Manage document retrieval for company information bot."""
 
+import asyncio
 from contextlib import contextmanager
-from typing import Generator
+import copy
+from dataclasses import dataclass
+from typing import Any, Generator, Iterable, Optional
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
 
-from langchain_core.embeddings import Embeddings
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
 from langchain_core.runnables import RunnableConfig
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
 
+from ..shared import flat_index
 from ..shared.configuration import BaseConfiguration
+from ..shared.embedding_batcher import MicroBatchingEmbeddings
+from ..shared.embedding_cache import CachedEmbeddings, SQLiteEmbeddingStore
+from ..shared.metrics import EMBED_SECONDS, RETRIEVE_SECONDS, SEARCH_SECONDS
+from ..shared.state import reduce_docs
 
-def make_text_encoder(model: str) -> Embeddings:
-    """Create OpenAI embeddings model."""
-    provider, model = model.split("/", maxsplit=1)
-    if provider != "openai":
-        raise ValueError("Only OpenAI embeddings are supported")
-    return OpenAIEmbeddings(model=model)
+logger = logging.getLogger(__name__)
 
-@contextmanager 
-def make_faiss_retriever(
-    configuration: BaseConfiguration, embedding_model: Embeddings
-) -> Generator[VectorStoreRetriever, None, None]:
-    """Configure FAISS vector store retriever."""
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "index")
+INDEX_NAME = "index"
+
+
+_encoders: dict[tuple, Embeddings] = {}
+_encoders_lock = threading.Lock()
+
+
+def _make_base_encoder(provider: str, model_name: str) -> Embeddings:
+    """Create the embeddings client for a provider."""
+    if provider == "openai":
+        return OpenAIEmbeddings(model=model_name)
+    if provider == "fake":
+        # Local deterministic vectors of the given size, e.g. "fake/1536", for tests and benchmarks.
+        return DeterministicFakeEmbedding(size=int(model_name))
+    raise ValueError("Only OpenAI embeddings (and 'fake' for local testing) are supported")
+
+
+def make_text_encoder(model: str, configuration: Optional[BaseConfiguration] = None) -> Embeddings:
+    """Create embeddings model.
+
+    With a configuration, the model is shared process-wide and wrapped in the
+    configured cache and cross-request micro-batcher.
+    """
+    provider, model_name = model.split("/", maxsplit=1)
+    if configuration is None:
+        return _make_base_encoder(provider, model_name)
+
+    key = (
+        model,
+        configuration.embedding_cache,
+        configuration.embedding_cache_path,
+        configuration.embedding_cache_size,
+        configuration.embedding_cache_ttl,
+        configuration.embedding_batch_size,
+        configuration.embedding_batch_wait_ms,
+    )
+    with _encoders_lock:
+        encoder = _encoders.get(key)
+        if encoder is not None:
+            return encoder
+
+        encoder = _make_base_encoder(provider, model_name)
+        if configuration.embedding_batch_wait_ms > 0 and configuration.embedding_batch_size > 1:
+            encoder = MicroBatchingEmbeddings(
+                encoder,
+                max_batch_size=configuration.embedding_batch_size,
+                max_wait=configuration.embedding_batch_wait_ms / 1000,
+            )
+        if configuration.embedding_cache != "none":
+            store = None
+            if configuration.embedding_cache == "sqlite":
+                store = SQLiteEmbeddingStore(
+                    configuration.embedding_cache_path,
+                    max_entries=configuration.embedding_cache_size * 10,
+                    ttl=configuration.embedding_cache_ttl,
+                )
+            encoder = CachedEmbeddings(
+                encoder,
+                model,
+                store=store,
+                max_entries=configuration.embedding_cache_size,
+                ttl=configuration.embedding_cache_ttl,
+            )
+        _encoders[key] = encoder
+        return encoder
+
+
+def encoder_stats() -> dict[str, dict[str, Any]]:
+    """Return cache and micro-batching stats of every shared embeddings model, keyed by model name."""
+    stats: dict[str, dict[str, Any]] = {}
+    for key, encoder in list(_encoders.items()):
+        entry = stats.setdefault(key[0], {})
+        while encoder is not None:
+            if isinstance(encoder, CachedEmbeddings):
+                entry["cache"] = encoder.stats
+            elif isinstance(encoder, MicroBatchingEmbeddings):
+                entry["batcher"] = encoder.stats
+            encoder = getattr(encoder, "underlying", None)
+    return stats
+
+
+@dataclass(frozen=True)
+class LoadedIndex:
+    """An immutable snapshot of a vector index loaded from disk."""
+
+    vstore: VectorStore
+    version: int
+    signature: tuple
+    loaded_at: float
+
+    def bind(self, embedding_model: Embeddings) -> VectorStore:
+        """Return a vector store sharing this snapshot's index, bound to `embedding_model`."""
+        # A shallow copy keeps the index and docstore shared across callers.
+        vstore = copy.copy(self.vstore)
+        vstore.embedding_function = embedding_model
+        return vstore
+
+
+def _index_files(index_path: str, index_name: str) -> list[str]:
+    """Return the files backing an index, preferring the memory-mapped format."""
+    if flat_index.exists(index_path, index_name):
+        files = flat_index.index_files(index_path, index_name)
+        return files + [path for path in flat_index.ann_files(index_path, index_name) if os.path.exists(path)]
+    return [os.path.join(index_path, f"{index_name}.{ext}") for ext in ("faiss", "pkl")]
+
+
+def _index_signature(index_path: str, index_name: str) -> tuple:
+    """Return the (path, mtime, size) fingerprint of the files backing an index."""
+    signature = []
+    for path in _index_files(index_path, index_name):
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def load_index(index_path: str, index_name: str, embedding_model: Optional[Embeddings]) -> VectorStore:
+    """Load an index from disk.
+
+    A memory-mapped flat index (see `flat_index`) is used when present, so
+    worker processes share its pages; otherwise the pickled FAISS index written
+    by `save_local` is loaded into private memory.
+    """
+    if flat_index.exists(index_path, index_name):
+        return flat_index.MmapVectorStore.load(index_path, embedding_model, index_name=index_name)
+    return FAISS.load_local(
+        index_path, embedding_model, index_name=index_name, allow_dangerous_deserialization=True
+    )
+
+
+class IndexRegistry:
+    """Process-wide cache of loaded vector indexes with hot reload.
+
+    Each index is loaded once and shared by every retriever handed out for it.
+    The files on disk are re-checked at most every `check_interval` seconds;
+    when their fingerprint changes a new snapshot is loaded off to the side and
+    swapped in with a single assignment, so a request either sees the old
+    index or the new one, never a partially loaded one.
+    """
+
+    def __init__(self, check_interval: float = 2.0) -> None:
+        self.check_interval = check_interval
+        self._entries: dict[tuple[str, str], LoadedIndex] = {}
+        self._checked_at: dict[tuple[str, str], float] = {}
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def _lock_for(self, key: tuple[str, str]) -> threading.Lock:
+        with self._registry_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(
+        self, key: tuple[str, str], previous: Optional[LoadedIndex], embedding_model: Optional[Embeddings]
+    ) -> LoadedIndex:
+        index_path, index_name = key
+        signature = _index_signature(index_path, index_name)
+        if previous is not None and previous.signature == signature:
+            return previous
+        vstore = load_index(index_path, index_name, embedding_model)
+        if _index_signature(index_path, index_name) != signature:
+            raise RuntimeError(f"Index at {index_path} changed while it was being loaded")
+        version = previous.version + 1 if previous is not None else 1
+        logger.info("Loaded index %s/%s (version %d)", index_path, index_name, version)
+        return LoadedIndex(vstore=vstore, version=version, signature=signature, loaded_at=time.time())
+
+    def snapshot(
+        self,
+        index_path: str = INDEX_PATH,
+        index_name: str = INDEX_NAME,
+        embedding_model: Optional[Embeddings] = None,
+    ) -> LoadedIndex:
+        """Return the current snapshot for an index, reloading it if the files changed."""
+        key = (os.path.abspath(index_path), index_name)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(key, 0.0) < self.check_interval:
+            return entry
+
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is not None and now - self._checked_at.get(key, 0.0) < self.check_interval:
+                return entry
+            try:
+                entry = self._load(key, entry, embedding_model)
+            except Exception:
+                if entry is None:
+                    raise
+                logger.exception("Reload of index %s failed; keeping version %d", key[0], entry.version)
+            self._entries[key] = entry
+            self._checked_at[key] = time.monotonic()
+            return entry
+
+    def get(
+        self,
+        embedding_model: Embeddings,
+        index_path: str = INDEX_PATH,
+        index_name: str = INDEX_NAME,
+    ) -> VectorStore:
+        """Return a vector store sharing the cached index, bound to `embedding_model`."""
+        return self.snapshot(index_path, index_name, embedding_model).bind(embedding_model)
+
+    def fresh_snapshot(self, index_path: str = INDEX_PATH, index_name: str = INDEX_NAME) -> Optional[LoadedIndex]:
+        """Return the cached snapshot if `snapshot` would serve it without touching the disk, else None."""
+        key = (os.path.abspath(index_path), index_name)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - self._checked_at.get(key, 0.0) < self.check_interval:
+            return entry
+        return None
 
-    index_path = os.path.join(os.path.dirname(__file__), "index")
+    async def asnapshot(
+        self,
+        index_path: str = INDEX_PATH,
+        index_name: str = INDEX_NAME,
+        embedding_model: Optional[Embeddings] = None,
+    ) -> LoadedIndex:
+        """Like `snapshot`, but checks and (re)loads the files in a worker thread, off the event loop."""
+        entry = self.fresh_snapshot(index_path, index_name)
+        if entry is None:
+            entry = await asyncio.to_thread(self.snapshot, index_path, index_name, embedding_model)
+        return entry
 
-    vstore = FAISS.load_local(index_path, embedding_model,  allow_dangerous_deserialization=True)
-    yield vstore.as_retriever(search_kwargs=configuration.search_kwargs)
+    def invalidate(self, index_path: str = INDEX_PATH, index_name: str = INDEX_NAME) -> None:
+        """Force the next lookup of an index to re-check the files on disk."""
+        self._checked_at.pop((os.path.abspath(index_path), index_name), None)
 
-@contextmanager 
+
+index_registry = IndexRegistry()
+
+
+@contextmanager
+def make_faiss_retriever(
+    configuration: BaseConfiguration, embedding_model: Embeddings, snapshot: Optional[LoadedIndex] = None
+) -> Generator[VectorStoreRetriever, None, None]:
+    """Configure FAISS or memory-mapped flat vector store retriever, over `snapshot` if given."""
+    if snapshot is not None:
+        vstore = snapshot.bind(embedding_model)
+    else:
+        vstore = index_registry.get(embedding_model, configuration.index_path)
+    search_kwargs = configuration.search_kwargs
+    if isinstance(vstore, flat_index.MmapVectorStore):
+        search_kwargs = {"index_type": configuration.index_type, **search_kwargs}
+    yield vstore.as_retriever(search_kwargs=search_kwargs)
+
+@contextmanager
 def make_retriever(config: RunnableConfig) -> Generator[VectorStoreRetriever, None, None]:
     """Create document retriever based on configuration."""
     configuration = BaseConfiguration.from_runnable_config(config)
-    embedding_model = make_text_encoder(configuration.embedding_model)
+    embedding_model = make_text_encoder(configuration.embedding_model, configuration)
     with make_faiss_retriever(configuration, embedding_model) as retriever:
-        yield retriever
\ No newline at end of file
+        yield retriever
+
+
+class PrecomputedResults:
+    """Retrieval results for fixed queries, tagged with the index version they came from.
+
+    Only registered queries are stored, so arbitrary user questions never grow
+    the store. A result is served only while the index version it was computed
+    against is still the live one.
+    """
+
+    def __init__(self) -> None:
+        self._queries: set[str] = set()
+        self._results: dict[tuple, tuple[int, list[Document]]] = {}
+
+    @staticmethod
+    def _key(query: str, configuration: BaseConfiguration) -> tuple:
+        search_kwargs = json.dumps(configuration.search_kwargs, sort_keys=True, default=str)
+        return (
+            query,
+            configuration.index_path,
+            configuration.embedding_model,
+            configuration.index_type,
+            search_kwargs,
+        )
+
+    def register(self, query: str) -> None:
+        self._queries.add(query)
+
+    def get(self, query: str, configuration: BaseConfiguration, version: int) -> Optional[list[Document]]:
+        """Return stored documents for `query` if they match the index `version`."""
+        entry = self._results.get(self._key(query, configuration))
+        if entry is None or entry[0] != version:
+            return None
+        return list(entry[1])
+
+    def put(self, query: str, configuration: BaseConfiguration, version: int, docs: list[Document]) -> None:
+        """Store documents for a registered query."""
+        if query in self._queries:
+            self._results[self._key(query, configuration)] = (version, list(docs))
+
+
+precomputed_results = PrecomputedResults()
+
+
+async def retrieve(query: str, config: RunnableConfig) -> list[Document]:
+    """Retrieve documents for `query`, serving precomputed results when they are current."""
+    configuration = BaseConfiguration.from_runnable_config(config)
+    # One snapshot for the whole call, so the results and their version tag
+    # come from the same index even if it is reloaded meanwhile.
+    snapshot = await index_registry.asnapshot(configuration.index_path)
+    version = snapshot.version
+    docs = precomputed_results.get(query, configuration, version)
+    if docs is not None:
+        RETRIEVE_SECONDS.observe(0.0, source="precomputed")
+        return docs
+    with RETRIEVE_SECONDS.time(source="index"):
+        # Embedding and search run as separate steps so each can be timed.
+        embedding_model = make_text_encoder(configuration.embedding_model, configuration)
+        with EMBED_SECONDS.time(model=configuration.embedding_model):
+            vector = await embedding_model.aembed_query(query)
+        with make_faiss_retriever(configuration, embedding_model, snapshot) as retriever:
+            with SEARCH_SECONDS.time(index=configuration.index_type):
+                (docs,) = await asyncio.to_thread(
+                    search_by_vectors,
+                    retriever.vectorstore,
+                    np.asarray([vector], dtype=np.float32),
+                    retriever.search_kwargs,
+                )
+    precomputed_results.put(query, configuration, version, docs)
+    return docs
+
+
+async def index_version(config: RunnableConfig) -> str:
+    """Return a stable fingerprint of the live index files, for keying derived caches."""
+    configuration = BaseConfiguration.from_runnable_config(config)
+    snapshot = await index_registry.asnapshot(configuration.index_path)
+    files = [(os.path.basename(path), mtime, size) for path, mtime, size in snapshot.signature]
+    return hashlib.sha256(repr(files).encode()).hexdigest()[:16]
+
+
+FAST_PATH_SEARCH_KWARGS = frozenset({"k", "index_type", "nprobe", "ef_search"})
+"""Search options the vectorized paths honour; any other (filter, score_threshold, fetch_k, ...) uses the store's own search."""
+
+
+def search_by_vectors(vstore: VectorStore, vectors: np.ndarray, search_kwargs: dict) -> list[list[Document]]:
+    """Search a matrix of query vectors, in one vectorized call where the store allows it."""
+    search_kwargs = dict(search_kwargs)
+    fast_path = search_kwargs.keys() <= FAST_PATH_SEARCH_KWARGS
+    k = search_kwargs.pop("k", 4)
+    if fast_path:
+        if isinstance(vstore, flat_index.MmapVectorStore):
+            results = vstore.search_rows_batch(
+                vectors,
+                k,
+                index_type=search_kwargs.get("index_type"),
+                nprobe=search_kwargs.get("nprobe"),
+                ef_search=search_kwargs.get("ef_search"),
+            )
+            return [[vstore.get_document(row) for row, _ in rows] for rows in results]
+        if isinstance(vstore, FAISS):
+            vectors = np.array(vectors, dtype=np.float32)
+            if vstore._normalize_L2:
+                import faiss
+
+                faiss.normalize_L2(vectors)
+            _, rows = vstore.index.search(vectors, k)
+            return [
+                [vstore.docstore.search(vstore.index_to_docstore_id[i]) for i in row if i != -1]
+                for row in rows
+            ]
+    return [vstore.similarity_search_by_vector(list(vector), k=k, **search_kwargs) for vector in vectors]
+
+
+async def retrieve_many(queries: list[str], config: RunnableConfig) -> list[Document]:
+    """Retrieve documents for several queries with one embedding call and one search.
+
+    Results are interleaved by rank, so each query's best hit comes before any
+    query's second, and merged with `reduce_docs` so a chunk found by several
+    queries appears once.
+    """
+    if not queries:
+        return []
+    configuration = BaseConfiguration.from_runnable_config(config)
+    embedding_model = make_text_encoder(configuration.embedding_model, configuration)
+    with EMBED_SECONDS.time(model=configuration.embedding_model):
+        vectors = np.asarray(await embedding_model.aembed_documents(queries), dtype=np.float32)
+    snapshot = await index_registry.asnapshot(configuration.index_path)
+    with make_faiss_retriever(configuration, embedding_model, snapshot) as retriever:
+        with SEARCH_SECONDS.time(index=configuration.index_type):
+            per_query = await asyncio.to_thread(
+                search_by_vectors, retriever.vectorstore, vectors, retriever.search_kwargs
+            )
+    ranked = [docs[rank] for rank in range(max(map(len, per_query))) for docs in per_query if rank < len(docs)]
+    return list(reduce_docs([], ranked))
+
+
+async def warm_up(queries: Iterable[str], config: Optional[RunnableConfig] = None) -> None:
+    """Load the index and precompute results for fixed queries."""
+    config = config or {}
+    for query in queries:
+        precomputed_results.register(query)
+        await retrieve(query, config)
@@ -0,0 +1,136 @@
+"""Per-connection chat sessions for the websocket endpoint.
+
+Each connection gets its own checkpoint thread, so concurrent clients no
+longer share one conversation. A client can resume a conversation by
+reconnecting with its thread ID; the conversation itself lives in the graph's
+checkpointer, so a session only tracks the live connection. The number of
+live sessions per worker is bounded and idle connections are closed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+THREAD_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a worker already serves its maximum number of sessions."""
+
+
+@dataclass(eq=False)
+class Session:
+    """A live connection bound to one conversation thread."""
+
+    thread_id: str
+    close: Callable[[], Awaitable[None]]
+    turn_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    opened_at: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+    resumed: bool = False
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """Assign threads to connections, bound them per worker and evict idle ones."""
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 15 * 60) -> None:
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.opened = 0
+        self.rejected = 0
+        self.evicted = 0
+        self._sessions: dict[str, Session] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def open(self, thread_id: Optional[str], close: Callable[[], Awaitable[None]]) -> Session:
+        """Start a session, resuming `thread_id` if given.
+
+        A resumed thread that is still attached to another connection (e.g. a
+        client reconnecting before the old socket timed out) takes it over;
+        the turn lock is shared so the two never run the graph at once.
+
+        Raises:
+            ValueError: If `thread_id` is not a valid thread ID.
+            SessionLimitError: If the worker is at capacity after evicting idle sessions.
+        """
+        if thread_id is not None and not THREAD_ID_PATTERN.fullmatch(thread_id):
+            raise ValueError("thread_id must be 1-64 letters, digits, '-' or '_'")
+
+        previous = self._sessions.pop(thread_id, None) if thread_id else None
+        if previous is None and len(self._sessions) >= self.max_sessions:
+            await self.evict_idle()
+            if len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                raise SessionLimitError(f"{self.max_sessions} sessions already open")
+
+        session = Session(thread_id=thread_id or uuid.uuid4().hex, close=close, resumed=thread_id is not None)
+        self._sessions[session.thread_id] = session
+        self.opened += 1
+        if previous is not None:
+            session.turn_lock = previous.turn_lock
+            # The old socket is usually already dead when a client reconnects.
+            try:
+                await previous.close()
+            except Exception:
+                logger.debug("Closing replaced session %s failed", previous.thread_id, exc_info=True)
+        return session
+
+    def release(self, session: Session) -> None:
+        """Forget a session whose connection has ended."""
+        if self._sessions.get(session.thread_id) is session:
+            del self._sessions[session.thread_id]
+
+    async def evict_idle(self) -> int:
+        """Close sessions idle for longer than `idle_timeout`; return how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [s for s in self._sessions.values() if s.last_active < cutoff and not s.turn_lock.locked()]
+        for session in idle:
+            self.release(session)
+            try:
+                await session.close()
+            except Exception:
+                logger.debug("Closing idle session %s failed", session.thread_id, exc_info=True)
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.01))
+            await self.evict_idle()
+
+    def start(self) -> None:
+        """Start closing idle sessions in the background."""
+        if self._reaper is None:
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "live": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,552 @@
+"""Bounded, durable LangGraph checkpointer backed by SQLite.
+
+`MemorySaver` keeps every checkpoint of every thread in process memory for
+the life of the worker. `SQLiteCheckpointSaver` stores them on disk instead,
+keeps only the last `keep_last` checkpoints of each thread and drops threads
+that have been idle for longer than `ttl` seconds, so both memory and disk
+use stay bounded while conversations survive a restart.
+
+Writes are buffered and committed in one transaction when the buffer fills,
+every `flush_interval` seconds, or before any read, so a run's several
+checkpoints cost a single commit without a reader ever missing one.
+
+With `delta=True` checkpoints are stored as msgspec deltas against their
+parent (see `checkpoint_codec`), with a full keyframe at least every
+`keyframe_interval` checkpoints. Deltas are only resolved when a checkpoint is
+read, walking back to its keyframe and reusing recently decoded parents.
+Documents are stored once and indexed by the checkpoints referencing them;
+pruning and eviction delete those no checkpoint references any more.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from ..shared.checkpoint_codec import DeltaCheckpointCodec
+from ..shared.history import HistorySummary
+from ..shared.metrics import CHECKPOINT_SECONDS
+from ..shared.state import DocumentStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL, "
+    "parent_checkpoint_id TEXT, keyframe_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL, "
+    "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, value BLOB, "
+    "task_path TEXT NOT NULL DEFAULT '', "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+    "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS threads_updated ON threads (updated_at)",
+    "CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, type TEXT NOT NULL, value BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS document_refs ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL, key TEXT NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, key))",
+    "CREATE INDEX IF NOT EXISTS document_refs_key ON document_refs (key)",
+)
+
+DELTA_TYPE = "msgspec-delta"
+
+# The graph's own state types. Registered with the serde so checkpoints restore
+# them as themselves rather than as plain dicts under strict msgpack.
+STATE_TYPES: tuple[type, ...] = (DocumentStore, HistorySummary)
+
+
+def state_serde(types: Sequence[type] = STATE_TYPES) -> JsonPlusSerializer:
+    """Return a `JsonPlusSerializer` that deserializes `types` besides langgraph's safe types."""
+    if "allowed_msgpack_modules" not in inspect.signature(JsonPlusSerializer).parameters:
+        # Releases before the msgpack allowlist restore any type.
+        return JsonPlusSerializer()
+    return JsonPlusSerializer(allowed_msgpack_modules=[(t.__module__, t.__name__) for t in types])
+
+_COLUMNS = (
+    "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, keyframe_id, type, checkpoint, metadata_type, metadata"
+)
+
+
+@dataclass
+class CheckpointStats:
+    """Counters for a `SQLiteCheckpointSaver`."""
+
+    checkpoints: int = 0
+    writes: int = 0
+    flushes: int = 0
+    pruned: int = 0
+    evicted_threads: int = 0
+    documents_removed: int = 0
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """Checkpointer that keeps the last `keep_last` checkpoints per thread in SQLite."""
+
+    def __init__(
+        self,
+        path: str = ".cache/checkpoints.sqlite",
+        keep_last: int = 20,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        batch_size: int = 64,
+        flush_interval: float = 0.05,
+        evict_interval: float = 60.0,
+        cache_size_kb: int = 8192,
+        delta: bool = True,
+        keyframe_interval: int = 32,
+        state_cache_size: int = 256,
+        **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("serde", state_serde())
+        super().__init__(**kwargs)
+        self.path = path
+        self.keep_last = keep_last
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.evict_interval = evict_interval
+        self.keyframe_interval = keyframe_interval
+        self.state_cache_size = state_cache_size
+        self._codec = DeltaCheckpointCodec(self.serde) if delta else None
+        # (thread_id, checkpoint_ns, checkpoint_id) -> (channel_values, depth, keyframe_id)
+        self._states: OrderedDict[tuple[str, str, str], tuple[dict[str, Any], int, str]] = OrderedDict()
+        self.stats = CheckpointStats()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Bound SQLite's page cache so RSS does not grow with the database.
+        self._conn.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(checkpoints)")}
+        if "keyframe_id" not in columns:
+            self._conn.execute("ALTER TABLE checkpoints ADD COLUMN keyframe_id TEXT")
+        if "documents" in tables and "document_refs" not in tables:
+            self._backfill_document_refs()
+        self._pending: list[tuple[str, tuple]] = []
+        self._touched: set[tuple[str, str]] = set()
+        self._evicted_at = 0.0
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+
+    def _backfill_document_refs(self) -> None:
+        """Index the documents referenced by checkpoints written before references were tracked."""
+        codec = self._codec or DeltaCheckpointCodec(self.serde)
+        self._conn.execute("BEGIN")
+        try:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, checkpoint FROM checkpoints WHERE type = ?",
+                (DELTA_TYPE,),
+            )
+            for thread_id, checkpoint_ns, checkpoint_id, blob in rows.fetchall():
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO document_refs (thread_id, checkpoint_ns, checkpoint_id, key) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(thread_id, checkpoint_ns, checkpoint_id, key) for key in codec.doc_refs(blob)],
+                )
+            removed = self._conn.execute(
+                "DELETE FROM documents WHERE key NOT IN (SELECT key FROM document_refs)"
+            ).rowcount
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        logger.info("Indexed document references of existing checkpoints; removed %d unreferenced documents", removed)
+
+    # Buffering
+
+    def _enqueue(self, statements: list[tuple[str, tuple]], thread: tuple[str, str]) -> None:
+        with self._lock:
+            self._pending.extend(statements)
+            self._touched.add(thread)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Checkpoint flush failed")
+
+    def flush(self) -> None:
+        """Commit buffered writes, prune old checkpoints and evict idle threads."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        now = time.time()
+        evict = self.ttl is not None and now - self._evicted_at >= self.evict_interval
+        if not self._pending and not evict:
+            return
+        pending, touched = self._pending, self._touched
+        self._pending, self._touched = [], set()
+        start = time.perf_counter()
+        self._conn.execute("BEGIN")
+        try:
+            for sql, params in pending:
+                self._conn.execute(sql, params)
+            for thread_id, checkpoint_ns in touched:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO threads (thread_id, updated_at) VALUES (?, ?)", (thread_id, now)
+                )
+                self.stats.pruned += self._prune(thread_id, checkpoint_ns)
+            if evict:
+                self.stats.evicted_threads += self._evict(now - self.ttl)
+                self._evicted_at = now
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        if pending:
+            self.stats.flushes += 1
+            CHECKPOINT_SECONDS.observe(time.perf_counter() - start, op="flush")
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> int:
+        row = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last - 1),
+        ).fetchone()
+        if row is None:
+            return 0
+        oldest_kept = row[0]
+        # Keep the keyframes that the remaining delta checkpoints are decoded from.
+        (oldest_keyframe,) = self._conn.execute(
+            "SELECT MIN(COALESCE(keyframe_id, checkpoint_id)) FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id >= ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        ).fetchone()
+        oldest_kept = min(oldest_kept, oldest_keyframe or oldest_kept)
+        pruned = self._conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        ).rowcount
+        self._conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        )
+        if pruned:
+            self._drop_document_refs(
+                "thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", (thread_id, checkpoint_ns, oldest_kept)
+            )
+        return pruned
+
+    def _evict(self, idle_since: float) -> int:
+        stale = "SELECT thread_id FROM threads WHERE updated_at < ?"
+        self._conn.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({stale})", (idle_since,))
+        self._conn.execute(f"DELETE FROM writes WHERE thread_id IN ({stale})", (idle_since,))
+        self._drop_document_refs(f"thread_id IN ({stale})", (idle_since,))
+        return self._conn.execute("DELETE FROM threads WHERE updated_at < ?", (idle_since,)).rowcount
+
+    def _drop_document_refs(self, where: str, params: tuple) -> None:
+        """Forget the document references of deleted checkpoints and delete documents no longer referenced."""
+        keys = [key for (key,) in self._conn.execute(f"SELECT DISTINCT key FROM document_refs WHERE {where}", params)]
+        if not keys:
+            return
+        self._conn.execute(f"DELETE FROM document_refs WHERE {where}", params)
+        for key in keys:
+            self.stats.documents_removed += self._conn.execute(
+                "DELETE FROM documents WHERE key = ? AND NOT EXISTS (SELECT 1 FROM document_refs WHERE key = ?)",
+                (key, key),
+            ).rowcount
+
+    def _query(self, sql: str, params: Sequence[Any]) -> list[tuple]:
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(sql, params).fetchall()
+
+    # BaseCheckpointSaver
+
+    def _remember_state(self, key: tuple[str, str, str], values: dict[str, Any], depth: int, keyframe_id: str) -> None:
+        with self._lock:
+            self._states[key] = (values, depth, keyframe_id)
+            self._states.move_to_end(key)
+            while len(self._states) > self.state_cache_size:
+                self._states.popitem(last=False)
+
+    def _load_doc(self, key: str) -> tuple[str, bytes]:
+        return self._query("SELECT type, value FROM documents WHERE key = ?", (key,))[0]
+
+    def _decode(self, row: tuple) -> dict[str, Any]:
+        """Rebuild a delta-encoded checkpoint, resolving its parent chain on demand."""
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, keyframe_id, _, blob = row[:7]
+        parent_values, depth = None, 0
+        if keyframe_id != checkpoint_id:
+            parent = self._states.get((thread_id, checkpoint_ns, parent_id))
+            if parent is None:
+                parent_row = self._query(
+                    f"SELECT {_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, parent_id),
+                )[0]
+                self._decode(parent_row)
+                parent = self._states[(thread_id, checkpoint_ns, parent_id)]
+            parent_values, depth = parent[0], parent[1] + 1
+        checkpoint = self._codec.decode(blob, parent_values, self._load_doc)
+        self._remember_state((thread_id, checkpoint_ns, checkpoint_id), dict(checkpoint["channel_values"]), depth, keyframe_id)
+        return checkpoint
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, _, type_, checkpoint, metadata_type, metadata = row
+        if type_ == DELTA_TYPE:
+            checkpoint = self._decode(row)
+        else:
+            checkpoint = self.serde.loads_typed((type_, checkpoint))
+        writes = self._query(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        columns = _COLUMNS
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        return self._tuple(rows[0]) if rows else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(str(configurable["thread_id"]))
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before is not None:
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(
+            f"SELECT {_COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params,
+        )
+        yielded = 0
+        for row in rows:
+            if limit is not None and yielded >= limit:
+                return
+            checkpoint_tuple = self._tuple(row)
+            if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yielded += 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        parent_id = configurable.get("checkpoint_id")
+        statements = []
+        keyframe_id = checkpoint["id"]
+        if self._codec is not None:
+            parent = self._states.get((thread_id, checkpoint_ns, parent_id)) if parent_id else None
+            if parent is not None and parent[1] + 1 >= self.keyframe_interval:
+                parent = None
+            blob, new_docs = self._codec.encode(checkpoint, parent[0] if parent else None)
+            type_ = DELTA_TYPE
+            depth = 0
+            if parent is not None:
+                depth, keyframe_id = parent[1] + 1, parent[2]
+            self._remember_state(
+                (thread_id, checkpoint_ns, checkpoint["id"]), dict(checkpoint["channel_values"]), depth, keyframe_id
+            )
+            statements.extend(
+                ("INSERT OR IGNORE INTO documents (key, type, value) VALUES (?, ?, ?)", doc) for doc in new_docs
+            )
+            statements.extend(
+                (
+                    "INSERT OR IGNORE INTO document_refs (thread_id, checkpoint_ns, checkpoint_id, key) VALUES (?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], key),
+                )
+                for key in dict.fromkeys(key for key, _, _ in new_docs)
+            )
+        else:
+            type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+        statements.append((
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "keyframe_id, type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], parent_id, keyframe_id,
+             type_, blob, metadata_type, metadata_blob),
+        ))
+        self._enqueue(statements, (thread_id, checkpoint_ns))
+        self.stats.checkpoints += 1
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are idempotent.
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        statements = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            statements.append((
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, "
+                "task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, configurable["checkpoint_id"], task_id,
+                 WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path),
+            ))
+        self._enqueue(statements, (thread_id, checkpoint_ns))
+        self.stats.writes += len(statements)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a thread."""
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "writes", "threads"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+                self._drop_document_refs("thread_id = ?", (str(thread_id),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for key in [key for key in self._states if key[0] == str(thread_id)]:
+                del self._states[key]
+
+    def get_next_version(self, current: Optional[str], channel: Any = None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Async API: SQLite calls run in a worker thread to keep the event loop free.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with CHECKPOINT_SECONDS.time(op="get"):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoints:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with CHECKPOINT_SECONDS.time(op="put"):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with CHECKPOINT_SECONDS.time(op="put_writes"):
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def info(self) -> dict[str, Any]:
+        """Return counters and current row counts."""
+        threads, checkpoints = self._query(
+            "SELECT (SELECT COUNT(*) FROM threads), (SELECT COUNT(*) FROM checkpoints)", ()
+        )[0]
+        return {**asdict(self.stats), "live_threads": threads, "live_checkpoints": checkpoints}
+
+    def close(self) -> None:
+        """Flush pending writes and close the database."""
+        self._closed.set()
+        self._flusher.join()
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
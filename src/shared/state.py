@@ -1,8 +1,11 @@
 """State management utilities for company information bot."""
 
 import hashlib
+import threading
 import uuid
-from typing import Any, Literal, Optional, Union
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator, Literal, Optional, Sequence, Union, overload
 from langchain_core.documents import Document
 
 
@@ -12,38 +15,159 @@ def _generate_uuid(page_content: str) -> str:
     return str(uuid.UUID(md5_hash))
 
 
+class _DocumentLog:
+    """Append-only documents and their positions, shared by every version of a store."""
+
+    __slots__ = ("docs", "positions", "lock")
+
+    def __init__(self) -> None:
+        self.docs: list[Document] = []
+        self.positions: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+
+def _documents(store: "DocumentStore") -> list[Document]:
+    return store._log.docs[: store._size]
+
+
+@dataclass(init=False, eq=False, repr=False)
+class DocumentStore(Sequence[Document]):
+    """Persistent, append-only collection of documents keyed by their "uuid" metadata.
+
+    Every version is a prefix of a shared log: extending the newest version
+    appends to the log in place and returns a new version of the larger size,
+    so a merge costs O(new documents), membership is one dict lookup and
+    earlier versions (e.g. held by older checkpoints) stay unchanged. Extending
+    an older version copies its prefix into a log of its own first.
+
+    `documents` is the only dataclass field, so checkpoint serializers store a
+    store as `DocumentStore(documents=[...])`.
+    """
+
+    documents: list[Document] = property(_documents)  # type: ignore[assignment]
+
+    def __init__(self, documents: Iterable[Any] = ()) -> None:
+        self._log = _DocumentLog()
+        self._size = 0
+        self._append(documents)
+
+    @classmethod
+    def _version(cls, log: _DocumentLog, size: int) -> "DocumentStore":
+        store = cls.__new__(cls)
+        store._log = log
+        store._size = size
+        return store
+
+    def _append(self, items: Iterable[Any]) -> None:
+        """Add documents to this (newest) version in place; only for versions nobody else holds yet."""
+        log = self._log
+        for item in items:
+            doc = _as_document(item)
+            doc_id = doc.metadata["uuid"]
+            if doc_id not in log.positions:
+                log.positions[doc_id] = len(log.docs)
+                log.docs.append(doc)
+        self._size = len(log.docs)
+
+    def extend(self, items: Iterable[Any]) -> "DocumentStore":
+        """Return a version with the documents in `items` not already present appended."""
+        with self._log.lock:
+            if len(self._log.docs) == self._size:
+                start = self._size
+                store = DocumentStore._version(self._log, start)
+                store._append(items)
+                if store._size == start:
+                    return self
+                return store
+        store = DocumentStore(_documents(self))
+        store._append(items)
+        return store if store._size > self._size else self
+
+    def prefix(self, size: int) -> "DocumentStore":
+        """Return the version holding the first `size` documents."""
+        if not 0 <= size <= self._size:
+            raise IndexError(f"prefix {size} out of range for {self._size} documents")
+        return self if size == self._size else DocumentStore._version(self._log, size)
+
+    def shared_prefix(self, other: "DocumentStore") -> Optional[int]:
+        """Number of leading documents shared with `other`, if both are versions of one log."""
+        return min(self._size, other._size) if other._log is self._log else None
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        position = self._log.positions.get(doc_id)
+        return self._log.docs[position] if position is not None and position < self._size else None
+
+    def __contains__(self, item: object) -> bool:
+        if isinstance(item, Document):
+            item = item.metadata.get("uuid") or _generate_uuid(item.page_content)
+        return isinstance(item, str) and self.get(item) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @overload
+    def __getitem__(self, index: int) -> Document: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Document]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Document, list[Document]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size)
+            return self._log.docs[start:stop:step]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("document index out of range")
+        return self._log.docs[index]
+
+    def __iter__(self) -> Iterator[Document]:
+        return islice(self._log.docs, self._size)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, DocumentStore) and other._log is self._log:
+            return other._size == self._size
+        return isinstance(other, (DocumentStore, list)) and len(other) == self._size and list(self) == list(other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"DocumentStore({self._size} documents)"
+
+
+def _as_document(item: Any) -> Document:
+    """Turn a str, dict or Document into a Document with a "uuid", without deep copies."""
+    if isinstance(item, Document):
+        if item.metadata.get("uuid"):
+            return item
+        return item.copy(update={"metadata": {**item.metadata, "uuid": _generate_uuid(item.page_content)}})
+    if isinstance(item, dict):
+        metadata = item.get("metadata", {})
+        item_id = metadata.get("uuid") or _generate_uuid(item.get("page_content", ""))
+        return Document(**{**item, "metadata": {**metadata, "uuid": item_id}})
+    if isinstance(item, str):
+        return Document(page_content=item, metadata={"uuid": _generate_uuid(item)})
+    raise TypeError(f"Cannot add {type(item).__name__} to a DocumentStore")
+
+
 def reduce_docs(
-    existing: Optional[list[Document]], 
+    existing: Optional[Sequence[Document]],
     new: Union[list[Document], list[dict[str, Any]], list[str], str, Literal["delete"]]
-) -> list[Document]:
-    """Merge document lists and maintain uniqueness by content."""
-    if new == "delete":
-        return []
+) -> DocumentStore:
+    """Merge documents into the store, keeping one document per content ID.
 
-    existing_list = list(existing) if existing else []
+    `new` may be a string, a list of strings, dicts or Documents, or "delete"
+    to clear the store. Strings are keyed by their content like documents, so
+    adding the same string twice keeps one copy.
+    """
+    if new == "delete":
+        return DocumentStore()
+    if isinstance(existing, DocumentStore):
+        store = existing
+    else:
+        store = DocumentStore(existing or ())
     if isinstance(new, str):
-        return existing_list + [
-            Document(page_content=new, metadata={"uuid": _generate_uuid(new)})
-        ]
-
-    new_list = []
-    if isinstance(new, list):
-        existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
-        for item in new:
-            if isinstance(item, str):
-                item_id = _generate_uuid(item)
-                new_list.append(Document(page_content=item, metadata={"uuid": item_id}))
-            elif isinstance(item, dict):
-                metadata = item.get("metadata", {})
-                item_id = metadata.get("uuid") or _generate_uuid(item.get("page_content", ""))
-                if item_id not in existing_ids:
-                    new_list.append(Document(**{**item, "metadata": {**metadata, "uuid": item_id}}))
-            elif isinstance(item, Document):
-                item_id = item.metadata.get("uuid", "") or _generate_uuid(item.page_content)
-                if item_id not in existing_ids:
-                    new_item = item.copy(deep=True)
-                    new_item.metadata["uuid"] = item_id
-                    new_list.append(new_item)
-                existing_ids.add(item_id)
-
-    return existing_list + new_list
\ No newline at end of file
+        new = [new]
+    if not isinstance(new, (list, DocumentStore)) or not new:
+        return store
+    return store.extend(new)
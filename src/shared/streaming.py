@@ -0,0 +1,159 @@
+"""Coalesced streaming of model output to a websocket.
+
+Sending every token as its own frame costs a syscall and a frame header per
+token, while buffering a whole completion makes the user wait for all of it.
+`FrameCoalescer` forwards text as it arrives but batches it into frames:
+a frame goes out once `max_bytes` have accumulated or `max_delay` seconds
+after its first byte, whichever comes first. With both set to None text is
+only sent when the message ends, i.e. the old fully buffered behaviour.
+
+Frames are sent by a single writer task. While a slow client holds up a send,
+new text keeps accumulating and goes out as one larger frame, so the frame
+rate adapts to the client. If more than `max_buffered_bytes` are waiting,
+`write` blocks until the client catches up, and a send that takes longer than
+`send_timeout` fails the stream instead of holding the session open.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+END_OF_MESSAGE = ""
+"""Sent as its own (empty) frame after the last frame of each message."""
+
+
+class FrameCoalescer:
+    """Forward streamed text through `send` in size- and time-bounded frames.
+
+    `encode`, if given, turns each coalesced run of text into the frame to
+    send, e.g. a typed protocol event.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Any], Awaitable[None]],
+        max_delay: Optional[float] = 0.02,
+        max_bytes: Optional[int] = 256,
+        max_buffered_bytes: int = 1 << 20,
+        send_timeout: Optional[float] = 30.0,
+        encode: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        self._send = send
+        self._encode = encode
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+        self.max_buffered_bytes = max_buffered_bytes
+        self.send_timeout = send_timeout
+        self.frames = 0
+        self.bytes_sent = 0
+        self.max_backlog = 0
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._first_at = 0.0
+        self._has_data = asyncio.Event()
+        self._urgent = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._error: Optional[BaseException] = None
+        self._send_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "FrameCoalescer":
+        self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                await self.flush()
+        finally:
+            if self._writer is not None:
+                self._writer.cancel()
+                try:
+                    await self._writer
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def write(self, text: str) -> None:
+        """Queue text to be sent; waits if the client is too far behind."""
+        self._check()
+        if not text:
+            return
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode())
+        self.max_backlog = max(self.max_backlog, self._pending_bytes)
+        self._idle.clear()
+        self._has_data.set()
+        if self.max_bytes is not None and self._pending_bytes >= self.max_bytes:
+            self._urgent.set()
+        if self._pending_bytes > self.max_buffered_bytes:
+            await self._idle.wait()
+            self._check()
+
+    async def flush(self) -> None:
+        """Send everything queued so far and wait until it has been sent."""
+        self._check()
+        if self._pending:
+            self._urgent.set()
+        await self._idle.wait()
+        self._check()
+
+    async def send_frame(self, frame: Any) -> None:
+        """Send a frame of its own after everything queued before it.
+
+        `frame` may be a zero-argument callable, called right before sending,
+        so frames built with a counter are numbered in send order.
+        """
+        await self.flush()
+        await self._send_frame(frame)
+
+    async def end_message(self) -> None:
+        """Flush the current message and send the end-of-message marker."""
+        await self.send_frame(END_OF_MESSAGE)
+
+    async def _send_frame(self, frame: Any) -> None:
+        async with self._send_lock:
+            if callable(frame):
+                frame = frame()
+            if self.send_timeout is None:
+                await self._send(frame)
+            else:
+                await asyncio.wait_for(self._send(frame), self.send_timeout)
+        self.frames += 1
+        self.bytes_sent += len(frame)
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                await self._has_data.wait()
+                if self.max_delay is None:
+                    await self._urgent.wait()
+                else:
+                    delay = self._first_at + self.max_delay - time.monotonic()
+                    if delay > 0 and not self._urgent.is_set():
+                        try:
+                            await asyncio.wait_for(self._urgent.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                text = "".join(self._pending)
+                frame = (lambda: self._encode(text)) if self._encode is not None else text
+                self._pending.clear()
+                self._pending_bytes = 0
+                self._has_data.clear()
+                self._urgent.clear()
+                await self._send_frame(frame)
+                if not self._pending:
+                    self._idle.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+            self._idle.set()
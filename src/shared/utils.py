@@ -1,6 +1,6 @@
 """Utility functions for company information bot."""
 
-from typing import Optional
+from typing import Any, Optional
 from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
@@ -21,10 +21,10 @@ def _format_doc(doc: Document) -> str:
     return f"<document{meta}>\n{doc.page_content}\n</document>"
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
-    """Initialize chat model from provider/name string."""
+def load_chat_model(fully_specified_name: str, **kwargs: Any) -> BaseChatModel:
+    """Initialize chat model from provider/name string, passing extra kwargs to the client."""
     provider, model = fully_specified_name.split("/", maxsplit=1) if "/" in fully_specified_name else ("", fully_specified_name)
-    return init_chat_model(model, model_provider=provider)
+    return init_chat_model(model, model_provider=provider, **kwargs)
 
 def send_email(email: str, content: str) -> None:
     """Send email with content."""